@@ -6,8 +6,11 @@ from sqlalchemy.orm import Session
 from app.api.deps import get_db, get_current_active_user
 from app.core.security import verify_password, get_password_hash, create_access_token
 from app.core.config import settings
+from app.core.executors import cpu_thread_pool
 from app.db.models import User
 from app.schemas.user import UserCreate, User as UserSchema, UserLogin, Token, UserUpdate
+from app.services.api_key_cache import api_key_cache
+from app.services.user_cache import user_principal_cache
 
 router = APIRouter()
 
@@ -28,7 +31,7 @@ async def register_user(
         )
     
     # Yeni kullanıcı oluştur
-    hashed_password = get_password_hash(user_data.password)
+    hashed_password = await cpu_thread_pool.run(get_password_hash, user_data.password)
     new_user = User(
         email=user_data.email,
         hashed_password=hashed_password,
@@ -62,7 +65,7 @@ async def login_user(
         )
     
     # Şifreyi kontrol et
-    if not verify_password(login_data.password, user.hashed_password):
+    if not await cpu_thread_pool.run(verify_password, login_data.password, user.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="E-posta veya şifre hatalı"
@@ -106,7 +109,7 @@ async def login_form(
         )
     
     # Şifreyi kontrol et
-    if not verify_password(form_data.password, user.hashed_password):
+    if not await cpu_thread_pool.run(verify_password, form_data.password, user.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="E-posta veya şifre hatalı",
@@ -159,6 +162,8 @@ async def update_user_profile(
     
     db.commit()
     db.refresh(current_user)
+    user_principal_cache.invalidate(current_user.email)
+    api_key_cache.invalidate_user(db, current_user.id)
     
     return current_user
 
@@ -173,7 +178,7 @@ async def change_password(
     Kullanıcı şifresini değiştir
     """
     # Mevcut şifreyi doğrula
-    if not verify_password(current_password, current_user.hashed_password):
+    if not await cpu_thread_pool.run(verify_password, current_password, current_user.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Mevcut şifre hatalı"
@@ -187,7 +192,7 @@ async def change_password(
         )
     
     # Şifreyi güncelle
-    current_user.hashed_password = get_password_hash(new_password)
+    current_user.hashed_password = await cpu_thread_pool.run(get_password_hash, new_password)
     db.commit()
     
     return {"message": "Şifre başarıyla değiştirildi"}
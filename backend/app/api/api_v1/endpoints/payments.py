@@ -1,7 +1,11 @@
-from typing import List, Optional
-from fastapi import APIRouter, Depends, HTTPException, status, Query, Request
+import asyncio
+import json
+from typing import List, Optional, Tuple
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Request, Response
+from fastapi.responses import JSONResponse, StreamingResponse
+from starlette.background import BackgroundTask
 from sqlalchemy.orm import Session, joinedload
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 from decimal import Decimal
 
 from app.api.deps import get_db, get_current_active_user, get_api_user
@@ -11,7 +15,12 @@ from app.schemas.payment import (
     TransactionResponse, DashboardStats
 )
 from app.services.crypto import CryptoService
+from app.services.address_pool import address_pool
+from app.services.payment_qr import payment_qr_service, QR_IMAGE_MEDIA_TYPES
+from app.services.payment_events import payment_status_hub, RESYNC, SubscriberLimitError, TERMINAL_STATUSES
+from app.db.database import SessionLocal
 from app.core.config import settings
+from app.core.executors import cpu_thread_pool
 
 router = APIRouter()
 
@@ -37,15 +46,22 @@ async def create_payment_request(
             detail="Aktif cüzdan bulunamadı. Lütfen önce bir cüzdan ekleyin."
         )
     
-    # Benzersiz adres oluştur
-    address_index = wallet.address_index + 1
     try:
-        payment_address = CryptoService.derive_address_from_xpub(
-            wallet.xpub_key, 
-            address_index,
-            wallet.derivation_path
-        )
+        # Benzersiz adresi önceden türetilmiş havuzdan al
+        pooled = address_pool.pop(db, wallet.id)
+        if pooled:
+            payment_address, address_index = pooled
+        else:
+            # Havuz boşsa (yeni cüzdan, doldurucu çalışmıyor) adres anında türetilir
+            address_index = address_pool.reserve_index(db, wallet.id)
+            payment_address = await cpu_thread_pool.run(
+                CryptoService.derive_address_from_xpub,
+                wallet.xpub_key,
+                address_index,
+                wallet.derivation_path
+            )
     except Exception as e:
+        db.rollback()
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Ödeme adresi oluşturulamadı: {str(e)}"
@@ -71,18 +87,15 @@ async def create_payment_request(
     )
     
     db.add(payment_request)
-    
-    # Wallet'ın address index'ini güncelle
-    wallet.address_index = address_index
-    
     db.commit()
     db.refresh(payment_request)
     
-    # QR kod oluştur
-    qr_code_data = CryptoService.generate_payment_qr(
-        payment_address, 
-        float(payment_data.amount), 
-        payment_data.currency
+    # QR kod oluştur (önbelleğe alınır, sonraki /qr istekleri tekrar üretmez)
+    qr_code_data = await payment_qr_service.render(
+        payment_address,
+        float(payment_data.amount),
+        "png",
+        expires_at
     )
     
     return PaymentRequestResponse(
@@ -94,7 +107,8 @@ async def create_payment_request(
         status=payment_request.status,
         expires_at=payment_request.expires_at,
         created_at=payment_request.created_at,
-        qr_code_data=qr_code_data
+        qr_code_data=qr_code_data,
+        **_status_paths(payment_request.id)
     )
 
 @router.get("/durum/{payment_id}", response_model=PaymentRequestDetail, summary="Ödeme durumu sorgula")
@@ -117,7 +131,172 @@ async def get_payment_status(
             detail="Ödeme talebi bulunamadı"
         )
     
-    return payment
+    response = PaymentRequestDetail.model_validate(payment)
+    for field, value in _status_paths(payment.id).items():
+        setattr(response, field, value)
+    return response
+
+# Ödeme sayfasındaki tarayıcı için durum bildirimleri (API anahtarı yerine imzalı URL)
+_STATUS_HEADERS = {"Cache-Control": "no-store", "Access-Control-Allow-Origin": "*"}
+_STREAM_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no", "Access-Control-Allow-Origin": "*"}
+
+def _status_paths(payment_id: int) -> dict:
+    stream_path, wait_path = payment_status_hub.status_paths(payment_id)
+    return {"status_stream_path": stream_path, "status_wait_path": wait_path}
+
+def _load_payment_status(payment_id: int) -> Optional[Tuple[PaymentStatus, datetime]]:
+    """
+    Güncel durum ve son geçerlilik (UTC, naive); bağlantı sadece sorgu süresince tutulur
+    """
+    db = SessionLocal()
+    try:
+        row = db.query(PaymentRequest.status, PaymentRequest.expires_at).filter(
+            PaymentRequest.id == payment_id
+        ).first()
+    finally:
+        db.close()
+    
+    if row is None:
+        return None
+    expires_at = row.expires_at
+    if expires_at.tzinfo is not None:
+        expires_at = expires_at.astimezone(timezone.utc).replace(tzinfo=None)
+    return row.status, expires_at
+
+def _check_status_access(payment_id: int, imza: str):
+    if not payment_status_hub.verify_status_signature(payment_id, imza):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Ödeme talebi bulunamadı"
+        )
+
+def _subscribe_status(payment_id: int) -> asyncio.Queue:
+    """
+    Abonelik kuyruğu; süreç başına abone sınırı doluysa 503
+    """
+    try:
+        return payment_status_hub.acquire(payment_id)
+    except SubscriberLimitError:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Çok fazla açık bağlantı, daha sonra tekrar deneyin",
+            headers={"Retry-After": "30"}
+        )
+
+def _sse_event(payment_id: int, payment_status: PaymentStatus) -> str:
+    data = json.dumps({"payment_id": payment_id, "status": payment_status.value})
+    return f"event: status\ndata: {data}\n\n"
+
+@router.get("/durum-akisi/{payment_id}", summary="Ödeme durumu akışı (SSE)")
+async def stream_payment_status(
+    payment_id: int,
+    imza: str = Query(...)
+):
+    """
+    Ödeme durumu Server-Sent Events akışı (ödeme sayfasındaki EventSource için)
+    
+    Bağlantıda güncel durum, sonra her değişiklik "status" olayı olarak
+    gönderilir; onay, süre dolumu veya iptalde akış kapanır. Bağlantı
+    açıkken veritabanı sorgusu yapılmaz, bildirimler monitor'den gelir.
+    """
+    _check_status_access(payment_id, imza)
+    
+    # Abonelik yanıt başlamadan alınır; sınır doluysa akış yerine 503 döner.
+    # Bırakma akış bitince veya (akış hiç başlamadan) bağlantı kapanınca yapılır.
+    queue = _subscribe_status(payment_id)
+    release = BackgroundTask(payment_status_hub.release, payment_id, queue)
+    
+    async def events():
+        try:
+            # Abone olduktan sonra okunur, aradaki değişiklik kaçmaz
+            current = await asyncio.to_thread(_load_payment_status, payment_id)
+            if current is None:
+                return
+            payment_status, expires_at = current
+            yield "retry: 5000\n" + _sse_event(payment_id, payment_status)
+            
+            # Monitor süresi dolan ödemeyi kısa gecikmeyle işaretler; bu süreden sonra akış kapanır
+            close_at = expires_at + timedelta(seconds=settings.PAYMENT_EVENTS_HEARTBEAT_SECONDS * 4)
+            while payment_status not in TERMINAL_STATUSES:
+                try:
+                    item = await asyncio.wait_for(queue.get(), settings.PAYMENT_EVENTS_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    now = datetime.utcnow()
+                    if now > close_at:
+                        return
+                    if now <= expires_at:
+                        yield ": ping\n\n"
+                        continue
+                    item = RESYNC
+                
+                if item is RESYNC:
+                    current = await asyncio.to_thread(_load_payment_status, payment_id)
+                    if current is None:
+                        return
+                    item = current[0]
+                
+                if item != payment_status:
+                    payment_status = item
+                    yield _sse_event(payment_id, payment_status)
+        finally:
+            payment_status_hub.release(payment_id, queue)
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers=_STREAM_HEADERS,
+        background=release
+    )
+
+@router.get("/durum-bekle/{payment_id}", summary="Ödeme durumu bekle (long-poll)")
+async def wait_payment_status(
+    payment_id: int,
+    imza: str = Query(...),
+    durum: Optional[PaymentStatus] = Query(None, description="İstemcinin bildiği durum"),
+    timeout: float = Query(settings.PAYMENT_EVENTS_LONG_POLL_SECONDS, gt=0, le=60)
+):
+    """
+    Durum istemcinin bildiği durumdan farklı olana kadar (veya timeout) bekle
+    
+    EventSource kullanılamayan tarayıcılar için; yanıt gelince aynı istek
+    son durumla tekrar yapılır.
+    """
+    _check_status_access(payment_id, imza)
+    
+    queue = _subscribe_status(payment_id)
+    try:
+        current = await asyncio.to_thread(_load_payment_status, payment_id)
+        if current is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Ödeme talebi bulunamadı"
+            )
+        payment_status = current[0]
+        
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while payment_status == durum and payment_status not in TERMINAL_STATUSES:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                item = await asyncio.wait_for(queue.get(), remaining)
+            except asyncio.TimeoutError:
+                break
+            
+            if item is RESYNC:
+                current = await asyncio.to_thread(_load_payment_status, payment_id)
+                if current is None:
+                    break
+                item = current[0]
+            payment_status = item
+    finally:
+        payment_status_hub.release(payment_id, queue)
+    
+    return JSONResponse(
+        {"payment_id": payment_id, "status": payment_status.value, "changed": payment_status != durum},
+        headers=_STATUS_HEADERS
+    )
 
 @router.get("/siparis/{order_id}", response_model=PaymentRequestDetail, summary="Sipariş ID ile ödeme sorgula")
 async def get_payment_by_order_id(
@@ -273,26 +452,36 @@ async def cancel_payment(
             detail="Ödeme bulunamadı"
         )
     
-    if payment.status != PaymentStatus.PENDING:
+    # Ödemeyi iptal et (koşullu güncelleme: monitor aynı anda onaylamışsa iptal edilmez)
+    cancelled = db.query(PaymentRequest).filter(
+        PaymentRequest.id == payment.id,
+        PaymentRequest.status == PaymentStatus.PENDING
+    ).update({"status": PaymentStatus.FAILED}, synchronize_session=False)
+    if cancelled:
+        payment_status_hub.notify(db, [payment.id], PaymentStatus.FAILED)
+    db.commit()
+    
+    if not cancelled:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Sadece bekleyen ödemeler iptal edilebilir"
         )
     
-    # Ödemeyi iptal et
-    payment.status = PaymentStatus.FAILED
-    db.commit()
-    
     return {"message": "Ödeme iptal edildi"}
 
 @router.get("/qr/{payment_id}", summary="QR kod al")
 async def get_payment_qr(
     payment_id: int,
+    qr_format: str = Query("png", alias="format", pattern="^(png|svg|matrix)$"),
     current_user: User = Depends(get_api_user),
     db: Session = Depends(get_db)
 ):
     """
     Ödeme için QR kod oluştur
+    
+    format: png (data URI), svg (data URI, PIL kullanılmaz) veya matrix
+    ("0"/"1" satırları). image_path tarayıcıların doğrudan yükleyip
+    önbellekleyebileceği görsel yoludur (API kök adresine göre).
     """
     payment = db.query(PaymentRequest).filter(
         PaymentRequest.id == payment_id,
@@ -305,16 +494,53 @@ async def get_payment_qr(
             detail="Ödeme bulunamadı"
         )
     
-    # QR kod oluştur
-    qr_code_data = CryptoService.generate_payment_qr(
+    # QR kod (önbellekten veya süreç havuzunda üretilir)
+    amount = float(payment.amount)
+    qr_code_data = await payment_qr_service.render(
         payment.payment_address,
-        float(payment.amount),
-        payment.currency
+        amount,
+        qr_format,
+        payment.expires_at
     )
     
     return {
         "qr_code": qr_code_data,
+        "format": qr_format,
+        "image_path": payment_qr_service.image_path(payment.payment_address, amount),
         "payment_address": payment.payment_address,
         "amount": payment.amount,
         "currency": payment.currency
-    } 
\ No newline at end of file
+    }
+
+@router.get("/qr-gorsel/{address}", summary="QR kod görseli")
+async def get_payment_qr_image(
+    address: str,
+    request: Request,
+    amount: float = Query(...),
+    imza: str = Query(...),
+    qr_format: str = Query("svg", alias="format", pattern="^(png|svg)$")
+):
+    """
+    QR kod görseli (<img src> için, kimlik doğrulaması gerektirmez)
+    
+    URL /qr/{payment_id} yanıtındaki image_path ile imzalı olarak verilir.
+    İçerik sadece adres ve tutara bağlı olduğundan tarayıcı ve CDN'ler
+    uzun süre önbellekleyebilir; If-None-Match ile gelen istek görsel
+    üretilmeden 304 döner.
+    """
+    if not CryptoService.validate_tron_address(address) or not payment_qr_service.verify_image_signature(address, amount, imza):
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="QR kod bulunamadı"
+        )
+    
+    headers = {
+        "ETag": payment_qr_service.image_etag(address, amount, qr_format),
+        "Cache-Control": f"public, max-age={settings.QR_IMAGE_MAX_AGE_SECONDS}, immutable"
+    }
+    
+    if headers["ETag"] in request.headers.get("if-none-match", ""):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    
+    content = await payment_qr_service.render_image(address, amount, qr_format)
+    return Response(content=content, media_type=QR_IMAGE_MEDIA_TYPES[qr_format], headers=headers) 
\ No newline at end of file
@@ -1,11 +1,18 @@
 from typing import List
+from datetime import datetime
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy.orm import Session, selectinload
 
-from app.api.deps import get_db, get_current_active_user
-from app.db.models import User, MerchantWallet, APIKey
-from app.schemas.payment import WalletCreate, WalletResponse, APIKeyCreate, APIKeyResponse, APIKeyList
+from app.api.deps import get_db, get_current_active_user, require_admin
+from app.db.models import User, MerchantWallet, APIKey, MerchantWebhookSettings, WebhookReplayJob, WebhookReplayStatus
+from app.schemas.payment import (
+    WalletCreate, WalletResponse, APIKeyCreate, APIKeyResponse, APIKeyList,
+    WebhookSettingsUpdate, WebhookSettingsResponse, WebhookReplayCreate, WebhookReplayResponse
+)
 from app.services.crypto import CryptoService
+from app.services.api_key_cache import api_key_cache
+from app.core.config import settings
+from app.core.executors import cpu_thread_pool
 from app.core.security import generate_api_key, generate_secret_key, get_password_hash
 
 router = APIRouter()
@@ -40,7 +47,8 @@ async def create_wallet(
     
     # Test adresi oluşturmayı dene
     try:
-        test_address = CryptoService.derive_address_from_xpub(
+        test_address = await cpu_thread_pool.run(
+            CryptoService.derive_address_from_xpub,
             wallet_data.xpub_key, 
             0, 
             wallet_data.derivation_path
@@ -182,7 +190,8 @@ async def generate_test_address(
     
     # Test adresi oluştur
     try:
-        test_address = CryptoService.derive_address_from_xpub(
+        test_address = await cpu_thread_pool.run(
+            CryptoService.derive_address_from_xpub,
             wallet.xpub_key, 
             0,  # Test için index 0 kullan
             wallet.derivation_path
@@ -213,7 +222,7 @@ async def create_api_key(
     # API anahtarı ve secret oluştur
     api_key = generate_api_key()
     secret_key = generate_secret_key()
-    secret_hash = get_password_hash(secret_key)
+    secret_hash = await cpu_thread_pool.run(get_password_hash, secret_key)
     
     # API anahtarını veritabanına kaydet
     new_api_key = APIKey(
@@ -247,7 +256,9 @@ async def list_api_keys(
     """
     Kullanıcının API anahtarlarını listele
     """
-    api_keys = db.query(APIKey).filter(
+    api_keys = db.query(APIKey).options(
+        selectinload(APIKey.usage)
+    ).filter(
         APIKey.user_id == current_user.id
     ).order_by(APIKey.created_at.desc()).all()
     
@@ -277,6 +288,7 @@ async def toggle_api_key_status(
     
     api_key.is_active = is_active
     db.commit()
+    api_key_cache.invalidate(api_key.api_key)
     
     status_text = "aktif" if is_active else "pasif"
     return {"message": f"API anahtarı {status_text} hale getirildi"}
@@ -304,5 +316,230 @@ async def delete_api_key(
     
     db.delete(api_key)
     db.commit()
+    api_key_cache.invalidate(api_key.api_key)
     
-    return {"message": "API anahtarı silindi"} 
\ No newline at end of file
+    return {"message": "API anahtarı silindi"} 
+
+# Webhook Ayarları
+@router.get("/webhook/ayarlar", response_model=WebhookSettingsResponse, summary="Webhook ayarları")
+async def get_webhook_settings(
+    current_user: User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Kullanıcının webhook gönderim ayarları
+    """
+    webhook_settings = db.query(MerchantWebhookSettings).filter(
+        MerchantWebhookSettings.user_id == current_user.id
+    ).first()
+    
+    if not webhook_settings:
+        # Varsayılan: her onay için ayrı istek
+        return WebhookSettingsResponse(batch_enabled=False, batch_window_seconds=5)
+    
+    return webhook_settings
+
+@router.put("/webhook/ayarlar", response_model=WebhookSettingsResponse, summary="Webhook ayarlarını güncelle")
+async def update_webhook_settings(
+    settings_data: WebhookSettingsUpdate,
+    current_user: User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Toplu gönderim modunu aç/kapat
+    
+    Açıkken aynı webhook URL'ine giden onaylar batch_window_seconds boyunca
+    biriktirilir ve tek bir imzalı istekte (event: payment.batch) gönderilir.
+    """
+    webhook_settings = db.query(MerchantWebhookSettings).filter(
+        MerchantWebhookSettings.user_id == current_user.id
+    ).first()
+    
+    if not webhook_settings:
+        webhook_settings = MerchantWebhookSettings(user_id=current_user.id)
+        db.add(webhook_settings)
+    
+    webhook_settings.batch_enabled = settings_data.batch_enabled
+    webhook_settings.batch_window_seconds = settings_data.batch_window_seconds
+    db.commit()
+    db.refresh(webhook_settings)
+    
+    from app.services.webhook import webhook_service
+    webhook_service.invalidate_batch_window(current_user.id)
+    
+    return webhook_settings
+
+# Webhook Yeniden Gönderimi
+@router.post("/webhook/tekrar-gonder", response_model=WebhookReplayResponse, summary="Toplu webhook yeniden gönderimi başlat")
+async def create_webhook_replay(
+    replay_data: WebhookReplayCreate,
+    current_user: User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Kesinti sonrası teslim edilmemiş webhook'ları yeniden gönder
+    
+    Verilen aralıkta onaylanmış ve webhook'u teslim edilmemiş tüm ödemeler
+    arka planda, saniyede en fazla rate_per_second ödeme olacak şekilde
+    yeniden kuyruğa alınır. İlerleme iş kaydından takip edilir.
+    """
+    from app.services.webhook_replay import replay_candidates
+    
+    if (replay_data.confirmed_from and replay_data.confirmed_to
+            and replay_data.confirmed_from >= replay_data.confirmed_to):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Başlangıç zamanı bitiş zamanından önce olmalıdır"
+        )
+    
+    active_job = db.query(WebhookReplayJob).filter(
+        WebhookReplayJob.merchant_id == current_user.id,
+        WebhookReplayJob.status.in_([WebhookReplayStatus.PENDING, WebhookReplayStatus.RUNNING])
+    ).first()
+    
+    if active_job:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail=f"Devam eden bir yeniden gönderim işi var: {active_job.id}"
+        )
+    
+    total = replay_candidates(
+        db, current_user.id, replay_data.confirmed_from, replay_data.confirmed_to
+    ).count()
+    
+    job = WebhookReplayJob(
+        merchant_id=current_user.id,
+        confirmed_from=replay_data.confirmed_from,
+        confirmed_to=replay_data.confirmed_to,
+        rate_per_second=replay_data.rate_per_second or settings.WEBHOOK_REPLAY_RATE_PER_SECOND,
+        status=WebhookReplayStatus.PENDING,
+        total=total,
+        processed=0,
+        requeued=0,
+        skipped=0,
+        last_payment_id=0
+    )
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+    
+    return job
+
+@router.get("/webhook/tekrar-gonder", response_model=List[WebhookReplayResponse], summary="Yeniden gönderim işleri")
+async def list_webhook_replays(
+    current_user: User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Kullanıcının son yeniden gönderim işleri
+    """
+    return db.query(WebhookReplayJob).filter(
+        WebhookReplayJob.merchant_id == current_user.id
+    ).order_by(WebhookReplayJob.id.desc()).limit(20).all()
+
+@router.get("/webhook/tekrar-gonder/{job_id}", response_model=WebhookReplayResponse, summary="Yeniden gönderim ilerlemesi")
+async def get_webhook_replay(
+    job_id: int,
+    current_user: User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Yeniden gönderim işinin durumu ve ilerlemesi
+    """
+    job = db.query(WebhookReplayJob).filter(
+        WebhookReplayJob.id == job_id,
+        WebhookReplayJob.merchant_id == current_user.id
+    ).first()
+    
+    if not job:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Yeniden gönderim işi bulunamadı"
+        )
+    
+    return job
+
+@router.post("/webhook/tekrar-gonder/{job_id}/iptal", response_model=WebhookReplayResponse, summary="Yeniden gönderimi durdur")
+async def cancel_webhook_replay(
+    job_id: int,
+    current_user: User = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Yeniden gönderim işini durdur
+    Zaten kuyruğa alınmış webhook'lar gönderilmeye devam eder.
+    """
+    job = db.query(WebhookReplayJob).filter(
+        WebhookReplayJob.id == job_id,
+        WebhookReplayJob.merchant_id == current_user.id
+    ).with_for_update().first()
+    
+    if not job:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Yeniden gönderim işi bulunamadı"
+        )
+    
+    if job.status not in (WebhookReplayStatus.PENDING, WebhookReplayStatus.RUNNING):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Sadece bekleyen veya çalışan işler durdurulabilir"
+        )
+    
+    job.status = WebhookReplayStatus.CANCELLED
+    job.finished_at = datetime.utcnow()
+    job.locked_until = None
+    db.commit()
+    db.refresh(job)
+    
+    return job
+
+# Sistem İzleme
+@router.get("/monitor/metrikler", summary="Blockchain monitor metrikleri")
+async def get_monitor_metrics(
+    current_user: User = Depends(require_admin),
+    db: Session = Depends(get_db)
+):
+    """
+    Blockchain monitor döngü süresi, kuyruk derinliği ve hız sınırı metrikleri (Admin)
+    Monitor API sürecinde veya ayrı worker süreçlerinde çalışabildiği için her canlı
+    monitor worker'ının son yayınladığı anlık görüntü listelenir.
+    """
+    from app.services.worker_metrics import worker_metrics_store, MONITOR_METRICS_ROLE
+    
+    return {"workers": worker_metrics_store.load(db, MONITOR_METRICS_ROLE)}
+
+@router.get("/executor/metrikler", summary="CPU havuzu metrikleri")
+async def get_executor_metrics(
+    current_user: User = Depends(require_admin)
+):
+    """
+    Bu API sürecindeki CPU havuzlarının kuyruk bekleme ve çalışma süreleri
+    ile önbellek isabet oranları ve açık ödeme durumu bağlantıları (Admin)
+    """
+    from app.core.executors import executor_snapshot
+    from app.services.payment_qr import payment_qr_service
+    from app.services.user_cache import user_principal_cache
+    from app.services.payment_events import payment_status_hub
+    
+    return {
+        "executors": executor_snapshot(),
+        "qr_cache": payment_qr_service.stats(),
+        "api_key_cache": api_key_cache.stats(),
+        "user_cache": user_principal_cache.stats(),
+        "payment_events": payment_status_hub.stats()
+    }
+
+@router.get("/webhook/metrikler", summary="Webhook host metrikleri")
+async def get_webhook_metrics(
+    current_user: User = Depends(require_admin),
+    db: Session = Depends(get_db)
+):
+    """
+    Merchant host'u başına webhook gecikmesi, hata oranı ve circuit breaker durumu (Admin)
+    Her canlı delivery worker'ının (gömülü veya worker.py) son yayınladığı değerler
+    listelenir; her worker'da en yavaş host önce gelir.
+    """
+    from app.services.worker_metrics import worker_metrics_store, WEBHOOK_METRICS_ROLE
+    
+    return {"workers": worker_metrics_store.load(db, WEBHOOK_METRICS_ROLE)} 
\ No newline at end of file
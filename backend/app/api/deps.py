@@ -7,7 +7,11 @@ from jose import jwt, JWTError
 from app.db.database import SessionLocal
 from app.db.models import User, APIKey
 from app.core.config import settings
+from app.core.executors import cpu_thread_pool
 from app.core.security import verify_token, AuthenticationError, verify_api_credentials
+from app.services.api_key_cache import api_key_cache
+from app.services.api_key_usage import api_key_usage_recorder
+from app.services.user_cache import user_principal_cache
 
 # Security schemes
 bearer_scheme = HTTPBearer(auto_error=False)
@@ -42,6 +46,11 @@ async def get_current_user(
     if not email:
         raise AuthenticationError("Geçersiz token payload")
     
+    # Yakın zamanda çözülmüş aktif kullanıcı ise sorgu yapılmaz
+    cached_user = user_principal_cache.get(db, email)
+    if cached_user is not None:
+        return cached_user
+    
     # Kullanıcıyı database'den al
     user = db.query(User).filter(User.email == email).first()
     if not user:
@@ -50,6 +59,8 @@ async def get_current_user(
     if not user.is_active:
         raise AuthenticationError("Hesap deaktif")
     
+    user_principal_cache.set(user)
+    
     return user
 
 async def get_current_active_user(
@@ -90,6 +101,13 @@ async def get_api_user(
     except (IndexError, ValueError):
         raise AuthenticationError("Geçersiz API anahtarı formatı")
     
+    # Yakın zamanda doğrulanmış credential ise bcrypt ve sorgular atlanır
+    cached = api_key_cache.get(db, api_key, secret_key)
+    if cached is not None:
+        api_key_id, cached_user = cached
+        api_key_usage_recorder.record(api_key_id)
+        return cached_user
+    
     # API anahtarını database'den al
     api_key_obj = db.query(APIKey).filter(
         APIKey.api_key == api_key,
@@ -100,7 +118,9 @@ async def get_api_user(
         raise AuthenticationError("Geçersiz API anahtarı")
     
     # Secret key'i doğrula
-    if not verify_api_credentials(api_key, secret_key, api_key_obj.api_key, api_key_obj.secret_key_hash):
+    if not await cpu_thread_pool.run(
+        verify_api_credentials, api_key, secret_key, api_key_obj.api_key, api_key_obj.secret_key_hash
+    ):
         raise AuthenticationError("Geçersiz API credentials")
     
     # Kullanıcıyı al
@@ -108,10 +128,10 @@ async def get_api_user(
     if not user or not user.is_active:
         raise AuthenticationError("Kullanıcı bulunamadı veya deaktif")
     
-    # Last used timestamp'i güncelle
-    from datetime import datetime
-    api_key_obj.last_used_at = datetime.utcnow()
-    db.commit()
+    api_key_cache.set(api_key, secret_key, api_key_obj.id, user)
+    
+    # last_used_at ve istek sayacı bellekte biriktirilip periyodik olarak yazılır
+    api_key_usage_recorder.record(api_key_obj.id)
     
     return user
 
@@ -0,0 +1,142 @@
+import asyncio
+import multiprocessing
+import threading
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Optional
+import logging
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+def _timed_call(func: Callable, args: tuple, kwargs: dict) -> tuple:
+    """
+    İşi çalıştır ve başladığı anı döndür (süreç havuzunda da çalışması için modül seviyesinde)
+    Süreçler arası karşılaştırılabilmesi için duvar saati kullanılır.
+    """
+    return time.time(), func(*args, **kwargs)
+
+class ExecutorStats:
+    """
+    Executor bazında kuyrukta bekleme ve çalışma süreleri
+    """
+
+    def __init__(self):
+        self.completed = 0
+        self.failed = 0
+        self.in_flight = 0
+        self.total_queue_time = 0.0
+        self.max_queue_time = 0.0
+        self.ewma_queue_time: Optional[float] = None
+        self.total_run_time = 0.0
+
+    def record(self, queue_time: float, run_time: float):
+        self.completed += 1
+        self.total_queue_time += queue_time
+        self.max_queue_time = max(self.max_queue_time, queue_time)
+        self.ewma_queue_time = queue_time if self.ewma_queue_time is None else 0.8 * self.ewma_queue_time + 0.2 * queue_time
+        self.total_run_time += run_time
+
+class InstrumentedExecutor:
+    """
+    CPU yoğun işler için event loop dışı executor
+
+    Havuz ilk kullanımda oluşturulur. Her iş için kuyrukta bekleme (gönderim
+    ile başlama arası) ve çalışma süresi ölçülür; bekleme süresinin artması
+    havuzun küçük kaldığını gösterir.
+    """
+
+    def __init__(self, name: str, factory: Callable[[], Executor], max_workers: int):
+        self.name = name
+        self.max_workers = max_workers
+        self.stats = ExecutorStats()
+        self._factory = factory
+        self._executor: Optional[Executor] = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self) -> Executor:
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = self._factory()
+        return self._executor
+
+    async def run(self, func: Callable, *args, **kwargs) -> Any:
+        """
+        func'ı havuzda çalıştır ve sonucu bekle
+        Süreç havuzunda func ve argümanları pickle edilebilir olmalıdır.
+        """
+        loop = asyncio.get_running_loop()
+        submitted = time.time()
+        self.stats.in_flight += 1
+        try:
+            started, result = await loop.run_in_executor(
+                self._get_executor(), _timed_call, func, args, kwargs
+            )
+        except Exception:
+            self.stats.failed += 1
+            raise
+        finally:
+            self.stats.in_flight -= 1
+
+        self.stats.record(max(started - submitted, 0.0), time.time() - started)
+        return result
+
+    def snapshot(self) -> dict:
+        stats = self.stats
+        return {
+            "name": self.name,
+            "max_workers": self.max_workers,
+            "started": self._executor is not None,
+            "in_flight": stats.in_flight,
+            "completed": stats.completed,
+            "failed": stats.failed,
+            "avg_queue_ms": round(stats.total_queue_time / stats.completed * 1000, 2) if stats.completed else None,
+            "ewma_queue_ms": round(stats.ewma_queue_time * 1000, 2) if stats.ewma_queue_time is not None else None,
+            "max_queue_ms": round(stats.max_queue_time * 1000, 2),
+            "avg_run_ms": round(stats.total_run_time / stats.completed * 1000, 2) if stats.completed else None
+        }
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False, cancel_futures=True)
+                self._executor = None
+
+# GIL'i bırakan işler (bcrypt, libsecp256k1, zlib/PNG sıkıştırma)
+cpu_thread_pool = InstrumentedExecutor(
+    "thread",
+    lambda: ThreadPoolExecutor(max_workers=settings.CPU_THREAD_POOL_SIZE, thread_name_prefix="cpu"),
+    settings.CPU_THREAD_POOL_SIZE
+)
+
+# Saf Python işler (QR matris üretimi); CPU_PROCESS_POOL_SIZE=0 ise thread havuzu kullanılır
+if settings.CPU_PROCESS_POOL_SIZE > 0:
+    cpu_process_pool = InstrumentedExecutor(
+        "process",
+        # spawn: API sürecinin thread'leri ve DB bağlantıları fork ile kopyalanmaz
+        lambda: ProcessPoolExecutor(
+            max_workers=settings.CPU_PROCESS_POOL_SIZE,
+            mp_context=multiprocessing.get_context("spawn")
+        ),
+        settings.CPU_PROCESS_POOL_SIZE
+    )
+else:
+    cpu_process_pool = cpu_thread_pool
+
+def executor_snapshot() -> list:
+    """
+    Tüm executor'ların metrikleri
+    """
+    pools = [cpu_thread_pool]
+    if cpu_process_pool is not cpu_thread_pool:
+        pools.append(cpu_process_pool)
+    return [pool.snapshot() for pool in pools]
+
+def shutdown_executors():
+    """
+    Uygulama kapanırken havuzları kapat
+    """
+    cpu_thread_pool.shutdown()
+    cpu_process_pool.shutdown()
@@ -5,6 +5,9 @@ from passlib.context import CryptContext
 from fastapi import HTTPException, status
 import secrets
 import string
+import hmac
+import hashlib
+from functools import lru_cache
 from app.core.config import settings
 
 # Password hashing context
@@ -88,22 +91,27 @@ def verify_api_credentials(api_key: str, secret_key: str, stored_api_key: str, s
     # Secret key kontrolü - hash karşılaştırma
     return verify_password(secret_key, stored_secret_hash)
 
-def create_webhook_signature(payload: str, secret: str) -> str:
+@lru_cache(maxsize=16)
+def _webhook_hmac_key(secret: str) -> "hmac.HMAC":
+    """
+    Secret ile anahtarlanmış HMAC nesnesi (anahtar hazırlığı bir kez yapılır,
+    her imzada copy() ile kullanılır)
+    """
+    return hmac.new(secret.encode('utf-8'), digestmod=hashlib.sha256)
+
+def create_webhook_signature(payload: Union[str, bytes], secret: str) -> str:
     """
     Webhook için HMAC imzası oluştur
     """
-    import hmac
-    import hashlib
+    if isinstance(payload, str):
+        payload = payload.encode('utf-8')
     
-    signature = hmac.new(
-        secret.encode('utf-8'),
-        payload.encode('utf-8'),
-        hashlib.sha256
-    ).hexdigest()
+    mac = _webhook_hmac_key(secret).copy()
+    mac.update(payload)
     
-    return f"sha256={signature}"
+    return f"sha256={mac.hexdigest()}"
 
-def verify_webhook_signature(payload: str, signature: str, secret: str) -> bool:
+def verify_webhook_signature(payload: Union[str, bytes], signature: str, secret: str) -> bool:
     """
     Webhook imzasını doğrula
     """
@@ -11,6 +11,8 @@ engine = create_engine(
     settings.DATABASE_URL,
     pool_pre_ping=True,
     pool_recycle=300,
+    pool_size=settings.DB_POOL_SIZE,
+    max_overflow=settings.DB_MAX_OVERFLOW,
     echo=settings.ENVIRONMENT == "development"  # Development'ta SQL loglarını göster
 )
 
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, Boolean, Text, ForeignKey, Numeric, Enum
+from sqlalchemy import Column, Integer, BigInteger, String, DateTime, Boolean, Text, ForeignKey, Numeric, Enum, UniqueConstraint
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from app.db.database import Base
@@ -21,6 +21,18 @@ class TransactionStatus(str, enum.Enum):
     CONFIRMED = "confirmed"
     FAILED = "failed"
 
+class WebhookDeliveryStatus(str, enum.Enum):
+    PENDING = "pending"           # Gönderim bekliyor (veya tekrar denenecek)
+    DELIVERING = "delivering"     # Bir delivery worker tarafından alındı
+    DELIVERED = "delivered"       # Merchant 2xx döndü
+    FAILED = "failed"             # Tüm denemeler başarısız
+
+class WebhookReplayStatus(str, enum.Enum):
+    PENDING = "pending"           # Worker tarafından alınmayı bekliyor
+    RUNNING = "running"           # İşleniyor (kaldığı yerden devam edebilir)
+    COMPLETED = "completed"       # Tüm ödemeler kuyruğa alındı
+    CANCELLED = "cancelled"       # Merchant tarafından durduruldu
+
 # Satıcı (Merchant) kullanıcıları
 class User(Base):
     __tablename__ = "users"
@@ -52,7 +64,7 @@ class MerchantWallet(Base):
     xpub_key = Column(Text, nullable=False)  # Extended Public Key
     network = Column(String(50), default="tron")  # tron, ethereum vs.
     derivation_path = Column(String(100), default="m/44'/195'/0'/0")  # TRON derivation path
-    address_index = Column(Integer, default=0)  # Son kullanılan adres indexi
+    address_index = Column(Integer, default=0)  # Son ayrılan adres indexi (ödemeye veya adres havuzuna)
     is_active = Column(Boolean, default=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
@@ -60,6 +72,7 @@ class MerchantWallet(Base):
     # İlişkiler
     user = relationship("User", back_populates="wallets")
     payment_requests = relationship("PaymentRequest", back_populates="wallet")
+    pool_addresses = relationship("WalletAddress", cascade="all, delete-orphan", passive_deletes=True)
 
 # API Anahtarları
 class APIKey(Base):
@@ -76,6 +89,11 @@ class APIKey(Base):
     
     # İlişkiler
     user = relationship("User", back_populates="api_keys")
+    usage = relationship("APIKeyUsage", uselist=False, cascade="all, delete-orphan", passive_deletes=True)
+    
+    @property
+    def request_count(self) -> int:
+        return self.usage.request_count if self.usage is not None else 0
 
 # Ödeme talepleri
 class PaymentRequest(Base):
@@ -144,4 +162,141 @@ class Transaction(Base):
     confirmed_at = Column(DateTime(timezone=True), nullable=True)
     
     # İlişkiler
-    payment_request = relationship("PaymentRequest", back_populates="transactions") 
\ No newline at end of file
+    payment_request = relationship("PaymentRequest", back_populates="transactions")
+
+# Blockchain tarama imleçleri (monitor yeniden başlatıldığında kaldığı yerden devam eder)
+class MonitorCursor(Base):
+    __tablename__ = "monitor_cursors"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    cursor_key = Column(String(255), unique=True, index=True, nullable=False)  # Örn: "usdt_transfer_events"
+    
+    # Son işlenen konum
+    block_number = Column(BigInteger, nullable=True)
+    block_timestamp = Column(BigInteger, nullable=True)  # Milisaniye (TronGrid formatı)
+    fingerprint = Column(String(255), nullable=True)  # TronGrid sayfalama imleci
+    
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+# Monitor worker kayıtları (heartbeat ile canlılık takibi ve shard dağıtımı)
+class MonitorWorker(Base):
+    __tablename__ = "monitor_workers"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    worker_id = Column(String(255), unique=True, index=True, nullable=False)  # hostname:pid:rastgele
+    hostname = Column(String(255), nullable=True)
+    started_at = Column(DateTime(timezone=True), server_default=func.now())
+    last_heartbeat_at = Column(DateTime(timezone=True), nullable=False, index=True)
+
+# Worker metrik anlık görüntüleri (worker'lar API'den ayrı süreçlerde çalışabildiği için tabloda paylaşılır)
+class WorkerMetrics(Base):
+    __tablename__ = "worker_metrics"
+    __table_args__ = (
+        UniqueConstraint("worker_id", "role", name="uq_worker_metrics_worker_role"),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    worker_id = Column(String(255), nullable=False)  # hostname:pid:rastgele
+    role = Column(String(50), nullable=False, index=True)  # "monitor" veya "webhooks"
+    metrics = Column(Text, nullable=False)  # JSON anlık görüntü
+    updated_at = Column(DateTime(timezone=True), nullable=False, index=True)
+
+# Webhook outbox (onayla aynı transaction'da yazılır, delivery worker'lar tarafından gönderilir)
+class WebhookOutbox(Base):
+    __tablename__ = "webhook_outbox"
+    __table_args__ = (
+        UniqueConstraint("payment_request_id", "event", name="uq_webhook_outbox_payment_event"),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    payment_request_id = Column(Integer, ForeignKey("payment_requests.id"), nullable=False)
+    event = Column(String(100), nullable=False)  # Örn: "payment.confirmed"
+    webhook_url = Column(String(500), nullable=False)
+    payload = Column(Text, nullable=False)  # Kanonik JSON, kayıt anında bir kez oluşturulur
+    payload_timestamp = Column(String(64), nullable=True)  # X-PayKript-Timestamp başlığı
+    signature = Column(String(128), nullable=True)  # payload'ın HMAC imzası (tekrar denemelerde aynen gönderilir)
+    batch_key = Column(String(600), nullable=True, index=True)  # Toplu gönderim modunda "merchant_id:webhook_url"
+    
+    # Teslim durumu
+    status = Column(Enum(WebhookDeliveryStatus), default=WebhookDeliveryStatus.PENDING, index=True)
+    attempts = Column(Integer, default=0)
+    next_attempt_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
+    locked_until = Column(DateTime(timezone=True), nullable=True)  # Worker kirası, süresi geçerse tekrar alınır
+    last_error = Column(Text, nullable=True)
+    
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    delivered_at = Column(DateTime(timezone=True), nullable=True)
+
+# Merchant webhook tercihleri (toplu gönderim modu)
+class MerchantWebhookSettings(Base):
+    __tablename__ = "merchant_webhook_settings"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), unique=True, nullable=False)
+    batch_enabled = Column(Boolean, default=False)  # Aynı URL'e giden onaylar tek istekte gönderilir
+    batch_window_seconds = Column(Integer, default=5)  # Onayların biriktirildiği süre
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+
+# Webhook gönderim denemeleri (her HTTP isteği için bir satır)
+class WebhookDeliveryLog(Base):
+    __tablename__ = "webhook_delivery_logs"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    outbox_id = Column(Integer, ForeignKey("webhook_outbox.id"), nullable=False, index=True)
+    payment_request_id = Column(Integer, ForeignKey("payment_requests.id"), nullable=False, index=True)
+    attempt = Column(Integer, nullable=False)
+    
+    success = Column(Boolean, default=False)
+    status_code = Column(Integer, nullable=True)  # Ağ hatasında boş
+    latency_ms = Column(Integer, nullable=True)
+    error = Column(Text, nullable=True)
+    response_snippet = Column(Text, nullable=True)  # Yanıt gövdesinin ilk karakterleri
+    
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+# Toplu webhook yeniden gönderim işleri (kesinti sonrası replay)
+class WebhookReplayJob(Base):
+    __tablename__ = "webhook_replay_jobs"
+    
+    id = Column(Integer, primary_key=True, index=True)
+    merchant_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    
+    # Filtre: bu aralıkta onaylanmış ve webhook'u teslim edilmemiş ödemeler
+    confirmed_from = Column(DateTime(timezone=True), nullable=True)
+    confirmed_to = Column(DateTime(timezone=True), nullable=True)
+    rate_per_second = Column(Integer, nullable=False)  # Saniyede kuyruğa alınacak en fazla ödeme
+    
+    # Durum ve ilerleme
+    status = Column(Enum(WebhookReplayStatus), default=WebhookReplayStatus.PENDING, index=True)
+    total = Column(Integer, default=0)  # İş oluşturulurken eşleşen ödeme sayısı
+    processed = Column(Integer, default=0)
+    requeued = Column(Integer, default=0)
+    skipped = Column(Integer, default=0)  # Gönderimi sürmekte olan veya transaction'ı bulunmayan ödemeler
+    last_payment_id = Column(Integer, default=0)  # Devam imleci (bu id'ye kadar işlendi)
+    locked_until = Column(DateTime(timezone=True), nullable=True)  # Worker kirası, süresi geçerse iş devralınır
+    
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    started_at = Column(DateTime(timezone=True), nullable=True)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+
+# Önceden türetilmiş, henüz kullanılmamış ödeme adresleri (checkout havuzdan adres alır)
+class WalletAddress(Base):
+    __tablename__ = "wallet_addresses"
+    __table_args__ = (
+        UniqueConstraint("wallet_id", "address_index", name="uq_wallet_addresses_wallet_index"),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    wallet_id = Column(Integer, ForeignKey("merchant_wallets.id", ondelete="CASCADE"), nullable=False, index=True)
+    address_index = Column(Integer, nullable=False)
+    address = Column(String(255), nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+# API anahtarı kullanım sayaçları (API süreçleri bellekte biriktirip periyodik olarak toplu yazar)
+class APIKeyUsage(Base):
+    __tablename__ = "api_key_usage"
+    
+    api_key_id = Column(Integer, ForeignKey("api_keys.id", ondelete="CASCADE"), primary_key=True)
+    request_count = Column(BigInteger, default=0, nullable=False)
+    last_used_at = Column(DateTime(timezone=True), nullable=True) 
\ No newline at end of file
@@ -1,8 +1,9 @@
-from pydantic import BaseModel, field_validator
+from pydantic import BaseModel, computed_field, field_validator
 from typing import Optional, List
 from datetime import datetime
 from decimal import Decimal
-from app.db.models import PaymentStatus, TransactionStatus
+from app.core.config import settings
+from app.db.models import PaymentStatus, TransactionStatus, WebhookReplayStatus
 
 # Payment Request schemas
 class PaymentRequestCreate(BaseModel):
@@ -40,10 +41,13 @@ class PaymentRequestResponse(BaseModel):
     expires_at: datetime
     created_at: datetime
     qr_code_data: str  # Base64 encoded QR code or QR data string
+    status_stream_path: Optional[str] = None  # Tarayıcı için imzalı SSE yolu
+    status_wait_path: Optional[str] = None  # Tarayıcı için imzalı long-poll yolu
     
     model_config = {"from_attributes": True}
 
 class PaymentRequestDetail(PaymentRequestResponse):
+    qr_code_data: Optional[str] = None  # Modelde saklanmaz; QR kod /odemeler/qr/{id} ile alınır
     merchant_id: int
     wallet_id: int
     address_index: int
@@ -138,6 +142,7 @@ class APIKeyList(BaseModel):
     api_key: str
     is_active: bool
     last_used_at: Optional[datetime] = None
+    request_count: int = 0  # Toplam istek sayısı (periyodik olarak güncellenir)
     created_at: datetime
     
     model_config = {"from_attributes": True}
@@ -156,4 +161,61 @@ class DashboardStats(BaseModel):
     confirmed_payments: int
     total_amount: Decimal
     today_payments: int
-    today_amount: Decimal 
\ No newline at end of file
+    today_amount: Decimal
+
+# Webhook settings schemas
+class WebhookSettingsUpdate(BaseModel):
+    batch_enabled: bool = False
+    batch_window_seconds: int = 5
+    
+    @field_validator('batch_window_seconds')
+    @classmethod
+    def validate_batch_window(cls, v):
+        if v < 1 or v > 300:
+            raise ValueError('Toplu gönderim süresi 1-300 saniye arasında olmalıdır')
+        return v
+
+class WebhookSettingsResponse(BaseModel):
+    batch_enabled: bool
+    batch_window_seconds: int
+    updated_at: Optional[datetime] = None
+    
+    model_config = {"from_attributes": True}
+
+# Webhook replay schemas
+class WebhookReplayCreate(BaseModel):
+    confirmed_from: Optional[datetime] = None
+    confirmed_to: Optional[datetime] = None
+    rate_per_second: Optional[int] = None  # Boşsa sunucu varsayılanı
+    
+    @field_validator('rate_per_second')
+    @classmethod
+    def validate_rate(cls, v):
+        if v is not None and (v < 1 or v > settings.WEBHOOK_REPLAY_MAX_RATE_PER_SECOND):
+            raise ValueError(f'Gönderim hızı 1-{settings.WEBHOOK_REPLAY_MAX_RATE_PER_SECOND} arasında olmalıdır')
+        return v
+
+class WebhookReplayResponse(BaseModel):
+    id: int
+    status: WebhookReplayStatus
+    confirmed_from: Optional[datetime] = None
+    confirmed_to: Optional[datetime] = None
+    rate_per_second: int
+    total: int
+    processed: int
+    requeued: int
+    skipped: int
+    last_payment_id: int
+    created_at: Optional[datetime] = None
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    
+    @computed_field
+    @property
+    def progress(self) -> float:
+        # Replay sürerken teslim edilen ödemeler kapsamdan çıktığından tamamlanan iş %100 sayılır
+        if self.status == WebhookReplayStatus.COMPLETED or not self.total:
+            return 1.0 if self.status == WebhookReplayStatus.COMPLETED else 0.0
+        return round(min(self.processed / self.total, 1.0), 4)
+    
+    model_config = {"from_attributes": True} 
\ No newline at end of file
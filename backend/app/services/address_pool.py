@@ -0,0 +1,163 @@
+import asyncio
+from typing import List, Optional, Tuple
+import logging
+from sqlalchemy import delete, func, insert, select, update
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.database import SessionLocal
+from app.db.models import MerchantWallet, WalletAddress
+from app.services.crypto import CryptoService
+
+logger = logging.getLogger(__name__)
+
+class AddressPool:
+    """
+    Cüzdan başına önceden türetilmiş ödeme adresi havuzu
+
+    Checkout havuzdan tek bir DELETE ... RETURNING ile adres alır; xPub
+    türetmesi istek sırasında yapılmaz. Arka plan doldurucu aktif cüzdanların
+    havuzunu ADDRESS_POOL_REFILL_THRESHOLD'un altına düşünce
+    ADDRESS_POOL_SIZE'a tamamlar.
+
+    Index'ler MerchantWallet.address_index üzerinden ayrılır: doldurucu
+    adresleri türettikten sonra index aralığını koşullu UPDATE ile sahiplenir,
+    başka bir süreç araya girdiyse türettiklerini atar ve sonraki turda
+    tekrar dener. Böylece aynı index iki kez kullanılmaz.
+    """
+
+    def pop(self, db: Session, wallet_id: int) -> Optional[Tuple[str, int]]:
+        """
+        Havuzdan en küçük index'li adresi al (çağıranın transaction'ında)
+
+        Returns:
+            (adres, index); havuz boşsa None
+        """
+        next_id = select(WalletAddress.id).where(
+            WalletAddress.wallet_id == wallet_id
+        ).order_by(
+            WalletAddress.address_index
+        ).limit(1).with_for_update(skip_locked=True).scalar_subquery()
+
+        row = db.execute(
+            delete(WalletAddress)
+            .where(WalletAddress.id == next_id)
+            .returning(WalletAddress.address, WalletAddress.address_index)
+            .execution_options(synchronize_session=False)
+        ).first()
+
+        if row is None:
+            return None
+        return row.address, row.address_index
+
+    def reserve_index(self, db: Session, wallet_id: int) -> int:
+        """
+        Havuz boşken doğrudan türetme için sıradaki index'i ayır (çağıranın transaction'ında)
+        """
+        return db.execute(
+            update(MerchantWallet)
+            .where(MerchantWallet.id == wallet_id)
+            .values(address_index=MerchantWallet.address_index + 1)
+            .returning(MerchantWallet.address_index)
+            .execution_options(synchronize_session=False)
+        ).scalar_one()
+
+    async def run(self):
+        """
+        Aktif cüzdanların havuzlarını sürekli dolu tut
+        """
+        logger.info("Adres havuzu doldurucu başlatılıyor...")
+        while True:
+            try:
+                for wallet_id, available in await asyncio.to_thread(self._wallets_to_fill):
+                    missing = settings.ADDRESS_POOL_SIZE - available
+                    while missing > 0:
+                        added = await asyncio.to_thread(
+                            self._fill, wallet_id, min(missing, settings.ADDRESS_POOL_FILL_BATCH)
+                        )
+                        if not added:
+                            break
+                        missing -= added
+
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Adres havuzu doldurma hatası: {e}")
+
+            await asyncio.sleep(settings.ADDRESS_POOL_CHECK_SECONDS)
+
+    def _wallets_to_fill(self) -> List[Tuple[int, int]]:
+        """
+        Havuzu eşiğin altındaki aktif cüzdanlar: (wallet_id, havuzdaki adres sayısı)
+        """
+        db = SessionLocal()
+        try:
+            available = func.count(WalletAddress.id)
+            rows = db.query(MerchantWallet.id, available).outerjoin(
+                WalletAddress, WalletAddress.wallet_id == MerchantWallet.id
+            ).filter(
+                MerchantWallet.is_active == True
+            ).group_by(
+                MerchantWallet.id
+            ).having(
+                available < settings.ADDRESS_POOL_REFILL_THRESHOLD
+            ).all()
+            return [(wallet_id, count) for wallet_id, count in rows]
+        finally:
+            db.close()
+
+    def _fill(self, wallet_id: int, count: int) -> int:
+        """
+        count adet adres türet ve havuza ekle (senkron, thread pool'da çağrılmalı)
+
+        Returns:
+            int: Eklenen adres sayısı (index aralığı başka süreçte ayrıldıysa 0)
+        """
+        db = SessionLocal()
+        try:
+            wallet = db.query(
+                MerchantWallet.xpub_key,
+                MerchantWallet.address_index
+            ).filter(MerchantWallet.id == wallet_id).first()
+            db.rollback()
+
+            if wallet is None:
+                return 0
+
+            # Türetme transaction dışında yapılır, cüzdan satırı kilitlenmez
+            last_index = wallet.address_index or 0
+            addresses = CryptoService.derive_addresses(wallet.xpub_key, last_index + 1, count)
+            rows = [
+                {"wallet_id": wallet_id, "address_index": last_index + 1 + offset, "address": address}
+                for offset, address in enumerate(addresses)
+            ]
+
+            claimed = db.execute(
+                update(MerchantWallet)
+                .where(
+                    MerchantWallet.id == wallet_id,
+                    MerchantWallet.address_index == wallet.address_index
+                )
+                .values(address_index=last_index + count)
+                .execution_options(synchronize_session=False)
+            ).rowcount
+
+            if not claimed:
+                db.rollback()
+                logger.info(f"Adres index'leri başka süreçte ayrıldı, tekrar denenecek: cüzdan {wallet_id}")
+                return 0
+
+            db.execute(insert(WalletAddress), rows)
+            db.commit()
+
+            logger.info(f"Adres havuzuna {count} adres eklendi: cüzdan {wallet_id}")
+            return count
+
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+# Singleton instance
+address_pool = AddressPool()
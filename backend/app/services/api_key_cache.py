@@ -0,0 +1,79 @@
+import hashlib
+import hmac
+from typing import NamedTuple, Optional, Tuple
+import logging
+from sqlalchemy.orm import Session
+
+from app.core.cache import LRUCache
+from app.core.config import settings
+from app.db.models import APIKey, User
+from app.services.user_cache import attach_user, snapshot_user
+
+logger = logging.getLogger(__name__)
+
+class CachedCredential(NamedTuple):
+    """
+    Doğrulanmış API anahtarı kaydı
+    """
+    secret_digest: str
+    api_key_id: int
+    user: User
+
+class APIKeyCache:
+    """
+    Doğrulanmış API credential önbelleği
+
+    bcrypt doğrulaması başarılı olan (api_key, secret) çifti, secret'ın
+    SECRET_KEY ile anahtarlanmış HMAC'i ve kullanıcının session'dan
+    bağımsız bir kopyasıyla API_KEY_CACHE_TTL_SECONDS boyunca tutulur.
+    Sonraki isteklerde HMAC eşleşirse bcrypt ve veritabanı sorguları
+    atlanır. Anahtar pasif yapıldığında, silindiğinde veya kullanıcının
+    profili güncellendiğinde (deaktivasyon dahil) kayıt hemen çıkarılır
+    (diğer süreçlerde TTL sonunda).
+    """
+
+    def __init__(self):
+        self._cache = LRUCache(settings.API_KEY_CACHE_SIZE, ttl=settings.API_KEY_CACHE_TTL_SECONDS)
+
+    @staticmethod
+    def _digest(api_key: str, secret_key: str) -> str:
+        message = f"{api_key}:{secret_key}".encode("utf-8")
+        return hmac.new(settings.SECRET_KEY.encode("utf-8"), message, hashlib.sha256).hexdigest()
+
+    def get(self, db: Session, api_key: str, secret_key: str) -> Optional[Tuple[int, User]]:
+        """
+        Önbellekteki kullanıcıyı istek session'ına sorgusuz bağla
+
+        Returns:
+            (api_key_id, User); kayıt yoksa veya secret eşleşmiyorsa None
+        """
+        entry: Optional[CachedCredential] = self._cache.get(api_key)
+        if entry is None or not hmac.compare_digest(entry.secret_digest, self._digest(api_key, secret_key)):
+            return None
+
+        return entry.api_key_id, attach_user(db, entry.user)
+
+    def set(self, api_key: str, secret_key: str, api_key_id: int, user: User):
+        """
+        Doğrulanmış credential'ı kullanıcının kolon değerlerinin kopyasıyla önbelleğe al
+        """
+        self._cache.set(api_key, CachedCredential(self._digest(api_key, secret_key), api_key_id, snapshot_user(user)))
+
+    def invalidate(self, api_key: str):
+        """
+        Anahtar pasif yapıldığında veya silindiğinde önbellekten çıkar
+        """
+        self._cache.pop(api_key)
+
+    def invalidate_user(self, db: Session, user_id: int):
+        """
+        Kullanıcının tüm anahtarlarını önbellekten çıkar (kayıtlar kullanıcı kopyası taşır)
+        """
+        for (api_key,) in db.query(APIKey.api_key).filter(APIKey.user_id == user_id):
+            self._cache.pop(api_key)
+
+    def stats(self) -> dict:
+        return self._cache.stats()
+
+# Singleton instance
+api_key_cache = APIKeyCache()
@@ -0,0 +1,193 @@
+import asyncio
+from datetime import datetime
+from typing import Dict, List, Optional
+import logging
+from sqlalchemy import DateTime, Integer, bindparam, cast, column, func, or_, select, update, values
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+
+from app.core.config import settings
+from app.db.database import SessionLocal
+from app.db.models import APIKey, APIKeyUsage
+
+logger = logging.getLogger(__name__)
+
+class _Usage:
+    __slots__ = ("count", "last_used_at")
+
+    def __init__(self):
+        self.count = 0
+        self.last_used_at: Optional[datetime] = None
+
+class APIKeyUsageRecorder:
+    """
+    API anahtarı kullanımlarını bellekte biriktirip toplu yazan arka plan görevi
+
+    get_api_user her istekte sadece bellekteki sayacı artırır; okuma
+    endpoint'leri yazma transaction'ı açmaz. Biriken sayaçlar her
+    API_KEY_USAGE_FLUSH_SECONDS'de bir tek transaction ile yazılır:
+    api_keys.last_used_at tek bir UPDATE ... FROM (VALUES ...), istek
+    sayaçları api_key_usage'a tek bir INSERT ... ON CONFLICT. Yazma sayısı
+    istek hızından bağımsızdır (süreç başına aralık başına bir transaction).
+
+    Süreç çökerse son aralığın sayaçları kaybolur; yazılamayan sayaçlar
+    bir sonraki denemeye eklenir.
+    """
+
+    def __init__(self):
+        self._pending: Dict[int, _Usage] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """
+        Arka plan görevini durdur ve bekleyen sayaçları yaz
+        """
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    def record(self, api_key_id: int):
+        """
+        Kullanımı bellekteki sayaca ekle (bloklamaz, veritabanına gitmez)
+        """
+        usage = self._pending.get(api_key_id)
+        if usage is None:
+            usage = self._pending[api_key_id] = _Usage()
+        usage.count += 1
+        usage.last_used_at = datetime.utcnow()
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(settings.API_KEY_USAGE_FLUSH_SECONDS)
+            await self.flush()
+
+    async def flush(self):
+        if not self._pending:
+            return
+
+        pending, self._pending = self._pending, {}
+        try:
+            await asyncio.to_thread(self._write, pending)
+        except Exception as e:
+            logger.error(f"API anahtarı kullanımları yazılamadı ({len(pending)} anahtar): {e}")
+            self._merge_back(pending)
+
+    def _merge_back(self, pending: Dict[int, _Usage]):
+        """
+        Yazılamayan sayaçları sonraki flush'a ekle
+        """
+        for api_key_id, usage in pending.items():
+            current = self._pending.get(api_key_id)
+            if current is None:
+                self._pending[api_key_id] = usage
+                continue
+            current.count += usage.count
+            current.last_used_at = max(current.last_used_at, usage.last_used_at)
+
+    def _write(self, pending: Dict[int, _Usage]):
+        """
+        Sayaçları tek transaction'da yaz (senkron, thread pool'da çalışır)
+        """
+        rows = [
+            {"id": api_key_id, "count": usage.count, "last_used_at": usage.last_used_at}
+            for api_key_id, usage in pending.items()
+        ]
+
+        db = SessionLocal()
+        try:
+            if db.get_bind().dialect.name == "postgresql":
+                self._write_from_values(db, rows)
+            else:
+                # UPDATE ... FROM (VALUES) desteklenmeyen veritabanları için executemany
+                self._write_executemany(db, rows)
+            db.commit()
+
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    @staticmethod
+    def _write_from_values(db, rows: List[Dict]):
+        v = values(
+            column("id", Integer),
+            column("count", Integer),
+            column("last_used_at", DateTime),
+            name="v"
+        ).data([(row["id"], row["count"], row["last_used_at"]) for row in rows])
+        last_used_at = cast(v.c.last_used_at, APIKey.last_used_at.type)
+
+        db.execute(
+            update(APIKey)
+            .where(
+                APIKey.id == v.c.id,
+                or_(APIKey.last_used_at.is_(None), APIKey.last_used_at < last_used_at)
+            )
+            .values(last_used_at=last_used_at)
+            .execution_options(synchronize_session=False)
+        )
+
+        # Bu arada silinmiş anahtarlar join ile elenir
+        stmt = pg_insert(APIKeyUsage).from_select(
+            ["api_key_id", "request_count", "last_used_at"],
+            select(v.c.id, v.c.count, last_used_at).select_from(
+                v.join(APIKey, APIKey.id == v.c.id)
+            )
+        )
+        db.execute(
+            stmt.on_conflict_do_update(
+                index_elements=[APIKeyUsage.api_key_id],
+                set_={
+                    "request_count": APIKeyUsage.request_count + stmt.excluded.request_count,
+                    "last_used_at": func.greatest(APIKeyUsage.last_used_at, stmt.excluded.last_used_at)
+                }
+            )
+        )
+
+    @staticmethod
+    def _write_executemany(db, rows: List[Dict]):
+        ids = [row["id"] for row in rows]
+        existing_keys = set(db.scalars(select(APIKey.id).where(APIKey.id.in_(ids))))
+        existing_usage = set(db.scalars(select(APIKeyUsage.api_key_id).where(APIKeyUsage.api_key_id.in_(ids))))
+        rows = [row for row in rows if row["id"] in existing_keys]
+        if not rows:
+            return
+
+        params = [{f"b_{key}": value for key, value in row.items()} for row in rows]
+        db.execute(
+            APIKey.__table__.update()
+            .where(APIKey.__table__.c.id == bindparam("b_id"))
+            .values(last_used_at=bindparam("b_last_used_at")),
+            params
+        )
+
+        usage_table = APIKeyUsage.__table__
+        updates = [param for param in params if param["b_id"] in existing_usage]
+        if updates:
+            db.execute(
+                usage_table.update()
+                .where(usage_table.c.api_key_id == bindparam("b_id"))
+                .values(
+                    request_count=usage_table.c.request_count + bindparam("b_count", type_=Integer),
+                    last_used_at=bindparam("b_last_used_at")
+                ),
+                updates
+            )
+
+        inserts = [
+            {"api_key_id": row["id"], "request_count": row["count"], "last_used_at": row["last_used_at"]}
+            for row in rows if row["id"] not in existing_usage
+        ]
+        if inserts:
+            db.execute(usage_table.insert(), inserts)
+
+# Singleton instance
+api_key_usage_recorder = APIKeyUsageRecorder()
@@ -0,0 +1,247 @@
+import asyncio
+import time
+from typing import Dict, List, Optional, Tuple
+import logging
+
+from app.core.config import settings
+from app.db.database import SessionLocal
+from app.db.models import MonitorCursor
+from app.services.blockchain import BlockchainMonitor
+from app.services.crypto import CryptoService
+from app.services.payment_index import PendingPaymentIndex
+
+logger = logging.getLogger(__name__)
+
+class BlockScanMonitor(BlockchainMonitor):
+    """
+    Blok tarama tabanlı izleme servisi
+
+    Her bekleyen adres için ayrı TronGrid sorgusu yapmak yerine USDT kontratının
+    Transfer event akışını kalıcı bir imleçten itibaren okur ve alıcı adresleri
+    bekleyen ödeme indeksindeki adreslerle O(1) eşleştirir. Maliyet açık ödeme
+    sayısıyla değil, zincirdeki transfer hacmiyle ölçeklenir.
+    """
+
+    CURSOR_KEY = "usdt_transfer_events"
+
+    def _rate_limit_share(self) -> float:
+        # Event akışını sadece lider tarar; TronGrid bütçesinin tamamını kullanır
+        return 1.0
+
+    async def _monitor_loop(self):
+        """
+        Blok tarama döngüsü
+        """
+        while True:
+            try:
+                # Event akışını sadece lider worker tarar, diğerleri yedekte bekler
+                if not self.coordinator.is_leader:
+                    await asyncio.sleep(settings.MONITOR_HEARTBEAT_SECONDS)
+                    continue
+
+                scan_started_ms = int(time.time() * 1000)
+                await asyncio.to_thread(self.payment_index.refresh)
+
+                await self.scan_cycle(scan_started_ms)
+
+                # Süresi dolmuş ödemeleri işaretle
+                await self.mark_expired_payments()
+
+                await asyncio.sleep(settings.BLOCK_SCAN_INTERVAL_SECONDS)
+
+            except Exception as e:
+                logger.error(f"Blok tarama döngüsü hatası: {e}")
+                await asyncio.sleep(settings.MONITOR_ERROR_BACKOFF_SECONDS)
+
+    async def scan_cycle(self, scan_started_ms: int):
+        """
+        İmleçten itibaren yeni Transfer event'lerini oku ve bekleyen ödemelerle eşleştir
+        """
+        started = time.monotonic()
+        self.metrics.cycle_started(len(self.payment_index))
+
+        try:
+            if not self.payment_index:
+                # Bekleyen ödeme yoksa taramaya gerek yok, imleci ileri al
+                await asyncio.to_thread(self._save_cursor, scan_started_ms)
+                return
+
+            cursor_ts = await asyncio.to_thread(self._load_cursor)
+            if cursor_ts is None:
+                # İlk çalıştırma: bekleyen ödemelerin tamamını kapsayan pencereden başla
+                cursor_ts = scan_started_ms - settings.PAYMENT_TIMEOUT_MINUTES * 60 * 1000
+
+            current_block = await self.get_current_block_number()
+            events = await self.fetch_transfer_events(cursor_ts)
+
+            matches, next_cursor = self.match_events(events, self.payment_index, current_block, cursor_ts)
+
+            for address, transfers in matches.items():
+                payment = self.payment_index.get(address)
+                if not payment:
+                    continue
+                try:
+                    await self.process_payment_transfers(payment, transfers)
+                except Exception as e:
+                    logger.error(f"Adres kontrolü hatası {address}: {e}")
+                    self.metrics.failed_checks += 1
+
+            if next_cursor != cursor_ts:
+                await asyncio.to_thread(self._save_cursor, next_cursor)
+
+            logger.info(f"Blok tarama: {len(events)} event, {len(matches)} eşleşen adres")
+
+        finally:
+            self.metrics.cycle_finished(time.monotonic() - started)
+
+    def match_events(
+        self,
+        events: List[Dict],
+        index: PendingPaymentIndex,
+        current_block: Optional[int],
+        cursor_ts: int
+    ) -> Tuple[Dict[str, List[Dict]], int]:
+        """
+        Transfer event'lerini bekleyen ödeme adresleriyle eşleştir
+
+        Returns:
+            (adres -> normalize edilmiş transfer listesi, yeni imleç zamanı)
+            Yeterli onayı olmayan eşleşme varsa imleç o transferin önüne geçmez,
+            böylece bir sonraki taramada onay sayısı güncellenir.
+        """
+        matches: Dict[str, List[Dict]] = {}
+        next_cursor = cursor_ts
+        hold_cursor = None
+
+        for event in events:
+            block_timestamp = event.get('block_timestamp', 0)
+            next_cursor = max(next_cursor, block_timestamp)
+
+            result = event.get('result', {})
+            # Adres karşılaştırması hex formatında yapılır (event başına base58 encode yok)
+            to_hex = self._normalize_hex_address(result.get('to', result.get('1', '')))
+            payment = index.get_by_hex(to_hex)
+            if not payment:
+                continue
+            address = payment.payment_address
+
+            tx = self._event_to_transfer(event, address, current_block)
+            matches.setdefault(address, []).append(tx)
+
+            if tx['confirmations'] < settings.REQUIRED_CONFIRMATIONS:
+                hold_cursor = block_timestamp if hold_cursor is None else min(hold_cursor, block_timestamp)
+
+        if hold_cursor is not None:
+            next_cursor = min(next_cursor, hold_cursor)
+
+        return matches, next_cursor
+
+    @staticmethod
+    def _normalize_hex_address(value: str) -> str:
+        """
+        Event adresini 41 önekli, küçük harfli hex formatına getir
+        """
+        if not value:
+            return ''
+        if value.startswith('T'):
+            return CryptoService.tron_address_to_hex(value)
+
+        value = value.lower()
+        if value.startswith('0x'):
+            value = value[2:]
+        if len(value) == 40:
+            value = '41' + value
+        return value
+
+    def _event_to_transfer(self, event: Dict, to_address: str, current_block: Optional[int]) -> Dict:
+        """
+        Transfer event'ini polling modundaki TRC20 transfer formatına çevir
+        """
+        result = event.get('result', {})
+        from_raw = result.get('from', result.get('0', ''))
+        value = result.get('value', result.get('2', '0'))
+        block_number = event.get('block_number')
+
+        confirmations = 0
+        if current_block is not None and block_number is not None:
+            confirmations = max(0, current_block - block_number + 1)
+
+        from_address = CryptoService.hex_to_tron_address(from_raw) if from_raw else ''
+
+        return {
+            'transaction_id': event.get('transaction_id'),
+            'from': from_address,
+            'from_address': from_address,
+            'to': to_address,
+            'value': value,
+            'amount': value,
+            'token_info': {'address': self.usdt_contract},
+            'block_number': block_number,
+            'block_timestamp': event.get('block_timestamp', 0),
+            'timestamp': event.get('block_timestamp', 0),
+            'confirmations': confirmations
+        }
+
+    async def fetch_transfer_events(self, min_block_timestamp: int) -> List[Dict]:
+        """
+        USDT kontratının Transfer event'lerini sayfalayarak al
+        """
+        url = f"/v1/contracts/{self.usdt_contract}/events"
+        params = {
+            "event_name": "Transfer",
+            "min_block_timestamp": min_block_timestamp,
+            "order_by": "block_timestamp,asc",
+            "limit": settings.BLOCK_SCAN_PAGE_SIZE
+        }
+
+        events: List[Dict] = []
+        for _ in range(settings.BLOCK_SCAN_MAX_PAGES):
+            response = await self._request("GET", url, params=params)
+            data = response.json()
+            page = data.get('data', [])
+            events.extend(page)
+
+            fingerprint = data.get('meta', {}).get('fingerprint')
+            if not fingerprint or len(page) < settings.BLOCK_SCAN_PAGE_SIZE:
+                break
+            params["fingerprint"] = fingerprint
+
+        return events
+
+    async def get_current_block_number(self) -> Optional[int]:
+        """
+        Zincirin güncel blok numarasını al (onay sayısı hesaplamak için)
+        """
+        try:
+            response = await self._request("POST", "/wallet/getnowblock")
+            return response.json()['block_header']['raw_data']['number']
+        except Exception as e:
+            logger.error(f"Güncel blok alınamadı: {e}")
+            return None
+
+    def _load_cursor(self) -> Optional[int]:
+        db = SessionLocal()
+        try:
+            cursor = db.query(MonitorCursor).filter(
+                MonitorCursor.cursor_key == self.CURSOR_KEY
+            ).first()
+            return cursor.block_timestamp if cursor else None
+        finally:
+            db.close()
+
+    def _save_cursor(self, block_timestamp: int):
+        db = SessionLocal()
+        try:
+            cursor = db.query(MonitorCursor).filter(
+                MonitorCursor.cursor_key == self.CURSOR_KEY
+            ).first()
+            if not cursor:
+                cursor = MonitorCursor(cursor_key=self.CURSOR_KEY)
+                db.add(cursor)
+            cursor.block_timestamp = block_timestamp
+            db.commit()
+        except Exception as e:
+            logger.error(f"Tarama imleci kaydedilemedi: {e}")
+            db.rollback()
+        finally:
+            db.close()
@@ -1,18 +1,41 @@
 import httpx
 import asyncio
-from typing import List, Dict, Optional
+import time
+from typing import Iterable, List, Dict, NamedTuple, Optional, Tuple
 from datetime import datetime, timedelta
 from decimal import Decimal
+from urllib.parse import urlsplit
 import logging
+from sqlalchemy import update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.orm import Session
 
 from app.core.config import settings
+from app.core.cache import LRUCache
 from app.db.database import SessionLocal
-from app.db.models import PaymentRequest, Transaction, PaymentStatus, TransactionStatus
-from app.services.webhook import WebhookService
+from app.db.models import PaymentRequest, Transaction, PaymentStatus, TransactionStatus, MonitorCursor
+from app.services.webhook import webhook_service
+from app.services.webhook_outbox import webhook_outbox_worker
+from app.services.monitor_scheduler import TokenBucket, MonitorMetrics, PollSchedule
+from app.services.payment_index import PendingPaymentIndex, PendingPayment
+from app.services.payment_events import payment_status_hub
+from app.services.worker_coordinator import WorkerCoordinator
+from app.services.worker_metrics import worker_metrics_store, MONITOR_METRICS_ROLE
 
 logger = logging.getLogger(__name__)
 
+# Adres bazlı TRC20 imleçlerinin monitor_cursors tablosundaki anahtar öneki
+ADDRESS_CURSOR_PREFIX = "trc20:"
+
+class RecordResult(NamedTuple):
+    """
+    Eşleşen transferlerin kaydedilme sonucu
+    Sayaçlar thread pool'da değil, event loop'ta metriklere eklenir.
+    """
+    confirmation: Optional[Tuple[PaymentRequest, Transaction]]
+    known_tx_hits: int
+    db_writes: int
+
 class BlockchainMonitor:
     """
     Blockchain izleme servisi
@@ -23,7 +46,97 @@ class BlockchainMonitor:
         self.trongrid_url = settings.TRON_GRID_BASE_URL
         self.api_key = settings.TRON_GRID_API_KEY
         self.usdt_contract = settings.USDT_CONTRACT_ADDRESS
-        self.webhook_service = WebhookService()
+        self.webhook_service = webhook_service
+        
+        # Uzun ömürlü, bağlantı havuzlu HTTP client (ilk istekte oluşturulur)
+        self._client: Optional[httpx.AsyncClient] = None
+        self._host_semaphores: Dict[str, asyncio.Semaphore] = {}
+        
+        # API anahtarı seviyesine göre hız sınırı ve döngü metrikleri
+        self.rate_limiter = TokenBucket(
+            settings.TRON_GRID_REQUESTS_PER_SECOND,
+            settings.TRON_GRID_BURST
+        )
+        self.metrics = MonitorMetrics()
+        
+        # Bekleyen ödemelerin bellekteki adres indeksi
+        self.payment_index = PendingPaymentIndex()
+        
+        # Birden fazla monitor sürecinde adreslerin worker'lara dağıtımı
+        self.coordinator = WorkerCoordinator()
+        
+        # Adres -> son görülen transferin block_timestamp'i (ms)
+        self._address_cursors: Dict[str, Optional[int]] = {}
+        
+        # Kaydedilmiş işlemler: tx_hash -> onay sayısı (değişmeyen transferler DB'ye gitmez)
+        self.known_transactions = LRUCache(settings.MONITOR_KNOWN_TX_CACHE_SIZE)
+    
+    def _get_client(self) -> httpx.AsyncClient:
+        """
+        Paylaşılan TronGrid HTTP client'ını döndür
+        Her çağrıda yeni TCP+TLS bağlantısı kurmamak için keep-alive havuzu kullanılır
+        """
+        if self._client is None or self._client.is_closed:
+            http2 = settings.TRON_GRID_HTTP2
+            if http2:
+                try:
+                    import h2  # noqa: F401
+                except ImportError:
+                    logger.warning("HTTP/2 için 'h2' paketi bulunamadı, HTTP/1.1 kullanılıyor")
+                    http2 = False
+            
+            limits = httpx.Limits(
+                max_connections=settings.TRON_GRID_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.TRON_GRID_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=settings.TRON_GRID_KEEPALIVE_EXPIRY_SECONDS
+            )
+            headers = {"TRON-PRO-API-KEY": self.api_key} if self.api_key else {}
+            
+            self._client = httpx.AsyncClient(
+                base_url=self.trongrid_url,
+                headers=headers,
+                timeout=settings.TRON_GRID_TIMEOUT_SECONDS,
+                limits=limits,
+                http2=http2
+            )
+        return self._client
+    
+    def _get_host_semaphore(self, url: str) -> asyncio.Semaphore:
+        """
+        Host başına eşzamanlı istek sınırı
+        """
+        host = urlsplit(url).netloc or urlsplit(self.trongrid_url).netloc
+        semaphore = self._host_semaphores.get(host)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(settings.TRON_GRID_MAX_CONCURRENCY_PER_HOST)
+            self._host_semaphores[host] = semaphore
+        return semaphore
+    
+    async def _request(self, method: str, url: str, **kwargs) -> httpx.Response:
+        """
+        TronGrid'e paylaşılan client üzerinden istek gönder
+        """
+        client = self._get_client()
+        waited = await self.rate_limiter.acquire()
+        self.metrics.record_throttle(waited)
+        
+        async with self._get_host_semaphore(url):
+            self.metrics.trongrid_requests += 1
+            response = await client.request(method, url, **kwargs)
+        
+        if response.status_code == 429:
+            self.metrics.rate_limited_responses += 1
+        response.raise_for_status()
+        return response
+    
+    async def close(self):
+        """
+        HTTP client'ını kapat (açık bağlantıları temiz şekilde sonlandırır)
+        """
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+        self._host_semaphores.clear()
         
     async def monitor_pending_payments(self):
         """
@@ -31,118 +144,389 @@ class BlockchainMonitor:
         """
         logger.info("Blockchain monitoring başlatılıyor...")
         
+        # Heartbeat ayrı task'ta yazılır; uzun süren kontrol turları sırasında
+        # kesilmez, böylece worker TTL dolup shard halkası gereksiz yere değişmez
+        await asyncio.to_thread(self.coordinator.heartbeat)
+        self._apply_rate_limit_share()
+        background_tasks = [
+            asyncio.create_task(self._heartbeat_loop()),
+            # Metrik endpoint'i API sürecinde çalışmayan monitor'leri de görsün
+            asyncio.create_task(worker_metrics_store.run_publisher(
+                self.coordinator.worker_id, MONITOR_METRICS_ROLE, self.metrics.snapshot
+            ))
+        ]
+        
+        try:
+            await self._monitor_loop()
+        finally:
+            for task in background_tasks:
+                task.cancel()
+            await asyncio.gather(*background_tasks, return_exceptions=True)
+            await self.close()
+            await asyncio.to_thread(self.coordinator.shutdown)
+    
+    async def _heartbeat_loop(self):
+        """
+        Periyodik heartbeat, canlı worker'lara göre shard halkasını günceller
+        """
         while True:
+            await asyncio.sleep(settings.MONITOR_HEARTBEAT_SECONDS)
             try:
-                db = SessionLocal()
-                
-                # Bekleyen ödemeleri al
-                pending_payments = db.query(PaymentRequest).filter(
-                    PaymentRequest.status == PaymentStatus.PENDING,
-                    PaymentRequest.expires_at > datetime.utcnow()
-                ).all()
-                
-                logger.info(f"{len(pending_payments)} bekleyen ödeme kontrol ediliyor...")
-                
-                # Her ödemeyi kontrol et
-                tasks = []
-                for payment in pending_payments:
-                    task = self.check_payment_address(payment, db)
-                    tasks.append(task)
+                await asyncio.to_thread(self.coordinator.heartbeat)
+                self._apply_rate_limit_share()
+            except Exception as e:
+                logger.error(f"Heartbeat döngüsü hatası: {e}")
+    
+    def _rate_limit_share(self) -> float:
+        """
+        TronGrid bütçesinden bu worker'a düşen pay
+        Polling modunda her canlı worker kendi shard'ı için istek gönderir.
+        """
+        return 1 / max(1, len(self.coordinator.live_workers))
+    
+    def _apply_rate_limit_share(self):
+        """
+        Canlı worker sayısı değiştiyse hız sınırını yeniden böl
+        (N worker toplamda API anahtarının limitini aşmasın)
+        """
+        share = self._rate_limit_share()
+        rate = settings.TRON_GRID_REQUESTS_PER_SECOND * share
+        if rate == self.rate_limiter.rate:
+            return
+        self.rate_limiter.set_rate(rate, max(1.0, settings.TRON_GRID_BURST * share))
+        logger.info(f"TronGrid hız sınırı güncellendi: {rate:.2f} istek/sn ({len(self.coordinator.live_workers)} canlı worker)")
+    
+    async def _monitor_loop(self):
+        """
+        Ana izleme döngüsü
+        """
+        schedule = PollSchedule()
+        next_refresh = 0.0
+        next_expiry_sweep = 0.0
+        
+        while True:
+            try:
+                now = time.monotonic()
                 
-                if tasks:
-                    await asyncio.gather(*tasks, return_exceptions=True)
+                # Bekleyen ödeme indeksini güncelle (sadece yeni satırlar okunur)
+                # ve bu worker'a düşen ödemeleri zamanlayıcıya al
+                if now >= next_refresh:
+                    dropped = await asyncio.to_thread(self.payment_index.refresh)
+                    self._evict_address_cursors(dropped)
+                    schedule.sync([
+                        payment for payment in self.payment_index.pending()
+                        if self.coordinator.owns(payment.payment_address)
+                    ])
+                    self.metrics.scheduled_payments = len(schedule)
+                    next_refresh = now + settings.MONITOR_INDEX_REFRESH_SECONDS
                 
-                # Süresi dolmuş ödemeleri işaretle
-                await self.mark_expired_payments(db)
+                # Kontrol zamanı gelen ödemeleri sınırlı sayıda worker ile kontrol et
+                due_payments = schedule.pop_due()
+                if due_payments:
+                    due_payments.sort(key=lambda payment: payment.expires_at)
+                    outcomes = await self.run_payment_checks(due_payments)
+                    for payment in due_payments:
+                        schedule.reschedule(payment, outcomes.get(payment.id))
+                    self.metrics.scheduled_payments = len(schedule)
                 
-                db.close()
+                # Süresi dolmuş ödemeleri işaretle (sadece lider worker)
+                if now >= next_expiry_sweep and self.coordinator.is_leader:
+                    await self.mark_expired_payments()
+                    next_expiry_sweep = now + settings.MONITOR_EXPIRY_SWEEP_SECONDS
                 
-                # 30 saniye bekle
-                await asyncio.sleep(30)
+                # Bir sonraki planlı kontrola veya indeks yenilemesine kadar bekle
+                wait = next_refresh - time.monotonic()
+                until_next = schedule.seconds_until_next()
+                if until_next is not None:
+                    wait = min(wait, until_next)
+                await asyncio.sleep(max(wait, 0.1))
                 
             except Exception as e:
                 logger.error(f"Monitoring döngüsü hatası: {e}")
-                await asyncio.sleep(60)  # Hata durumunda daha uzun bekle
+                await asyncio.sleep(settings.MONITOR_ERROR_BACKOFF_SECONDS)
     
-    async def check_payment_address(self, payment: PaymentRequest, db: Session):
+    async def run_payment_checks(self, payments: List[PendingPayment]) -> Dict[int, Optional[TransactionStatus]]:
+        """
+        Ödemeleri sabit boyutlu worker havuzu ile sırayla kontrol et
+        Kuyruk sırası korunur, böylece süresi en yakın dolacak ödeme önce kontrol edilir
+        
+        Returns:
+            payment_id -> kontrol sonucu (bkz. check_payment_address)
+        """
+        started = time.monotonic()
+        self.metrics.cycle_started(len(payments))
+        
+        outcomes: Dict[int, Optional[TransactionStatus]] = {}
+        queue: asyncio.Queue = asyncio.Queue()
+        for payment in payments:
+            queue.put_nowait(payment)
+        
+        async def worker():
+            while True:
+                try:
+                    payment = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                
+                self.metrics.queue_depth = queue.qsize()
+                self.metrics.active_workers += 1
+                try:
+                    outcomes[payment.id] = await self.check_payment_address(payment)
+                except Exception as e:
+                    self.metrics.failed_checks += 1
+                    logger.error(f"Ödeme kontrol worker hatası {payment.id}: {e}")
+                finally:
+                    self.metrics.active_workers -= 1
+        
+        worker_count = min(settings.MONITOR_WORKER_COUNT, len(payments))
+        if worker_count:
+            await asyncio.gather(*(worker() for _ in range(worker_count)))
+        
+        duration = time.monotonic() - started
+        self.metrics.cycle_finished(duration)
+        logger.debug(f"Monitor turu tamamlandı: {len(payments)} ödeme, {duration:.2f} sn")
+        return outcomes
+    
+    async def check_payment_address(self, payment: PendingPayment) -> Optional[TransactionStatus]:
         """
         Belirli bir ödeme adresini kontrol et
+        
+        Returns:
+            CONFIRMED: ödeme onaylandı, PENDING: onay bekleyen eşleşen transfer var,
+            None: eşleşen transfer yok veya hata
+        
+        Ağ çağrısı session dışında yapılır; veritabanı yazımları her ödeme için
+        ayrı, kısa ömürlü bir session üzerinde (thread pool'da) çalışır. Böylece
+        bir adresteki hata diğer ödemelerin işlemlerini geri almaz.
         """
         try:
-            # TronGrid API'den işlemleri al
-            transactions = await self.get_address_transactions(payment.payment_address)
-            
-            for tx in transactions:
-                # USDT transferi mi kontrol et
-                if await self.is_usdt_transfer(tx, payment.payment_address, payment.amount):
-                    # Bu işlem zaten kayıtlı mı?
-                    existing_tx = db.query(Transaction).filter(
-                        Transaction.tx_hash == tx['transaction_id']
-                    ).first()
-                    
-                    if not existing_tx:
-                        # Yeni işlem kaydet
-                        new_tx = Transaction(
-                            payment_request_id=payment.id,
-                            tx_hash=tx['transaction_id'],
-                            from_address=tx.get('from_address', ''),
-                            to_address=payment.payment_address,
-                            amount=Decimal(str(tx.get('amount', 0))) / 1000000,  # USDT 6 decimal
-                            network="tron",
-                            contract_address=self.usdt_contract,
-                            block_number=tx.get('block_number'),
-                            block_timestamp=datetime.fromtimestamp(tx.get('timestamp', 0) / 1000),
-                            confirmations=tx.get('confirmations', 0),
-                            status=TransactionStatus.CONFIRMED if tx.get('confirmations', 0) >= settings.REQUIRED_CONFIRMATIONS else TransactionStatus.PENDING
-                        )
-                        
-                        db.add(new_tx)
-                        
-                        # Yeterli onayı varsa ödemeyi onayla
-                        if tx.get('confirmations', 0) >= settings.REQUIRED_CONFIRMATIONS:
-                            await self.confirm_payment(payment, new_tx, db)
-                    
-                    else:
-                        # Mevcut işlemi güncelle
-                        existing_tx.confirmations = tx.get('confirmations', 0)
-                        existing_tx.block_number = tx.get('block_number')
-                        
-                        # Yeterli onayı varsa ve henüz onaylanmamışsa
-                        if (tx.get('confirmations', 0) >= settings.REQUIRED_CONFIRMATIONS and 
-                            payment.status == PaymentStatus.PENDING):
-                            await self.confirm_payment(payment, existing_tx, db)
+            # Adres imlecinden sonraki transferleri al (ilk kontrolde tüm geçmiş)
+            cursor = await self._get_address_cursor(payment.payment_address)
+            transactions = await self.get_address_transactions(payment.payment_address, cursor)
             
-            db.commit()
+            outcome = await self.process_payment_transfers(payment, transactions)
+            
+            # Onay bekleyen eşleşme yoksa imleci en son görülen transfere ilerlet;
+            # varsa imleç yerinde kalır ve transfer bir sonraki kontrolde tekrar gelir
+            if outcome is None and transactions:
+                latest = max(tx.get('block_timestamp', 0) for tx in transactions)
+                if cursor is None or latest > cursor:
+                    await self._set_address_cursor(payment.payment_address, latest)
+            elif outcome == TransactionStatus.CONFIRMED:
+                self._address_cursors.pop(payment.payment_address, None)
+            
+            return outcome
             
         except Exception as e:
             logger.error(f"Adres kontrolü hatası {payment.payment_address}: {e}")
+            self.metrics.failed_checks += 1
+            return None
+    
+    async def process_payment_transfers(self, payment: PendingPayment, transactions: List[Dict]) -> Optional[TransactionStatus]:
+        """
+        Bir ödemeye ait transferleri değerlendir, kaydet ve gerekiyorsa onayla
+        Hem adres bazlı polling hem de blok tarama modu bu metodu kullanır
+        """
+        # USDT transferi mi kontrol et
+        matching = [
+            tx for tx in transactions
+            if await self.is_usdt_transfer(tx, payment.payment_address, payment.amount)
+        ]
+        if not matching:
+            return None
+        
+        result = await asyncio.to_thread(
+            self._record_transactions, payment.id, matching
+        )
+        self.metrics.known_tx_cache_hits += result.known_tx_hits
+        self.metrics.db_writes += result.db_writes
+        
+        if result.confirmation:
+            self.payment_index.remove(payment.payment_address)
+            await self.notify_payment_confirmed(*result.confirmation)
+            return TransactionStatus.CONFIRMED
+        
+        return TransactionStatus.PENDING
+    
+    def _record_transactions(self, payment_id: int, transactions: List[Dict]) -> RecordResult:
+        """
+        Eşleşen transferleri tek bir unit of work içinde kaydet
+        
+        Daha önce aynı onay sayısıyla kaydedilmiş transferler bellekteki LRU ile
+        elenir; kalanlar tek bir INSERT ... ON CONFLICT (tx_hash) DO UPDATE ile
+        yazılır. Böylece transfer başına ayrı SELECT/INSERT round-trip'i yapılmaz.
+        
+        Returns:
+            RecordResult: ödeme bu çağrıda onaylandıysa confirmation=(payment, transaction),
+            aksi halde None; metrik sayaçları çağıran tarafından güncellenir
+        """
+        # Aynı hash birden fazla gelirse son değer geçerli (ON CONFLICT aynı satırı iki kez güncelleyemez)
+        fresh: Dict[str, Dict] = {}
+        known_tx_hits = 0
+        for tx in transactions:
+            confirmations = tx.get('confirmations', 0)
+            known = self.known_transactions.get(tx['transaction_id'])
+            if known is not None and known >= confirmations:
+                known_tx_hits += 1
+                continue
+            fresh[tx['transaction_id']] = tx
+        
+        if not fresh:
+            return RecordResult(None, known_tx_hits, 0)
+        
+        db = SessionLocal(expire_on_commit=False)
+        try:
+            payment = db.get(PaymentRequest, payment_id)
+            if not payment:
+                return RecordResult(None, known_tx_hits, 0)
+            
+            rows = []
+            for tx in fresh.values():
+                confirmations = tx.get('confirmations', 0)
+                rows.append({
+                    "payment_request_id": payment.id,
+                    "tx_hash": tx['transaction_id'],
+                    "from_address": tx.get('from_address', ''),
+                    "to_address": payment.payment_address,
+                    "amount": Decimal(str(tx.get('amount', 0))) / 1000000,  # USDT 6 decimal
+                    "network": "tron",
+                    "contract_address": self.usdt_contract,
+                    "block_number": tx.get('block_number'),
+                    "block_timestamp": datetime.fromtimestamp(tx.get('block_timestamp', tx.get('timestamp', 0)) / 1000),
+                    "confirmations": confirmations,
+                    "status": TransactionStatus.CONFIRMED if confirmations >= settings.REQUIRED_CONFIRMATIONS else TransactionStatus.PENDING
+                })
+            
+            # Yeni işlemleri ekle, mevcut olanların onay sayısını güncelle
+            stmt = pg_insert(Transaction).values(rows)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[Transaction.tx_hash],
+                set_={
+                    "confirmations": stmt.excluded.confirmations,
+                    "block_number": stmt.excluded.block_number
+                }
+            ).returning(Transaction.id, Transaction.tx_hash, Transaction.confirmations)
+            upserted = db.execute(stmt).all()
+            
+            # Yeterli onayı varsa ve henüz onaylanmamışsa ödemeyi onayla
+            # (koşullu UPDATE sayesinde eşzamanlı aktörlerden sadece biri kazanır)
+            confirmation = None
+            if payment.status == PaymentStatus.PENDING:
+                for row in upserted:
+                    if row.confirmations >= settings.REQUIRED_CONFIRMATIONS:
+                        transaction = db.get(Transaction, row.id)
+                        if self.confirm_payment(db, payment, transaction):
+                            # Webhook onayla aynı commit'te outbox'a yazılır
+                            self.webhook_service.enqueue_payment_confirmation(db, payment, transaction)
+                            # Ödeme sayfasındaki SSE/long-poll aboneleri commit'te bilgilendirilir
+                            payment_status_hub.notify(db, [payment.id], PaymentStatus.CONFIRMED)
+                            confirmation = (payment, transaction)
+                        break
+            
+            db.commit()
+            
+            for row in upserted:
+                self.known_transactions.set(row.tx_hash, row.confirmations)
+            
+            # Başka bir yoldan sonlanmış ödeme (iptal, başka bir worker) indekste kalmasın
+            if payment.status != PaymentStatus.PENDING:
+                self.payment_index.remove(payment.payment_address)
+            
+            return RecordResult(confirmation, known_tx_hits, 1)
+            
+        except Exception:
             db.rollback()
+            raise
+        finally:
+            db.close()
     
-    async def get_address_transactions(self, address: str) -> List[Dict]:
+    async def get_address_transactions(self, address: str, min_timestamp: Optional[int] = None) -> List[Dict]:
         """
         TronGrid API'den adres işlemlerini al
+        
+        Args:
+            min_timestamp: Bu zamandan (ms, dahil) itibaren gelen transferler; None ise tümü
+        
+        Transferler eskiden yeniye sıralı gelir, 200'den fazla transfer varsa
+        fingerprint ile sonraki sayfalar da okunur.
         """
         try:
-            headers = {"TRON-PRO-API-KEY": self.api_key} if self.api_key else {}
-            
-            # TRC20 transferlerini al
-            url = f"{self.trongrid_url}/v1/accounts/{address}/transactions/trc20"
+            # TRC20 transferlerini al (sadece adrese gelenler)
+            url = f"/v1/accounts/{address}/transactions/trc20"
             params = {
-                "limit": 50,
-                "contract_address": self.usdt_contract
+                "limit": settings.TRON_GRID_PAGE_SIZE,
+                "contract_address": self.usdt_contract,
+                "only_to": "true",
+                "order_by": "block_timestamp,asc"
             }
+            if min_timestamp is not None:
+                params["min_timestamp"] = min_timestamp
             
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                response = await client.get(url, headers=headers, params=params)
-                response.raise_for_status()
-                
+            transactions: List[Dict] = []
+            for _ in range(settings.TRON_GRID_MAX_PAGES):
+                response = await self._request("GET", url, params=params)
                 data = response.json()
-                return data.get('data', [])
+                page = data.get('data', [])
+                transactions.extend(page)
+                
+                fingerprint = data.get('meta', {}).get('fingerprint')
+                if not fingerprint or len(page) < settings.TRON_GRID_PAGE_SIZE:
+                    break
+                params["fingerprint"] = fingerprint
+            
+            return transactions
                 
         except Exception as e:
             logger.error(f"TronGrid API hatası: {e}")
             return []
     
+    async def _get_address_cursor(self, address: str) -> Optional[int]:
+        """
+        Adresin son görülen transfer zamanı (önce bellekten, yoksa veritabanından)
+        """
+        if address not in self._address_cursors:
+            self._address_cursors[address] = await asyncio.to_thread(self._load_address_cursor, address)
+        return self._address_cursors[address]
+    
+    async def _set_address_cursor(self, address: str, block_timestamp: int):
+        self._address_cursors[address] = block_timestamp
+        await asyncio.to_thread(self._save_address_cursor, address, block_timestamp)
+    
+    def _evict_address_cursors(self, addresses: Iterable[str]):
+        """
+        İndeksten düşen (süresi dolan, iptal edilen) adreslerin imleçlerini bellekten çıkar
+        """
+        for address in addresses:
+            self._address_cursors.pop(address, None)
+    
+    def _load_address_cursor(self, address: str) -> Optional[int]:
+        db = SessionLocal()
+        try:
+            cursor = db.query(MonitorCursor).filter(
+                MonitorCursor.cursor_key == f"{ADDRESS_CURSOR_PREFIX}{address}"
+            ).first()
+            return cursor.block_timestamp if cursor else None
+        finally:
+            db.close()
+    
+    def _save_address_cursor(self, address: str, block_timestamp: int):
+        db = SessionLocal()
+        try:
+            cursor_key = f"{ADDRESS_CURSOR_PREFIX}{address}"
+            cursor = db.query(MonitorCursor).filter(
+                MonitorCursor.cursor_key == cursor_key
+            ).first()
+            if not cursor:
+                cursor = MonitorCursor(cursor_key=cursor_key)
+                db.add(cursor)
+            cursor.block_timestamp = block_timestamp
+            db.commit()
+        except Exception as e:
+            logger.error(f"Adres imleci kaydedilemedi {address}: {e}")
+            db.rollback()
+        finally:
+            db.close()
+    
     async def is_usdt_transfer(self, tx: Dict, to_address: str, expected_amount: Decimal) -> bool:
         """
         İşlemin beklenen USDT transferi olup olmadığını kontrol et
@@ -170,73 +554,120 @@ class BlockchainMonitor:
             logger.error(f"USDT transfer kontrolü hatası: {e}")
             return False
     
-    async def confirm_payment(self, payment: PaymentRequest, transaction: Transaction, db: Session):
+    def confirm_payment(self, db: Session, payment: PaymentRequest, transaction: Transaction) -> bool:
         """
-        Ödemeyi onayla ve webhook gönder
+        Ödemeyi tek bir koşullu durum geçişiyle onayla
+        UPDATE ... WHERE status = 'pending' RETURNING ile sadece bir aktör kazanır;
+        başka bir task/replica önce onayladıysa False döner ve webhook tetiklenmez.
+        Commit çağıran tarafından yapılır.
+        """
+        confirmed_at = datetime.utcnow()
+        
+        # Ödeme durumunu güncelle
+        won = db.execute(
+            update(PaymentRequest)
+            .where(
+                PaymentRequest.id == payment.id,
+                PaymentRequest.status == PaymentStatus.PENDING
+            )
+            .values(status=PaymentStatus.CONFIRMED, confirmed_at=confirmed_at)
+            .returning(PaymentRequest.id)
+        ).first()
+        
+        if won is None:
+            logger.info(f"Ödeme zaten sonlanmış, onay atlandı: {payment.order_id}")
+            db.refresh(payment)
+            return False
+        
+        # Transaction durumunu güncelle
+        transaction.status = TransactionStatus.CONFIRMED
+        transaction.confirmed_at = confirmed_at
+        return True
+    
+    async def notify_payment_confirmed(self, payment: PaymentRequest, transaction: Transaction):
+        """
+        Commit edilmiş onay için log yaz ve webhook delivery worker'ını uyandır
+        Webhook outbox'tan gönderilir; monitor merchant HTTP isteğini beklemez.
         """
         try:
-            # Ödeme durumunu güncelle
-            payment.status = PaymentStatus.CONFIRMED
-            payment.confirmed_at = datetime.utcnow()
-            
-            # Transaction durumunu güncelle
-            transaction.status = TransactionStatus.CONFIRMED
-            transaction.confirmed_at = datetime.utcnow()
-            
-            db.commit()
-            
             logger.info(f"Ödeme onaylandı: {payment.order_id} - {payment.amount} USDT")
             
-            # Webhook gönder
             if payment.webhook_url:
-                await self.webhook_service.send_payment_confirmation(payment, transaction)
+                webhook_outbox_worker.wake()
             
         except Exception as e:
-            logger.error(f"Ödeme onaylama hatası: {e}")
-            db.rollback()
+            logger.error(f"Ödeme onay bildirimi hatası: {e}")
     
-    async def mark_expired_payments(self, db: Session):
+    async def mark_expired_payments(self):
         """
         Süresi dolmuş ödemeleri işaretle
         """
+        self._evict_address_cursors(payment.payment_address for payment in self.payment_index.prune_expired())
+        await asyncio.to_thread(self._mark_expired_payments)
+    
+    def _mark_expired_payments(self):
+        db = SessionLocal()
         try:
-            expired_payments = db.query(PaymentRequest).filter(
-                PaymentRequest.status == PaymentStatus.PENDING,
-                PaymentRequest.expires_at <= datetime.utcnow()
+            # Artık izlenmeyen adreslerin eski imleçlerini temizle
+            db.query(MonitorCursor).filter(
+                MonitorCursor.cursor_key.like(f"{ADDRESS_CURSOR_PREFIX}%"),
+                MonitorCursor.updated_at < datetime.utcnow() - timedelta(days=1)
+            ).delete(synchronize_session=False)
+            
+            # Koşullu toplu güncelleme: aynı anda onaylanan ödeme EXPIRED'a çekilmez
+            expired_payments = db.execute(
+                update(PaymentRequest)
+                .where(
+                    PaymentRequest.status == PaymentStatus.PENDING,
+                    PaymentRequest.expires_at <= datetime.utcnow()
+                )
+                .values(status=PaymentStatus.EXPIRED)
+                .returning(PaymentRequest.id, PaymentRequest.order_id, PaymentRequest.payment_address)
+                .execution_options(synchronize_session=False)
             ).all()
             
+            payment_status_hub.notify(db, [payment.id for payment in expired_payments], PaymentStatus.EXPIRED)
+            db.commit()
+            
             for payment in expired_payments:
-                payment.status = PaymentStatus.EXPIRED
+                self.payment_index.remove(payment.payment_address)
                 logger.info(f"Ödeme süresi doldu: {payment.order_id}")
             
             if expired_payments:
-                db.commit()
                 logger.info(f"{len(expired_payments)} ödemenin süresi doldu")
                 
         except Exception as e:
             logger.error(f"Süresi dolmuş ödeme işaretleme hatası: {e}")
             db.rollback()
+        finally:
+            db.close()
     
     async def get_transaction_details(self, tx_hash: str) -> Optional[Dict]:
         """
         İşlem detaylarını TronGrid'den al
         """
         try:
-            headers = {"TRON-PRO-API-KEY": self.api_key} if self.api_key else {}
-            url = f"{self.trongrid_url}/wallet/gettransactionbyid"
-            
-            async with httpx.AsyncClient(timeout=30.0) as client:
-                response = await client.post(
-                    url, 
-                    headers=headers,
-                    json={"value": tx_hash}
-                )
-                response.raise_for_status()
-                return response.json()
+            response = await self._request(
+                "POST",
+                "/wallet/gettransactionbyid",
+                json={"value": tx_hash}
+            )
+            return response.json()
                 
         except Exception as e:
             logger.error(f"İşlem detayları alma hatası: {e}")
             return None
 
+def create_monitor() -> BlockchainMonitor:
+    """
+    MONITOR_MODE ayarına göre monitor örneği oluştur
+    polling: her bekleyen adres için TronGrid sorgusu (varsayılan)
+    block_scan: USDT Transfer event'lerini imleçten itibaren tek akışta tara
+    """
+    if settings.MONITOR_MODE == "block_scan":
+        from app.services.block_scanner import BlockScanMonitor
+        return BlockScanMonitor()
+    return BlockchainMonitor()
+
 # Singleton instance
-blockchain_monitor = BlockchainMonitor() 
\ No newline at end of file
+blockchain_monitor = create_monitor() 
\ No newline at end of file
@@ -1,7 +1,11 @@
 import base64
 import io
-from typing import Optional
+from concurrent.futures import Executor
+from functools import lru_cache
+from typing import List, Optional
 from bip32 import BIP32
+from coincurve import PublicKey  # bip32 bağımlılığı (libsecp256k1)
+from Crypto.Hash import keccak
 import qrcode
 from qrcode.image.pil import PilImage
 import hashlib
@@ -18,6 +22,47 @@ class CryptoAddressGenerationError(Exception):
     """
     pass
 
+# Alıcı (external) zinciri: xPub/0/index
+EXTERNAL_CHAIN = 0
+
+@lru_cache(maxsize=settings.XPUB_CACHE_SIZE)
+def _parse_xpub(xpub: str) -> BIP32:
+    """
+    xPub'ı bir kez parse et (base58 checksum ve nokta doğrulaması tekrar yapılmaz)
+    """
+    return BIP32.from_xpub(xpub)
+
+@lru_cache(maxsize=settings.XPUB_CACHE_SIZE)
+def _external_chain_node(xpub: str) -> BIP32:
+    """
+    xPub'ın alıcı zinciri düğümü (xPub/0)
+    Her yeni adres bu düğümden tek bir child türetmesiyle elde edilir.
+    """
+    return BIP32.from_xpub(_parse_xpub(xpub).get_xpub_from_path([EXTERNAL_CHAIN]))
+
+def _derive_range(xpub: str, start: int, count: int) -> List[str]:
+    """
+    start'tan itibaren count adet ardışık adresi türet
+
+    Tek adres yolu ile aynı sonucu üretir; zincir düğümü bir kez alınır ve
+    döngüde log, obje oluşturma ve modül araması yapılmaz. Süreç havuzuna
+    gönderilebilmesi için modül seviyesindedir.
+    """
+    chain_node = _external_chain_node(xpub)
+    derive_child = chain_node.get_pubkey_from_path
+    keccak_new = keccak.new
+    sha256 = hashlib.sha256
+    b58encode = base58.b58encode
+
+    addresses = []
+    for index in range(start, start + count):
+        # Compressed child key -> uncompressed nokta (0x04 || X || Y)
+        point = PublicKey(derive_child([index])).format(compressed=False)
+        address_hex = b'\x41' + keccak_new(digest_bits=256, data=point[1:]).digest()[-20:]
+        checksum = sha256(sha256(address_hex).digest()).digest()[:4]
+        addresses.append(b58encode(address_hex + checksum).decode('utf-8'))
+    return addresses
+
 class CryptoService:
     """
     Kripto işlemleri için yardımcı sınıf
@@ -36,23 +81,19 @@ class CryptoService:
             CryptoAddressGenerationError: Adres oluşturulamazsa
         """
         try:
-            logger.info(f"xPub'dan adres türetiliyor: index={index}")
-            
-            # BIP32 objesi oluştur
-            bip32 = BIP32.from_xpub(xpub)
-            logger.debug("BIP32 objesi başarıyla oluşturuldu")
+            logger.debug(f"xPub'dan adres türetiliyor: index={index}")
             
-            # BIP32 3.4 (darosior/python-bip32) doğru API kullanımı
-            # Direkt public key'i path ile al - 0=receiving addresses, index=address index  
-            derivation_path = f"0/{index}"
-            pubkey = bip32.get_pubkey_from_path(derivation_path)
+            # Alıcı zinciri düğümü (xPub/0) önbellekten gelir, sadece index türetilir
+            # BIP32 3.4 (darosior/python-bip32): göreli path liste olarak verilir
+            chain_node = _external_chain_node(xpub)
+            pubkey = chain_node.get_pubkey_from_path([index])
             
-            logger.debug(f"Child key başarıyla türetildi - path: {derivation_path}")
+            logger.debug(f"Child key başarıyla türetildi - path: {EXTERNAL_CHAIN}/{index}")
             logger.debug(f"Public key alındı: {len(pubkey)} bytes")
             
             # TRON adresi oluştur (exception fırlatabilir)
             tron_address = CryptoService._pubkey_to_tron_address(pubkey)
-            logger.info(f"TRON adresi başarıyla türetildi: {tron_address}")
+            logger.debug(f"TRON adresi başarıyla türetildi: {tron_address}")
             
             return tron_address
             
@@ -63,6 +104,45 @@ class CryptoService:
             logger.error(f"Adres türetme hatası: {e}")
             raise CryptoAddressGenerationError(f"xPub'dan adres türetilemedi: {e}") from e
     
+    @staticmethod
+    def derive_addresses(
+        xpub: str,
+        start: int,
+        count: int,
+        executor: Optional[Executor] = None
+    ) -> List[str]:
+        """
+        xPub'dan start, start+1, ..., start+count-1 index'lerindeki adresleri türet
+        Adres havuzu doldurma, cüzdan denetimi ve adres boşluğu taraması için.
+        
+        Args:
+            executor: Verilirse büyük aralıklar ADDRESS_DERIVE_CHUNK_SIZE'lık
+                      parçalara bölünüp bu executor'da (örn. süreç havuzu) paralel türetilir
+        
+        Returns:
+            List[str]: Index sırasıyla TRON adresleri
+            
+        Raises:
+            CryptoAddressGenerationError: Adresler oluşturulamazsa
+        """
+        if start < 0 or count < 0 or start + count > 2 ** 31:
+            raise CryptoAddressGenerationError(f"Geçersiz index aralığı: {start}+{count}")
+        
+        try:
+            chunk_size = settings.ADDRESS_DERIVE_CHUNK_SIZE
+            if executor is None or count <= chunk_size:
+                return _derive_range(xpub, start, count)
+            
+            chunks = [
+                executor.submit(_derive_range, xpub, chunk_start, min(chunk_size, start + count - chunk_start))
+                for chunk_start in range(start, start + count, chunk_size)
+            ]
+            return [address for chunk in chunks for address in chunk.result()]
+            
+        except Exception as e:
+            logger.error(f"Toplu adres türetme hatası ({start}+{count}): {e}")
+            raise CryptoAddressGenerationError(f"xPub'dan adresler türetilemedi: {e}") from e
+    
     @staticmethod
     def _pubkey_to_tron_address(pubkey: bytes) -> str:
         """
@@ -71,9 +151,6 @@ class CryptoService:
         try:
             logger.debug(f"TRON adres oluşturuluyor - Public key uzunluğu: {len(pubkey)} bytes")
             
-            # Keccak256 hash
-            from Crypto.Hash import keccak
-            
             # Public key formatını kontrol et ve düzelt
             if len(pubkey) == 33:  # Compressed key (33 bytes)
                 logger.debug("Compressed public key tespit edildi, uncompressed'a çeviriliyor")
@@ -119,7 +196,7 @@ class CryptoService:
             address_bytes = address_hex + checksum
             address = base58.b58encode(address_bytes).decode('utf-8')
             
-            logger.info(f"TRON adresi başarıyla oluşturuldu: {address}")
+            logger.debug(f"TRON adresi başarıyla oluşturuldu: {address}")
             return address
             
         except Exception as e:
@@ -134,19 +211,7 @@ class CryptoService:
         Ödeme için QR kod oluştur ve base64 string olarak döndür
         """
         try:
-            # TRON ödeme URL'i oluştur
-            # Format: tronlink://pay?address=...&amount=...&token=...
-            payment_url = f"tronlink://pay?address={address}&amount={amount}&token={settings.USDT_CONTRACT_ADDRESS}"
-            
-            # QR kod oluştur
-            qr = qrcode.QRCode(
-                version=1,
-                error_correction=qrcode.constants.ERROR_CORRECT_L,
-                box_size=10,
-                border=4,
-            )
-            qr.add_data(payment_url)
-            qr.make(fit=True)
+            qr = CryptoService._build_payment_qr(address, amount)
             
             # PIL Image olarak oluştur
             img = qr.make_image(fill_color="black", back_color="white")
@@ -163,6 +228,63 @@ class CryptoService:
             # Fallback: basit text QR
             return CryptoService._generate_simple_qr(address)
     
+    @staticmethod
+    def _build_payment_qr(address: str, amount: float) -> qrcode.QRCode:
+        """
+        Ödeme URL'inin QR matrisini oluştur (PIL kullanılmaz)
+        """
+        # TRON ödeme URL'i oluştur
+        # Format: tronlink://pay?address=...&amount=...&token=...
+        payment_url = f"tronlink://pay?address={address}&amount={amount}&token={settings.USDT_CONTRACT_ADDRESS}"
+        
+        qr = qrcode.QRCode(
+            version=1,
+            error_correction=qrcode.constants.ERROR_CORRECT_L,
+            box_size=10,
+            border=4,
+        )
+        qr.add_data(payment_url)
+        qr.make(fit=True)
+        return qr
+    
+    @staticmethod
+    def generate_payment_qr_matrix(address: str, amount: float) -> List[str]:
+        """
+        Ödeme QR kodunu ham matris olarak döndür (kenar boşluğu dahil)
+        Her satır "1" (koyu) ve "0" (açık) karakterlerinden oluşur; istemci kendisi çizer.
+        """
+        matrix = CryptoService._build_payment_qr(address, amount).get_matrix()
+        return ["".join("1" if cell else "0" for cell in row) for row in matrix]
+    
+    @staticmethod
+    def generate_payment_qr_svg(address: str, amount: float) -> str:
+        """
+        Ödeme QR kodunu SVG olarak oluştur (PIL ve PNG sıkıştırması yapılmaz)
+        Koyu modüllerin yatay dizileri tek bir path'te birleştirilir.
+        """
+        matrix = CryptoService._build_payment_qr(address, amount).get_matrix()
+        size = len(matrix)
+        
+        path = []
+        for y, row in enumerate(matrix):
+            x = 0
+            while x < size:
+                if not row[x]:
+                    x += 1
+                    continue
+                run = 1
+                while x + run < size and row[x + run]:
+                    run += 1
+                path.append(f"M{x} {y}h{run}v1h-{run}z")
+                x += run
+        
+        return (
+            f'<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 {size} {size}" '
+            f'width="{size * 10}" height="{size * 10}" shape-rendering="crispEdges">'
+            f'<rect width="{size}" height="{size}" fill="#fff"/>'
+            f'<path fill="#000" d="{"".join(path)}"/></svg>'
+        )
+    
     @staticmethod
     def _generate_simple_qr(text: str) -> str:
         """
@@ -213,6 +335,31 @@ class CryptoService:
         except Exception:
             return False
     
+    @staticmethod
+    def hex_to_tron_address(hex_address: str) -> str:
+        """
+        Hex formatındaki adresi (0x... veya 41...) Base58 TRON adresine çevir
+        TronGrid event sonuçlarındaki adresler hex formatında döner
+        """
+        if hex_address.startswith('T'):
+            return hex_address
+        
+        value = hex_address[2:] if hex_address.startswith('0x') else hex_address
+        if len(value) == 40:
+            value = '41' + value
+        
+        address_hex = bytes.fromhex(value)
+        checksum = hashlib.sha256(hashlib.sha256(address_hex).digest()).digest()[:4]
+        return base58.b58encode(address_hex + checksum).decode('utf-8')
+    
+    @staticmethod
+    def tron_address_to_hex(address: str) -> str:
+        """
+        Base58 TRON adresini 41 önekli hex formatına çevir (checksum hariç)
+        """
+        decoded = base58.b58decode(address)
+        return decoded[:-4].hex()
+    
     @staticmethod
     def validate_xpub_key(xpub: str) -> bool:
         """
@@ -222,8 +369,8 @@ class CryptoService:
             if not xpub.startswith('xpub'):
                 return False
             
-            # BIP32 ile parse etmeyi dene
-            BIP32.from_xpub(xpub)
+            # BIP32 ile parse etmeyi dene (sonuç türetme için önbellekte kalır)
+            _parse_xpub(xpub)
             return True
             
         except Exception:
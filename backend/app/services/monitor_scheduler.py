@@ -0,0 +1,234 @@
+import asyncio
+import heapq
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+from app.core.config import settings
+from app.db.models import TransactionStatus
+from app.services.payment_index import PendingPayment
+
+
+class TokenBucket:
+    """
+    Token bucket hız sınırlayıcı
+    TronGrid API anahtarı seviyesine göre saniyelik istek sayısını sınırlar
+    """
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated_at = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def set_rate(self, rate: float, capacity: Optional[float] = None):
+        """
+        Hız ve kapasiteyi güncelle (birikmiş token'lar yeni kapasiteyle sınırlanır)
+        """
+        self._refill()
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self._tokens = min(self._tokens, self.capacity)
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+        self._updated_at = now
+
+    async def acquire(self) -> float:
+        """
+        Bir token al, gerekirse token oluşana kadar bekle
+
+        Returns:
+            float: Beklenen süre (saniye), bekleme olmadıysa 0
+        """
+        waited = 0.0
+        # Lock bekleyenleri sıraya sokar (FIFO adaletli bekleme)
+        async with self._lock:
+            while True:
+                self._refill()
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return waited
+
+                delay = (1 - self._tokens) / self.rate
+                waited += delay
+                await asyncio.sleep(delay)
+
+
+class MonitorMetrics:
+    """
+    Blockchain monitor döngü metrikleri
+    """
+
+    def __init__(self):
+        self.cycles = 0
+        self.last_cycle_started_at: Optional[float] = None
+        self.last_cycle_duration_seconds = 0.0
+        self.last_cycle_payments = 0
+        self.queue_depth = 0
+        self.max_queue_depth = 0
+        self.active_workers = 0
+        self.throttled_requests = 0
+        self.throttle_wait_seconds = 0.0
+        self.rate_limited_responses = 0
+        self.failed_checks = 0
+        self.trongrid_requests = 0
+        self.scheduled_payments = 0
+        self.known_tx_cache_hits = 0
+        self.db_writes = 0
+
+    def cycle_started(self, payment_count: int):
+        self.last_cycle_started_at = time.time()
+        self.last_cycle_payments = payment_count
+        self.queue_depth = payment_count
+        self.max_queue_depth = max(self.max_queue_depth, payment_count)
+
+    def cycle_finished(self, duration: float):
+        self.cycles += 1
+        self.last_cycle_duration_seconds = duration
+        self.queue_depth = 0
+
+    def record_throttle(self, waited: float):
+        if waited > 0:
+            self.throttled_requests += 1
+            self.throttle_wait_seconds += waited
+
+    def snapshot(self) -> dict:
+        return {
+            "cycles": self.cycles,
+            "last_cycle_started_at": self.last_cycle_started_at,
+            "last_cycle_duration_seconds": round(self.last_cycle_duration_seconds, 3),
+            "last_cycle_payments": self.last_cycle_payments,
+            "queue_depth": self.queue_depth,
+            "max_queue_depth": self.max_queue_depth,
+            "active_workers": self.active_workers,
+            "throttled_requests": self.throttled_requests,
+            "throttle_wait_seconds": round(self.throttle_wait_seconds, 3),
+            "rate_limited_responses": self.rate_limited_responses,
+            "failed_checks": self.failed_checks,
+            "trongrid_requests": self.trongrid_requests,
+            "scheduled_payments": self.scheduled_payments,
+            "known_tx_cache_hits": self.known_tx_cache_hits,
+            "db_writes": self.db_writes
+        }
+
+
+class _PollState:
+    __slots__ = ("payment", "next_at", "interval", "seen_transfer")
+
+    def __init__(self, payment: PendingPayment):
+        self.payment = payment
+        self.next_at = 0.0
+        self.interval = 0.0
+        self.seen_transfer = False
+
+
+class PollSchedule:
+    """
+    Ödeme bazlı kontrol zamanlayıcısı (öncelik kuyruğu)
+
+    Her ödemenin kendi bir sonraki kontrol zamanı vardır:
+    - Yeni oluşturulan ödemeler sık kontrol edilir
+    - Onay bekleyen bir transfer görüldüyse blok süresine yakın aralıkla kontrol edilir
+    - Eskiyen ödemelerde aralık üstel olarak artar
+    - Son kontrol tam olarak expires_at anında yapılır, sonra ödeme kuyruktan çıkar
+    """
+
+    def __init__(self):
+        self._heap: List[Tuple[float, int]] = []
+        self._states: Dict[int, _PollState] = {}
+
+    def sync(self, payments: List[PendingPayment]):
+        """
+        Kuyruğu bekleyen ödeme listesiyle eşitle
+        Yeni ödemeler hemen kontrol edilmek üzere eklenir, listede olmayanlar çıkarılır
+        """
+        now = time.monotonic()
+        live_ids = set()
+
+        for payment in payments:
+            live_ids.add(payment.id)
+            state = self._states.get(payment.id)
+            if state is None:
+                state = _PollState(payment)
+                self._states[payment.id] = state
+                self._push(state, now)
+            else:
+                state.payment = payment
+
+        # Heap'teki eski kayıtlar pop sırasında atlanır (lazy deletion)
+        for payment_id in list(self._states):
+            if payment_id not in live_ids:
+                del self._states[payment_id]
+
+    def pop_due(self, now: Optional[float] = None) -> List[PendingPayment]:
+        """
+        Kontrol zamanı gelmiş ödemeleri döndür
+        """
+        now = time.monotonic() if now is None else now
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            next_at, payment_id = heapq.heappop(self._heap)
+            state = self._states.get(payment_id)
+            if state is None or state.next_at != next_at:
+                continue
+            due.append(state.payment)
+        return due
+
+    def reschedule(self, payment: PendingPayment, outcome: Optional[TransactionStatus]):
+        """
+        Kontrol sonucuna göre ödemenin bir sonraki kontrol zamanını belirle
+
+        Args:
+            outcome: CONFIRMED (ödeme onaylandı), PENDING (onay bekleyen transfer görüldü)
+                     veya None (eşleşen transfer yok)
+        """
+        state = self._states.get(payment.id)
+        if state is None:
+            return
+
+        remaining = (payment.expires_at - datetime.utcnow()).total_seconds()
+        if outcome == TransactionStatus.CONFIRMED or remaining <= 0:
+            del self._states[payment.id]
+            return
+
+        if outcome == TransactionStatus.PENDING:
+            state.seen_transfer = True
+
+        # Ödemenin yaşı, sabit ödeme süresinden kalan süre çıkarılarak bulunur
+        age = settings.PAYMENT_TIMEOUT_MINUTES * 60 - remaining
+
+        if state.seen_transfer:
+            interval = settings.MONITOR_CONFIRMING_POLL_SECONDS
+        elif age < settings.MONITOR_FRESH_WINDOW_SECONDS:
+            interval = settings.MONITOR_FAST_POLL_SECONDS
+        else:
+            interval = min(
+                max(state.interval, settings.MONITOR_FAST_POLL_SECONDS) * settings.MONITOR_BACKOFF_FACTOR,
+                settings.MONITOR_MAX_POLL_SECONDS
+            )
+
+        state.interval = interval
+        # Süre dolmadan önceki son kontrol tam expires_at anına denk getirilir
+        self._push(state, time.monotonic() + min(interval, remaining))
+
+    def seconds_until_next(self) -> Optional[float]:
+        """
+        Bir sonraki planlı kontrola kalan süre (kuyruk boşsa None)
+        """
+        while self._heap:
+            next_at, payment_id = self._heap[0]
+            state = self._states.get(payment_id)
+            if state is not None and state.next_at == next_at:
+                return max(0.0, next_at - time.monotonic())
+            heapq.heappop(self._heap)
+        return None
+
+    def _push(self, state: _PollState, next_at: float):
+        state.next_at = next_at
+        heapq.heappush(self._heap, (next_at, state.payment.id))
+
+    def __len__(self) -> int:
+        return len(self._states)
@@ -0,0 +1,252 @@
+import asyncio
+import hashlib
+import hmac
+import json
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+import logging
+from sqlalchemy import event, func, select
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.database import engine
+from app.db.models import PaymentStatus
+
+logger = logging.getLogger(__name__)
+
+PAYMENT_STATUS_CHANNEL = "payment_status"
+TERMINAL_STATUSES = {PaymentStatus.CONFIRMED, PaymentStatus.EXPIRED, PaymentStatus.FAILED}
+
+# NOTIFY payload sınırı 8000 byte; id'ler bu boyutta parçalara bölünür
+_NOTIFY_CHUNK_SIZE = 500
+
+# Kuyruğa konan yeniden senkronizasyon işareti: abone durumu veritabanından tekrar okumalı
+RESYNC = None
+
+class SubscriberLimitError(Exception):
+    """
+    Süreç başına abone sınırı aşıldı
+    """
+    pass
+
+class PaymentStatusHub:
+    """
+    Ödeme durum değişiklikleri için süreç içi pub/sub
+
+    Monitor (onay/süre dolumu) ve iptal yolları durum değişikliğini
+    notify() ile kendi transaction'larına ekler. PostgreSQL'de bu bir
+    pg_notify'dır ve commit'te tüm API süreçlerine ulaşır; her API süreci
+    tek bir LISTEN bağlantısıyla bildirimleri dinleyip ilgili ödemenin
+    abonelerine (SSE / long-poll istekleri) dağıtır. Diğer veritabanlarında
+    (geliştirme) bildirim commit sonrası sadece aynı süreçteki abonelere
+    iletilir.
+
+    Dinleme bağlantısı koparsa yeniden bağlanılır ve aradaki bildirimler
+    kaçmış olabileceğinden tüm abonelere RESYNC gönderilir.
+    """
+
+    def __init__(self):
+        self._subscribers: Dict[int, Set[asyncio.Queue]] = {}
+        self._subscriber_count = 0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @staticmethod
+    def _uses_notify(bind) -> bool:
+        return bind.dialect.name == "postgresql"
+
+    def notify(self, db: Session, payment_ids: Iterable[int], status: PaymentStatus):
+        """
+        Durum değişikliğini çağıranın transaction'ına ekle (commit'te yayınlanır)
+        """
+        payment_ids = list(payment_ids)
+        if not payment_ids:
+            return
+
+        if self._uses_notify(db.get_bind()):
+            for start in range(0, len(payment_ids), _NOTIFY_CHUNK_SIZE):
+                payload = json.dumps({"status": status.value, "ids": payment_ids[start:start + _NOTIFY_CHUNK_SIZE]})
+                db.execute(select(func.pg_notify(PAYMENT_STATUS_CHANNEL, payload)))
+            return
+
+        event.listen(db, "after_commit", lambda session: self.publish(payment_ids, status), once=True)
+
+    def publish(self, payment_ids: Iterable[int], status: Optional[PaymentStatus]):
+        """
+        Abonelere ilet (thread-safe; monitor kendi event loop'unda çalışabilir)
+        """
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            return
+
+        payment_ids = list(payment_ids)
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+
+        if running is loop:
+            self._dispatch(payment_ids, status)
+        else:
+            loop.call_soon_threadsafe(self._dispatch, payment_ids, status)
+
+    def _dispatch(self, payment_ids: List[int], status: Optional[PaymentStatus]):
+        for payment_id in payment_ids:
+            for queue in self._subscribers.get(payment_id, ()):
+                queue.put_nowait(status)
+
+    def _resync_all(self):
+        for queues in self._subscribers.values():
+            for queue in queues:
+                queue.put_nowait(RESYNC)
+
+    def is_full(self) -> bool:
+        return self._subscriber_count >= settings.PAYMENT_EVENTS_MAX_SUBSCRIBERS
+
+    def acquire(self, payment_id: int) -> asyncio.Queue:
+        """
+        Ödemenin durum değişikliklerine abone ol, abonelik kuyruğunu döndür
+
+        Kuyruğa yeni durum veya RESYNC (durumu tekrar oku) konur. Kaçan
+        bildirim olmaması için abone olduktan sonra güncel durum okunmalıdır.
+        Abonelik release() ile bırakılmalıdır.
+
+        Raises:
+            SubscriberLimitError: Süreç başına abone sınırı doluysa
+        """
+        if self.is_full():
+            raise SubscriberLimitError()
+
+        self._loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue()
+        self._subscribers.setdefault(payment_id, set()).add(queue)
+        self._subscriber_count += 1
+        return queue
+
+    def release(self, payment_id: int, queue: asyncio.Queue):
+        """
+        Aboneliği bırak (birden fazla çağrılabilir)
+        """
+        queues = self._subscribers.get(payment_id)
+        if queues is None or queue not in queues:
+            return
+        queues.discard(queue)
+        self._subscriber_count -= 1
+        if not queues:
+            del self._subscribers[payment_id]
+
+    def start(self):
+        """
+        API sürecinde bildirim dinleyicisini başlat
+        """
+        self._loop = asyncio.get_running_loop()
+        if self._uses_notify(engine):
+            self._task = asyncio.create_task(self._listen())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _listen(self):
+        logger.info("Ödeme durum bildirimleri dinleniyor...")
+        reconnecting = False
+        while True:
+            connection = None
+            try:
+                connection = await asyncio.to_thread(self._connect)
+                if reconnecting:
+                    self._resync_all()
+                reconnecting = True
+                await self._read_notifications(connection)
+
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Ödeme durum dinleyicisi hatası: {e}")
+            finally:
+                if connection is not None:
+                    connection.close()
+
+            await asyncio.sleep(settings.PAYMENT_EVENTS_RECONNECT_SECONDS)
+
+    @staticmethod
+    def _connect():
+        """
+        Havuzdan ayrılmış, autocommit LISTEN bağlantısı (psycopg2)
+        """
+        raw = engine.raw_connection()
+        raw.detach()
+        connection = raw.driver_connection
+        connection.autocommit = True
+        with connection.cursor() as cursor:
+            cursor.execute(f"LISTEN {PAYMENT_STATUS_CHANNEL}")
+        return connection
+
+    async def _read_notifications(self, connection):
+        """
+        Soket okunabilir oldukça bildirimleri dağıt; bağlantı koparsa hata fırlatır
+        """
+        loop = asyncio.get_running_loop()
+        readable = asyncio.Event()
+        loop.add_reader(connection.fileno(), readable.set)
+        try:
+            while True:
+                try:
+                    await asyncio.wait_for(readable.wait(), settings.PAYMENT_EVENTS_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    # Sessiz kopmaları fark etmek için bağlantıyı yokla (event loop bloklanmaz)
+                    await asyncio.to_thread(self._ping, connection)
+                readable.clear()
+
+                connection.poll()
+                while connection.notifies:
+                    self._handle_payload(connection.notifies.pop(0).payload)
+        finally:
+            loop.remove_reader(connection.fileno())
+
+    @staticmethod
+    def _ping(connection):
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1")
+
+    def _handle_payload(self, payload: str):
+        try:
+            message = json.loads(payload)
+            self._dispatch(message["ids"], PaymentStatus(message["status"]))
+        except Exception as e:
+            logger.error(f"Geçersiz ödeme durum bildirimi: {payload[:200]} ({e})")
+
+    @staticmethod
+    def status_signature(payment_id: int) -> str:
+        """
+        Tarayıcıya verilen durum adreslerinin imzası (API anahtarı gerektirmez)
+        """
+        message = f"durum|{payment_id}".encode("utf-8")
+        return hmac.new(settings.SECRET_KEY.encode("utf-8"), message, hashlib.sha256).hexdigest()[:32]
+
+    def verify_status_signature(self, payment_id: int, signature: str) -> bool:
+        return hmac.compare_digest(self.status_signature(payment_id), signature)
+
+    def status_paths(self, payment_id: int) -> Tuple[str, str]:
+        """
+        (SSE akışı, long-poll) yolları (API_V1_STR'e göre)
+        """
+        signature = self.status_signature(payment_id)
+        return (
+            f"/odemeler/durum-akisi/{payment_id}?imza={signature}",
+            f"/odemeler/durum-bekle/{payment_id}?imza={signature}"
+        )
+
+    def stats(self) -> dict:
+        return {
+            "subscribers": self._subscriber_count,
+            "payments": len(self._subscribers),
+            "listening": self._task is not None and not self._task.done()
+        }
+
+# Singleton instance
+payment_status_hub = PaymentStatusHub()
@@ -0,0 +1,151 @@
+import threading
+import time
+from datetime import datetime, timezone
+from decimal import Decimal
+from typing import Dict, List, Optional, Set
+import logging
+
+from app.core.config import settings
+from app.db.database import SessionLocal
+from app.db.models import PaymentRequest, PaymentStatus
+from app.services.crypto import CryptoService
+
+logger = logging.getLogger(__name__)
+
+def _to_naive_utc(value: datetime) -> datetime:
+    """
+    Timezone bilgili datetime'ı naive UTC'ye çevir (datetime.utcnow() ile karşılaştırmak için)
+    """
+    if value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+class PendingPayment:
+    """
+    Bekleyen ödemenin monitor için gerekli alanları (ORM objesi değil)
+    """
+
+    __slots__ = ("id", "payment_address", "amount", "expires_at", "address_hex")
+
+    def __init__(self, id: int, payment_address: str, amount: Decimal, expires_at: datetime):
+        self.id = id
+        self.payment_address = payment_address
+        self.amount = amount
+        self.expires_at = _to_naive_utc(expires_at)
+        self.address_hex = CryptoService.tron_address_to_hex(payment_address)
+
+class PendingPaymentIndex:
+    """
+    Bekleyen ödemeler için bellekte tutulan adres indeksi
+
+    İlk çağrıda tüm bekleyen ödemeler yüklenir; sonraki yenilemelerde sadece
+    id watermark'ından sonra eklenen satırlar okunur. Onaylanan ödemeler
+    monitor tarafından çıkarılır, süresi dolanlar bellekte temizlenir.
+    İptal gibi dış değişiklikler periyodik tam senkronizasyonla yakalanır.
+    """
+
+    def __init__(self):
+        self._by_address: Dict[str, PendingPayment] = {}
+        self._by_hex: Dict[str, PendingPayment] = {}
+        self._watermark = 0
+        self._last_full_sync: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def refresh(self) -> Set[str]:
+        """
+        İndeksi veritabanıyla güncelle (senkron, thread pool'da çağrılmalı)
+
+        Returns:
+            İndeksten düşen adresler (süresi dolanlar ve tam senkronizasyonda
+            artık bekleyen olmayanlar); adrese bağlı önbellekleri temizlemek için
+        """
+        full_sync = (
+            self._last_full_sync is None or
+            time.monotonic() - self._last_full_sync >= settings.PAYMENT_INDEX_FULL_SYNC_SECONDS
+        )
+
+        db = SessionLocal()
+        try:
+            query = db.query(
+                PaymentRequest.id,
+                PaymentRequest.payment_address,
+                PaymentRequest.amount,
+                PaymentRequest.expires_at
+            ).filter(
+                PaymentRequest.status == PaymentStatus.PENDING,
+                PaymentRequest.expires_at > datetime.utcnow()
+            )
+
+            if not full_sync:
+                # Commit sırası id sırasından farklı olabilir; küçük bir örtüşme
+                # penceresi geç commit edilen satırların kaçırılmasını önler
+                query = query.filter(
+                    PaymentRequest.id > self._watermark - settings.PAYMENT_INDEX_ID_OVERLAP
+                )
+
+            rows = query.all()
+        finally:
+            db.close()
+
+        entries = [PendingPayment(*row) for row in rows]
+
+        dropped: Set[str] = set()
+        with self._lock:
+            if full_sync:
+                dropped = set(self._by_address) - {entry.payment_address for entry in entries}
+                self._by_address = {}
+                self._by_hex = {}
+                self._last_full_sync = time.monotonic()
+
+            for entry in entries:
+                self._by_address[entry.payment_address] = entry
+                self._by_hex[entry.address_hex] = entry
+                self._watermark = max(self._watermark, entry.id)
+
+        dropped.update(entry.payment_address for entry in self.prune_expired())
+
+        if full_sync:
+            logger.info(f"Bekleyen ödeme indeksi tam senkronize edildi: {len(self._by_address)} ödeme")
+        return dropped
+
+    def prune_expired(self) -> List[PendingPayment]:
+        """
+        Süresi dolmuş kayıtları indeksten çıkar
+        """
+        now = datetime.utcnow()
+        with self._lock:
+            expired = [entry for entry in self._by_address.values() if entry.expires_at <= now]
+            for entry in expired:
+                self._discard(entry)
+        return expired
+
+    def remove(self, payment_address: str):
+        """
+        Onaylanan / sonlanan ödemeyi indeksten çıkar
+        """
+        with self._lock:
+            entry = self._by_address.get(payment_address)
+            if entry:
+                self._discard(entry)
+
+    def _discard(self, entry: PendingPayment):
+        self._by_address.pop(entry.payment_address, None)
+        self._by_hex.pop(entry.address_hex, None)
+
+    def get(self, payment_address: str) -> Optional[PendingPayment]:
+        return self._by_address.get(payment_address)
+
+    def get_by_hex(self, address_hex: str) -> Optional[PendingPayment]:
+        return self._by_hex.get(address_hex)
+
+    def pending(self) -> List[PendingPayment]:
+        """
+        Bekleyen ödemeler, süresi en yakın dolacak olan önce
+        """
+        with self._lock:
+            entries = list(self._by_address.values())
+        entries.sort(key=lambda entry: entry.expires_at)
+        return entries
+
+    def __len__(self) -> int:
+        return len(self._by_address)
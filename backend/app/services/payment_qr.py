@@ -0,0 +1,153 @@
+import asyncio
+import base64
+import hashlib
+import hmac
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Union
+from urllib.parse import urlencode
+import logging
+
+from app.core.cache import LRUCache
+from app.core.config import settings
+from app.core.executors import cpu_process_pool
+from app.services.crypto import CryptoService
+
+logger = logging.getLogger(__name__)
+
+QR_FORMATS = ("png", "svg", "matrix")
+QR_IMAGE_MEDIA_TYPES = {"png": "image/png", "svg": "image/svg+xml"}
+
+class PaymentQRService:
+    """
+    Ödeme QR kodu önbelleği
+
+    (adres, tutar, token, format) başına üretilen çıktı LRU önbellekte
+    ödemenin süresi dolana kadar tutulur (en az QR_CACHE_MIN_TTL_SECONDS).
+    Önbellekte olmayan çıktı süreç havuzunda üretilir; aynı anahtar için
+    eşzamanlı istekler tek üretimi bekler. SVG ve matris formatları PIL
+    kullanmaz.
+    """
+
+    def __init__(self):
+        self._cache = LRUCache(settings.QR_CACHE_SIZE)
+        self._rendering: Dict[tuple, asyncio.Future] = {}
+
+    async def render(
+        self,
+        address: str,
+        amount: float,
+        qr_format: str = "png",
+        expires_at: Optional[datetime] = None
+    ) -> Union[str, List[str]]:
+        """
+        QR kodu istenen formatta döndür
+
+        Returns:
+            png/svg için data URI, matrix için "0"/"1" satırları
+        """
+        key = (address, amount, settings.USDT_CONTRACT_ADDRESS, qr_format)
+        cached = self._cache.get(key)
+        if cached is not None:
+            return cached
+
+        rendering = self._rendering.get(key)
+        if rendering is not None:
+            try:
+                return await asyncio.shield(rendering)
+            except asyncio.CancelledError:
+                # Üreten istek iptal edildiyse bekleyen kendisi üretir
+                if not rendering.cancelled():
+                    raise
+                return await self.render(address, amount, qr_format, expires_at)
+
+        future = asyncio.get_running_loop().create_future()
+        self._rendering[key] = future
+        try:
+            result = await self._render(address, amount, qr_format)
+            self._cache.set(key, result, ttl=self._ttl(expires_at))
+            future.set_result(result)
+            return result
+        except Exception as e:
+            future.set_exception(e)
+            # Bekleyen yoksa "exception was never retrieved" uyarısı çıkmasın
+            future.exception()
+            raise
+        finally:
+            # İptalde (CancelledError) future sonuçsuz kalmasın, bekleyenler takılmasın
+            if not future.done():
+                future.cancel()
+            self._rendering.pop(key, None)
+
+    @staticmethod
+    async def _render(address: str, amount: float, qr_format: str) -> Union[str, List[str]]:
+        if qr_format == "matrix":
+            return await cpu_process_pool.run(CryptoService.generate_payment_qr_matrix, address, amount)
+
+        if qr_format == "svg":
+            svg = await cpu_process_pool.run(CryptoService.generate_payment_qr_svg, address, amount)
+            return f"data:image/svg+xml;base64,{base64.b64encode(svg.encode('utf-8')).decode()}"
+
+        return await cpu_process_pool.run(CryptoService.generate_payment_qr, address, amount)
+
+    @staticmethod
+    def _ttl(expires_at: Optional[datetime]) -> float:
+        """
+        Önbellek süresi: ödemenin kalan süresi (süresi dolmuşsa veya yoksa en az süre)
+        """
+        if expires_at is None:
+            return settings.QR_CACHE_MIN_TTL_SECONDS
+        if expires_at.tzinfo is not None:
+            expires_at = expires_at.astimezone(timezone.utc).replace(tzinfo=None)
+        remaining = (expires_at - datetime.utcnow()).total_seconds()
+        return max(remaining, settings.QR_CACHE_MIN_TTL_SECONDS)
+
+    async def render_image(
+        self,
+        address: str,
+        amount: float,
+        qr_format: str,
+        expires_at: Optional[datetime] = None
+    ) -> bytes:
+        """
+        QR görselinin ham byte'ları (png veya svg)
+        """
+        data_uri = await self.render(address, amount, qr_format, expires_at)
+        return base64.b64decode(data_uri.split(",", 1)[1])
+
+    @staticmethod
+    def image_signature(address: str, amount: float) -> str:
+        """
+        Görsel URL'i imzası; sadece API'nin verdiği (adres, tutar) çiftleri için görsel üretilir
+        """
+        message = f"qr|{address}|{amount}".encode("utf-8")
+        return hmac.new(settings.SECRET_KEY.encode("utf-8"), message, hashlib.sha256).hexdigest()[:32]
+
+    def verify_image_signature(self, address: str, amount: float, signature: str) -> bool:
+        return hmac.compare_digest(self.image_signature(address, amount), signature)
+
+    def image_path(self, address: str, amount: float, qr_format: str = "svg") -> str:
+        """
+        Kimlik doğrulaması gerektirmeyen, önbelleklenebilir görsel yolu (API_V1_STR'e göre)
+        """
+        query = urlencode({
+            "amount": amount,
+            "format": qr_format,
+            "imza": self.image_signature(address, amount)
+        })
+        return f"/odemeler/qr-gorsel/{address}?{query}"
+
+    @staticmethod
+    def image_etag(address: str, amount: float, qr_format: str) -> str:
+        """
+        Görsel içeriği sadece parametrelere bağlı olduğundan ETag görsel üretilmeden hesaplanır
+        """
+        digest = hashlib.sha256(
+            f"{address}|{amount}|{settings.USDT_CONTRACT_ADDRESS}|{qr_format}".encode("utf-8")
+        ).hexdigest()[:32]
+        return f'"{digest}"'
+
+    def stats(self) -> dict:
+        return self._cache.stats()
+
+# Singleton instance
+payment_qr_service = PaymentQRService()
@@ -0,0 +1,61 @@
+from typing import Optional
+from sqlalchemy import inspect
+from sqlalchemy.orm import Session, make_transient_to_detached
+
+from app.core.cache import LRUCache
+from app.core.config import settings
+from app.db.models import User
+
+# Önbelleğe alınmayan kolonlar; ihtiyaç olursa istek session'ında yüklenir
+_EXCLUDED_COLUMNS = {"hashed_password"}
+
+def snapshot_user(user: User) -> User:
+    """
+    Kullanıcının session'dan bağımsız (detached) kolon kopyası
+    """
+    snapshot = User(**{
+        attr.key: getattr(user, attr.key)
+        for attr in inspect(User).column_attrs
+        if attr.key not in _EXCLUDED_COLUMNS
+    })
+    make_transient_to_detached(snapshot)
+    return snapshot
+
+def attach_user(db: Session, snapshot: User) -> User:
+    """
+    Kopyayı SELECT yapmadan istek session'ına bağla
+    Dönen nesne session'a aittir; ilişkiler ve kopyada olmayan kolonlar
+    erişildiğinde yüklenir, değişiklikler commit ile yazılır.
+    """
+    return db.merge(snapshot, load=False)
+
+class UserPrincipalCache:
+    """
+    JWT ile çözülen aktif kullanıcıların önbelleği
+
+    Token imzası ve süresi her istekte doğrulanır; token subject'i (email)
+    için kullanıcı sorgusu USER_CACHE_TTL_SECONDS boyunca tekrarlanmaz.
+    Profil güncellemesinde (deaktivasyon dahil) kayıt hemen çıkarılır,
+    diğer API süreçlerinde en geç TTL sonunda güncellenir.
+    """
+
+    def __init__(self):
+        self._cache = LRUCache(settings.USER_CACHE_SIZE, ttl=settings.USER_CACHE_TTL_SECONDS)
+
+    def get(self, db: Session, email: str) -> Optional[User]:
+        snapshot = self._cache.get(email)
+        if snapshot is None:
+            return None
+        return attach_user(db, snapshot)
+
+    def set(self, user: User):
+        self._cache.set(user.email, snapshot_user(user))
+
+    def invalidate(self, email: str):
+        self._cache.pop(email)
+
+    def stats(self) -> dict:
+        return self._cache.stats()
+
+# Singleton instance
+user_principal_cache = UserPrincipalCache()
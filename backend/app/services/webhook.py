@@ -1,55 +1,140 @@
 import httpx
 import json
-import asyncio
-from typing import Optional
-from datetime import datetime
+import time
+from typing import List, NamedTuple, Optional
+from datetime import datetime, timedelta
 import logging
+from sqlalchemy import update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.orm import Session
 
 from app.core.config import settings
+from app.core.cache import LRUCache
 from app.core.security import create_webhook_signature
-from app.db.models import PaymentRequest, Transaction
+from app.db.models import PaymentRequest, Transaction, WebhookOutbox, WebhookDeliveryStatus, MerchantWebhookSettings
 from app.db.database import SessionLocal
+from app.services.webhook_transport import WebhookTransport
+
+try:
+    import orjson
+except ImportError:
+    # orjson opsiyonel; yoksa standart json ile aynı kanonik çıktı üretilir
+    orjson = None
 
 logger = logging.getLogger(__name__)
 
+PAYMENT_CONFIRMED_EVENT = "payment.confirmed"
+PAYMENT_BATCH_EVENT = "payment.batch"
+
+class DeliveryResult(NamedTuple):
+    """
+    Tek bir webhook HTTP isteğinin sonucu (delivery log'a yazılır)
+    """
+    success: bool
+    status_code: Optional[int]
+    error: Optional[str]
+    latency_ms: Optional[int]
+    response_snippet: Optional[str]
+
+def render_payload(payload: dict) -> bytes:
+    """
+    Payload'ı kanonik JSON byte'larına çevir (sıralı anahtarlar, boşluksuz, UTF-8)
+    İmza bu byte'lar üzerinden alınır ve merchant'a aynen gönderilir.
+    """
+    if orjson is not None:
+        return orjson.dumps(payload, option=orjson.OPT_SORT_KEYS)
+    return json.dumps(payload, sort_keys=True, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
 class WebhookService:
     """
     Webhook bildirim servisi
-    Ödeme onaylandığında merchant'a bildirim gönderir
+    Ödeme onaylandığında merchant bildirimini outbox'a yazar; gönderim
+    delivery worker'lar tarafından (bkz. webhook_outbox) yapılır
     """
     
     def __init__(self):
-        self.max_retries = 3
-        self.retry_delays = [1, 5, 15]  # Saniye cinsinden bekleme süreleri
+        # Merchant host'u başına paylaşılan client havuzu ve circuit breaker
+        self.transport = WebhookTransport()
+        
+        # merchant_id -> toplu gönderim süresi (kapalıysa None)
+        self._batch_windows = LRUCache(10000, ttl=settings.WEBHOOK_SETTINGS_CACHE_SECONDS)
     
-    async def send_payment_confirmation(self, payment: PaymentRequest, transaction: Transaction):
+    def enqueue_payment_confirmation(self, db: Session, payment: PaymentRequest, transaction: Transaction) -> bool:
         """
-        Ödeme onay webhook'u gönder
+        Ödeme onay webhook'unu outbox'a ekle
+        
+        Çağıranın session'ı içinde çalışır ve onayla aynı commit'te kalıcı olur;
+        süreç yeniden başlasa bile gönderim kaybolmaz. (payment_request_id, event)
+        benzersiz olduğundan aynı onay ikinci kez kuyruğa girmez.
+        
+        Returns:
+            bool: Yeni outbox kaydı eklendiyse True
         """
         if not payment.webhook_url:
             logger.warning(f"Webhook URL tanımlanmamış: {payment.order_id}")
-            return
+            return False
         
-        # Webhook payload'ı hazırla
+        # Webhook payload'ı bir kez oluşturulup imzalanır; tekrar denemelerde
+        # aynı byte'lar ve imza yeniden hesaplanmadan gönderilir
         payload = self._prepare_payment_payload(payment, transaction)
+        body = render_payload(payload)
+        
+        # Toplu gönderim modunda kayıt pencere süresi kadar bekletilir; aynı
+        # batch_key'e sahip kayıtlar delivery worker tarafından birlikte gönderilir
+        next_attempt_at = datetime.utcnow()
+        batch_key = None
+        batch_window = self.get_batch_window(db, payment.merchant_id)
+        if batch_window:
+            batch_key = f"{payment.merchant_id}:{payment.webhook_url}"
+            next_attempt_at += timedelta(seconds=batch_window)
         
-        # Webhook gönder (retry ile)
-        success = await self._send_webhook_with_retry(
-            payment.webhook_url,
-            payload,
-            payment.id
+        stmt = pg_insert(WebhookOutbox).values(
+            payment_request_id=payment.id,
+            event=payload["event"],
+            webhook_url=payment.webhook_url,
+            payload=body.decode("utf-8"),
+            payload_timestamp=payload["timestamp"],
+            signature=create_webhook_signature(body, settings.WEBHOOK_SECRET),
+            batch_key=batch_key,
+            status=WebhookDeliveryStatus.PENDING,
+            attempts=0,
+            next_attempt_at=next_attempt_at
+        ).on_conflict_do_nothing(
+            index_elements=[WebhookOutbox.payment_request_id, WebhookOutbox.event]
         )
+        return db.execute(stmt).rowcount > 0
+    
+    def get_batch_window(self, db: Session, merchant_id: int) -> Optional[int]:
+        """
+        Merchant toplu gönderimi açtıysa biriktirme süresi (saniye), kapalıysa None
+        Ayarlar kısa süreli önbellekte tutulur (onay başına ek sorgu yapılmaz).
+        """
+        cached = self._batch_windows.get(merchant_id)
+        if cached is not None:
+            return cached or None
         
-        # Database'i güncelle
-        await self._update_webhook_status(payment.id, success)
+        webhook_settings = db.query(MerchantWebhookSettings).filter(
+            MerchantWebhookSettings.user_id == merchant_id
+        ).first()
+        
+        window = 0
+        if webhook_settings and webhook_settings.batch_enabled:
+            window = webhook_settings.batch_window_seconds
+        self._batch_windows.set(merchant_id, window)
+        return window or None
+    
+    def invalidate_batch_window(self, merchant_id: int):
+        """
+        Merchant ayarı değiştiğinde önbelleği temizle (diğer süreçlerde TTL sonunda güncellenir)
+        """
+        self._batch_windows.pop(merchant_id)
     
     def _prepare_payment_payload(self, payment: PaymentRequest, transaction: Transaction) -> dict:
         """
         Webhook payload'ını hazırla
         """
         return {
-            "event": "payment.confirmed",
+            "event": PAYMENT_CONFIRMED_EVENT,
             "data": {
                 "payment_id": payment.id,
                 "order_id": payment.order_id,
@@ -73,71 +158,79 @@ class WebhookService:
             "version": "1.0"
         }
     
-    async def _send_webhook_with_retry(self, webhook_url: str, payload: dict, payment_id: int) -> bool:
+    async def deliver(
+        self,
+        webhook_url: str,
+        body: bytes,
+        event: str,
+        timestamp: str,
+        signature: str
+    ) -> DeliveryResult:
         """
-        Webhook'u retry mekanizması ile gönder
+        Outbox kaydının önceden imzalanmış gövdesini tek bir deneme ile gönder
+        (tekrar zamanlaması outbox'ta tutulur)
         """
-        payload_json = json.dumps(payload, sort_keys=True)
-        
-        # HMAC imzası oluştur
-        signature = create_webhook_signature(payload_json, settings.WEBHOOK_SECRET)
+        return await self._post(webhook_url, body, event, timestamp, signature)
+    
+    async def deliver_batch(self, webhook_url: str, bodies: List[bytes]) -> DeliveryResult:
+        """
+        Aynı URL'e giden birden fazla outbox kaydını tek bir imzalı istekte gönder
+        Gövde, payment.confirmed event'lerinden oluşan bir dizi içerir.
         
+        Event'ler kayıtlı kanonik byte'larıyla birleştirilir (yeniden parse/serialize
+        edilmez); sadece toplu gövde bir kez imzalanır.
+        """
+        timestamp = datetime.utcnow().isoformat()
+        # render_payload ile aynı kanonik biçim: anahtarlar alfabetik, boşluksuz
+        body = b"".join((
+            b'{"count":', str(len(bodies)).encode(),
+            b',"event":"', PAYMENT_BATCH_EVENT.encode(),
+            b'","events":[', b",".join(bodies),
+            b'],"timestamp":"', timestamp.encode(),
+            b'","version":"1.0"}'
+        ))
+        signature = create_webhook_signature(body, settings.WEBHOOK_SECRET)
+        return await self._post(webhook_url, body, PAYMENT_BATCH_EVENT, timestamp, signature)
+    
+    async def _post(
+        self,
+        webhook_url: str,
+        body: bytes,
+        event: str,
+        timestamp: str,
+        signature: str
+    ) -> DeliveryResult:
         headers = {
             "Content-Type": "application/json",
             "User-Agent": "PayKript-Webhook/1.0",
             "X-PayKript-Signature": signature,
-            "X-PayKript-Event": payload["event"],
-            "X-PayKript-Timestamp": payload["timestamp"]
+            "X-PayKript-Event": event,
+            "X-PayKript-Timestamp": timestamp
         }
         
-        for attempt in range(self.max_retries):
-            try:
-                logger.info(f"Webhook gönderiliyor (deneme {attempt + 1}): {webhook_url}")
-                
-                async with httpx.AsyncClient(timeout=30.0) as client:
-                    response = await client.post(
-                        webhook_url,
-                        content=payload_json,
-                        headers=headers
-                    )
-                    
-                    # 2xx response kodları başarılı sayılır
-                    if 200 <= response.status_code < 300:
-                        logger.info(f"Webhook başarılı: {webhook_url} - {response.status_code}")
-                        return True
-                    else:
-                        logger.warning(f"Webhook başarısız: {webhook_url} - {response.status_code}")
-                        
-            except Exception as e:
-                logger.error(f"Webhook hatası (deneme {attempt + 1}): {webhook_url} - {e}")
-            
-            # Son deneme değilse bekle
-            if attempt < self.max_retries - 1:
-                await asyncio.sleep(self.retry_delays[attempt])
-        
-        logger.error(f"Webhook tüm denemeler başarısız: {webhook_url}")
-        return False
-    
-    async def _update_webhook_status(self, payment_id: int, success: bool):
-        """
-        Webhook durumunu database'de güncelle
-        """
+        started = time.monotonic()
         try:
-            db = SessionLocal()
+            logger.info(f"Webhook gönderiliyor: {webhook_url}")
             
-            payment = db.query(PaymentRequest).filter(
-                PaymentRequest.id == payment_id
-            ).first()
+            response = await self.transport.post(
+                webhook_url,
+                content=body,
+                headers=headers
+            )
+            latency_ms = int((time.monotonic() - started) * 1000)
+            snippet = response.text[:settings.WEBHOOK_LOG_SNIPPET_CHARS]
             
-            if payment:
-                payment.webhook_sent = success
-                payment.webhook_attempts += 1
-                db.commit()
-                
-            db.close()
+            # 2xx response kodları başarılı sayılır
+            if 200 <= response.status_code < 300:
+                logger.info(f"Webhook başarılı: {webhook_url} - {response.status_code}")
+                return DeliveryResult(True, response.status_code, None, latency_ms, snippet)
             
+            logger.warning(f"Webhook başarısız: {webhook_url} - {response.status_code}")
+            return DeliveryResult(False, response.status_code, f"HTTP {response.status_code}", latency_ms, snippet)
+        
         except Exception as e:
-            logger.error(f"Webhook durumu güncelleme hatası: {e}")
+            logger.error(f"Webhook hatası: {webhook_url} - {e}")
+            return DeliveryResult(False, None, str(e), int((time.monotonic() - started) * 1000), None)
     
     async def test_webhook_endpoint(self, webhook_url: str) -> dict:
         """
@@ -154,7 +247,7 @@ class WebhookService:
         }
         
         try:
-            payload_json = json.dumps(test_payload, sort_keys=True)
+            payload_json = render_payload(test_payload)
             signature = create_webhook_signature(payload_json, settings.WEBHOOK_SECRET)
             
             headers = {
@@ -178,7 +271,7 @@ class WebhookService:
                     "response_time_ms": response.elapsed.total_seconds() * 1000,
                     "response_body": response.text[:500]  # İlk 500 karakter
                 }
-                
+        
         except Exception as e:
             return {
                 "success": False,
@@ -189,11 +282,10 @@ class WebhookService:
     
     async def resend_webhook(self, payment_id: int) -> bool:
         """
-        Başarısız webhook'u yeniden gönder
+        Başarısız webhook'u yeniden kuyruğa al
         """
+        db = SessionLocal()
         try:
-            db = SessionLocal()
-            
             payment = db.query(PaymentRequest).filter(
                 PaymentRequest.id == payment_id
             ).first()
@@ -206,21 +298,45 @@ class WebhookService:
                 logger.error(f"Webhook URL tanımlanmamış: {payment_id}")
                 return False
             
-            # İlişkili transaction'ı bul
-            transaction = payment.transactions[0] if payment.transactions else None
-            if not transaction:
-                logger.error(f"Transaction bulunamadı: {payment_id}")
-                return False
+            # Mevcut outbox kaydı varsa hemen tekrar denenmek üzere sıfırla
+            requeued = db.execute(
+                update(WebhookOutbox)
+                .where(
+                    WebhookOutbox.payment_request_id == payment_id,
+                    WebhookOutbox.event == PAYMENT_CONFIRMED_EVENT,
+                    WebhookOutbox.status != WebhookDeliveryStatus.DELIVERING
+                )
+                .values(
+                    status=WebhookDeliveryStatus.PENDING,
+                    attempts=0,
+                    next_attempt_at=datetime.utcnow(),
+                    locked_until=None
+                )
+                .execution_options(synchronize_session=False)
+            ).rowcount
             
-            db.close()
+            if not requeued:
+                # İlişkili transaction'ı bul
+                transaction = payment.transactions[0] if payment.transactions else None
+                if not transaction:
+                    logger.error(f"Transaction bulunamadı: {payment_id}")
+                    return False
+                
+                self.enqueue_payment_confirmation(db, payment, transaction)
             
-            # Webhook gönder
-            await self.send_payment_confirmation(payment, transaction)
-            return True
+            db.commit()
             
+            # Delivery worker'ı uyandır
+            from app.services.webhook_outbox import webhook_outbox_worker
+            webhook_outbox_worker.wake()
+            return True
+        
         except Exception as e:
             logger.error(f"Webhook yeniden gönderme hatası: {e}")
+            db.rollback()
             return False
+        finally:
+            db.close()
 
 # Singleton instance
-webhook_service = WebhookService() 
\ No newline at end of file
+webhook_service = WebhookService()
\ No newline at end of file
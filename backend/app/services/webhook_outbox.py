@@ -0,0 +1,410 @@
+import asyncio
+import os
+import socket
+import uuid
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Set, Tuple
+import logging
+from sqlalchemy import and_, or_, update
+
+from app.core.config import settings
+from app.db.database import SessionLocal
+from app.db.models import WebhookOutbox, WebhookDeliveryStatus
+from app.services.webhook import webhook_service
+from app.services.webhook_status import WebhookStatusWriter
+from app.services.webhook_transport import webhook_host
+from app.services.worker_metrics import worker_metrics_store, WEBHOOK_METRICS_ROLE
+
+logger = logging.getLogger(__name__)
+
+class OutboxRecord:
+    """
+    Gönderim için kiralanmış outbox kaydı (ORM objesi değil)
+    """
+
+    __slots__ = (
+        "id", "payment_request_id", "webhook_url", "event", "body",
+        "payload_timestamp", "signature", "batch_key", "attempts"
+    )
+
+    def __init__(
+        self,
+        id: int,
+        payment_request_id: int,
+        webhook_url: str,
+        event: str,
+        payload: str,
+        payload_timestamp: str,
+        signature: str,
+        batch_key: Optional[str],
+        attempts: int
+    ):
+        self.id = id
+        self.payment_request_id = payment_request_id
+        self.webhook_url = webhook_url
+        self.event = event
+        self.body = payload.encode("utf-8")
+        self.payload_timestamp = payload_timestamp
+        self.signature = signature
+        self.batch_key = batch_key
+        self.attempts = attempts or 0
+
+class WebhookOutboxWorker:
+    """
+    Webhook outbox delivery worker havuzu
+
+    Zamanı gelen outbox kayıtlarını FOR UPDATE SKIP LOCKED ile kiralar ve
+    sınırlı sayıda eşzamanlı görevle gönderir. Host başına eşzamanlı gönderim
+    sınırı kiralama sırasında uygulanır: sınırına ulaşmış host'ların kayıtları
+    kiralanmaz, böylece yavaş bir merchant worker slotlarını doldurup
+    diğerlerinin teslimatını bekletmez. Birden fazla süreç aynı
+    tabloyu güvenle paylaşabilir; çöken worker'ın kayıtları kira süresi
+    dolunca tekrar alınır.
+
+    Toplu gönderim modundaki (batch_key'li) kayıtlardan biri zamanı gelince
+    aynı anahtarlı bekleyen tüm kayıtlar da kiralanır ve tek istekte gönderilir.
+    """
+
+    def __init__(self):
+        self._inflight: Set[asyncio.Task] = set()
+        self._inflight_ids: Dict[asyncio.Task, List[int]] = {}
+        self._inflight_urls: Dict[asyncio.Task, str] = {}
+        self._host_semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._wake: Optional[asyncio.Event] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._metrics_task: Optional[asyncio.Task] = None
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+        # Gönderim sonuçları event loop'u bloklamadan toplu yazılır
+        self.status_writer = WebhookStatusWriter()
+
+    def wake(self):
+        """
+        Yeni outbox kaydı eklendiğini bildir (herhangi bir thread'den çağrılabilir)
+        """
+        if self._loop is not None and self._wake is not None:
+            self._loop.call_soon_threadsafe(self._wake.set)
+
+    async def run(self):
+        """
+        Outbox'ı sürekli boşalt
+        """
+        logger.info("Webhook delivery worker başlatılıyor...")
+        self._loop = asyncio.get_running_loop()
+        self._wake = asyncio.Event()
+        self.status_writer.start()
+        # Metrik endpoint'i API sürecinde çalışmayan worker'ları da görsün
+        self._metrics_task = asyncio.create_task(
+            worker_metrics_store.run_publisher(self.worker_id, WEBHOOK_METRICS_ROLE, self.metrics_snapshot)
+        )
+
+        try:
+            while True:
+                try:
+                    capacity = settings.WEBHOOK_WORKER_COUNT - len(self._inflight)
+                    claimed: List[OutboxRecord] = []
+                    if capacity > 0:
+                        host_load, saturated_urls = self._host_load()
+                        claimed = await asyncio.to_thread(
+                            self._claim_batch, capacity, host_load, saturated_urls
+                        )
+                        for group in self._group_records(claimed):
+                            self._start_delivery(group)
+
+                    # Kapasite doluysa veya kuyrukta kayıt kalmadıysa uyandırılana kadar bekle
+                    if not claimed or len(self._inflight) >= settings.WEBHOOK_WORKER_COUNT:
+                        try:
+                            await asyncio.wait_for(self._wake.wait(), settings.WEBHOOK_POLL_INTERVAL_SECONDS)
+                        except asyncio.TimeoutError:
+                            pass
+                        self._wake.clear()
+
+                except Exception as e:
+                    logger.error(f"Webhook delivery döngüsü hatası: {e}")
+                    await asyncio.sleep(settings.WEBHOOK_POLL_INTERVAL_SECONDS * 5)
+        finally:
+            await self._shutdown()
+
+    @staticmethod
+    def _group_records(records: List[OutboxRecord]) -> List[List[OutboxRecord]]:
+        """
+        Toplu gönderim kayıtlarını batch_key'e göre grupla, diğerleri tek başına gider
+        """
+        groups: List[List[OutboxRecord]] = []
+        batches: Dict[str, List[OutboxRecord]] = {}
+        for record in records:
+            if record.batch_key is None:
+                groups.append([record])
+                continue
+            batch = batches.get(record.batch_key)
+            if batch is None or len(batch) >= settings.WEBHOOK_BATCH_MAX_EVENTS:
+                batch = []
+                batches[record.batch_key] = batch
+                groups.append(batch)
+            batch.append(record)
+        return groups
+
+    def _start_delivery(self, records: List[OutboxRecord]):
+        task = asyncio.create_task(self._deliver(records))
+        self._inflight.add(task)
+        self._inflight_ids[task] = [record.id for record in records]
+        self._inflight_urls[task] = records[0].webhook_url
+        task.add_done_callback(self._delivery_done)
+
+    def _delivery_done(self, task: asyncio.Task):
+        self._inflight.discard(task)
+        self._inflight_ids.pop(task, None)
+        self._inflight_urls.pop(task, None)
+        # Boşalan kapasite için yeni kayıt alınsın
+        if self._wake is not None:
+            self._wake.set()
+
+    def _host_load(self) -> Tuple[Dict[str, int], Set[str]]:
+        """
+        Host başına devam eden gönderim sayısı ve sınırına ulaşmış host'ların URL'leri
+        """
+        host_load: Dict[str, int] = {}
+        for url in self._inflight_urls.values():
+            host = webhook_host(url)
+            host_load[host] = host_load.get(host, 0) + 1
+
+        saturated_urls = {
+            url for url in self._inflight_urls.values()
+            if host_load[webhook_host(url)] >= settings.WEBHOOK_MAX_CONCURRENCY_PER_HOST
+        }
+        return host_load, saturated_urls
+
+    def _get_host_semaphore(self, url: str) -> asyncio.Semaphore:
+        """
+        Merchant host'u başına eşzamanlı gönderim sınırı
+        (kiralama zaten sınırı uygular; bölünen toplu gönderimler için yedek)
+        """
+        host = webhook_host(url)
+        semaphore = self._host_semaphores.get(host)
+        if semaphore is None:
+            semaphore = asyncio.Semaphore(settings.WEBHOOK_MAX_CONCURRENCY_PER_HOST)
+            self._host_semaphores[host] = semaphore
+        return semaphore
+
+    async def _deliver(self, records: List[OutboxRecord]):
+        webhook_url = records[0].webhook_url
+        outbox_ids = [record.id for record in records]
+        try:
+            async with self._get_host_semaphore(webhook_url):
+                # Devresi açık host'a istek gönderilmez, kayıt deneme sayılmadan ertelenir
+                # (kontrol sıra gelince yapılır; bekleyen kayıtlar açılan devreye takılır)
+                wait = webhook_service.transport.check_circuit(webhook_url)
+                if wait is None:
+                    try:
+                        if records[0].batch_key is not None:
+                            result = await webhook_service.deliver_batch(
+                                webhook_url, [record.body for record in records]
+                            )
+                        else:
+                            record = records[0]
+                            result = await webhook_service.deliver(
+                                webhook_url,
+                                record.body,
+                                record.event,
+                                record.payload_timestamp,
+                                record.signature
+                            )
+                    except asyncio.CancelledError:
+                        webhook_service.transport.release_probe(webhook_url)
+                        raise
+                    except Exception:
+                        # İstek gönderilmeden oluşan hata da sonuç sayılır; aksi halde
+                        # yarı açık devrenin deneme hakkı hiç bırakılmaz
+                        webhook_service.transport.record_failure(webhook_url)
+                        raise
+
+            if wait is not None:
+                await asyncio.to_thread(self._defer, outbox_ids, wait)
+                return
+
+            self.status_writer.submit(
+                [(record.id, record.payment_request_id, record.attempts + 1) for record in records],
+                result
+            )
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Webhook teslim hatası (outbox {outbox_ids}): {e}")
+
+    def _claim_batch(
+        self,
+        limit: int,
+        host_load: Dict[str, int],
+        saturated_urls: Set[str]
+    ) -> List[OutboxRecord]:
+        """
+        Zamanı gelen kayıtları kirala (senkron, thread pool'da çağrılmalı)
+        Kira süresi geçmiş DELIVERING kayıtları da (çöken worker) tekrar alınır.
+
+        En fazla limit gönderim (toplu gönderimde batch_key başına bir) kiralanır.
+        Host başına sınırına ulaşmış host'ların kayıtları atlanır: sınırdaki
+        URL'ler sorguda elenir, aynı host'un diğer URL'leri burada sayılarak
+        atlanır. Atlanan kayıtlar PENDING kalır ve host'ta yer açılınca alınır.
+        """
+        db = SessionLocal()
+        try:
+            now = datetime.utcnow()
+            columns = (
+                WebhookOutbox.id,
+                WebhookOutbox.payment_request_id,
+                WebhookOutbox.webhook_url,
+                WebhookOutbox.event,
+                WebhookOutbox.payload,
+                WebhookOutbox.payload_timestamp,
+                WebhookOutbox.signature,
+                WebhookOutbox.batch_key,
+                WebhookOutbox.attempts
+            )
+            query = db.query(*columns).filter(
+                or_(
+                    and_(
+                        WebhookOutbox.status == WebhookDeliveryStatus.PENDING,
+                        WebhookOutbox.next_attempt_at <= now
+                    ),
+                    and_(
+                        WebhookOutbox.status == WebhookDeliveryStatus.DELIVERING,
+                        WebhookOutbox.locked_until < now
+                    )
+                )
+            )
+            if saturated_urls:
+                query = query.filter(WebhookOutbox.webhook_url.notin_(saturated_urls))
+            candidates = query.order_by(
+                WebhookOutbox.next_attempt_at
+            ).limit(settings.WEBHOOK_CLAIM_BATCH_SIZE).with_for_update(skip_locked=True).all()
+
+            rows = []
+            host_load = dict(host_load)
+            batch_keys: Set[str] = set()
+            deliveries = 0
+            for row in candidates:
+                if row.batch_key is not None and row.batch_key in batch_keys:
+                    rows.append(row)
+                    continue
+                if deliveries >= limit:
+                    continue
+                host = webhook_host(row.webhook_url)
+                if host_load.get(host, 0) >= settings.WEBHOOK_MAX_CONCURRENCY_PER_HOST:
+                    continue
+                host_load[host] = host_load.get(host, 0) + 1
+                deliveries += 1
+                if row.batch_key is not None:
+                    batch_keys.add(row.batch_key)
+                rows.append(row)
+
+            if not rows:
+                db.rollback()
+                return []
+
+            # Toplu gönderim: zamanı gelen kaydın biriktirme penceresindeki
+            # kardeşleri de (zamanı gelmemiş olsalar bile) aynı istekte gönderilir
+            claimed_ids = {row.id for row in rows}
+            for batch_key in {row.batch_key for row in rows if row.batch_key is not None}:
+                siblings = db.query(*columns).filter(
+                    WebhookOutbox.batch_key == batch_key,
+                    WebhookOutbox.status == WebhookDeliveryStatus.PENDING,
+                    WebhookOutbox.id.notin_(claimed_ids)
+                ).order_by(
+                    WebhookOutbox.id
+                ).limit(settings.WEBHOOK_BATCH_MAX_EVENTS).with_for_update(skip_locked=True).all()
+                rows.extend(siblings)
+                claimed_ids.update(row.id for row in siblings)
+
+            db.execute(
+                update(WebhookOutbox)
+                .where(WebhookOutbox.id.in_(claimed_ids))
+                .values(
+                    status=WebhookDeliveryStatus.DELIVERING,
+                    locked_until=now + timedelta(seconds=settings.WEBHOOK_LEASE_SECONDS)
+                )
+                .execution_options(synchronize_session=False)
+            )
+            db.commit()
+
+            return [OutboxRecord(*row) for row in rows]
+
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def _defer(self, outbox_ids: List[int], delay: float):
+        """
+        Kayıtları deneme sayısını artırmadan ileri bir zamana ertele
+        """
+        db = SessionLocal()
+        try:
+            db.execute(
+                update(WebhookOutbox)
+                .where(
+                    WebhookOutbox.id.in_(outbox_ids),
+                    WebhookOutbox.status == WebhookDeliveryStatus.DELIVERING
+                )
+                .values(
+                    status=WebhookDeliveryStatus.PENDING,
+                    next_attempt_at=datetime.utcnow() + timedelta(seconds=delay),
+                    locked_until=None
+                )
+                .execution_options(synchronize_session=False)
+            )
+            db.commit()
+        except Exception as e:
+            logger.error(f"Outbox kayıtları ertelenemedi {outbox_ids}: {e}")
+            db.rollback()
+        finally:
+            db.close()
+
+    def _release(self, outbox_ids: List[int]):
+        """
+        Kapanışta tamamlanmamış kayıtların kirasını bırak (hemen tekrar alınabilsinler)
+        """
+        db = SessionLocal()
+        try:
+            db.execute(
+                update(WebhookOutbox)
+                .where(
+                    WebhookOutbox.id.in_(outbox_ids),
+                    WebhookOutbox.status == WebhookDeliveryStatus.DELIVERING
+                )
+                .values(status=WebhookDeliveryStatus.PENDING, locked_until=None)
+                .execution_options(synchronize_session=False)
+            )
+            db.commit()
+        except Exception as e:
+            logger.error(f"Outbox kiraları bırakılamadı: {e}")
+            db.rollback()
+        finally:
+            db.close()
+
+    def metrics_snapshot(self) -> dict:
+        """
+        Host bazında gecikme, hata oranı ve devre durumu
+        """
+        return {"hosts": webhook_service.transport.snapshot()}
+
+    async def _shutdown(self):
+        if self._metrics_task is not None:
+            self._metrics_task.cancel()
+            await asyncio.gather(self._metrics_task, return_exceptions=True)
+            self._metrics_task = None
+        pending_ids = [outbox_id for ids in self._inflight_ids.values() for outbox_id in ids]
+        for task in list(self._inflight):
+            task.cancel()
+        if self._inflight:
+            await asyncio.gather(*self._inflight, return_exceptions=True)
+        # Önce tamamlanan sonuçlar yazılır; kirası bırakılacak kayıtlar sadece yarım kalanlardır
+        await self.status_writer.stop()
+        if pending_ids:
+            await asyncio.to_thread(self._release, pending_ids)
+        await webhook_service.transport.close()
+        self._loop = None
+        self._wake = None
+
+# Singleton instance
+webhook_outbox_worker = WebhookOutboxWorker()
\ No newline at end of file
@@ -0,0 +1,255 @@
+import asyncio
+import time
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Tuple
+import logging
+from sqlalchemy import or_, update
+from sqlalchemy.orm import Query, Session
+
+from app.core.config import settings
+from app.db.database import SessionLocal
+from app.db.models import (
+    PaymentRequest, PaymentStatus, Transaction, TransactionStatus,
+    WebhookOutbox, WebhookDeliveryStatus, WebhookReplayJob, WebhookReplayStatus
+)
+from app.services.webhook import PAYMENT_CONFIRMED_EVENT, webhook_service
+from app.services.webhook_outbox import webhook_outbox_worker
+
+logger = logging.getLogger(__name__)
+
+def replay_candidates(
+    db: Session,
+    merchant_id: int,
+    confirmed_from: Optional[datetime],
+    confirmed_to: Optional[datetime]
+) -> Query:
+    """
+    Webhook'u teslim edilmemiş onaylı ödemeler (replay işinin kapsamı)
+    """
+    query = db.query(PaymentRequest).filter(
+        PaymentRequest.merchant_id == merchant_id,
+        PaymentRequest.status == PaymentStatus.CONFIRMED,
+        PaymentRequest.webhook_sent.is_not(True),
+        PaymentRequest.webhook_url.isnot(None)
+    )
+    if confirmed_from is not None:
+        query = query.filter(PaymentRequest.confirmed_at >= confirmed_from)
+    if confirmed_to is not None:
+        query = query.filter(PaymentRequest.confirmed_at < confirmed_to)
+    return query
+
+class WebhookReplayRunner:
+    """
+    Toplu webhook yeniden gönderim işlerini çalıştıran arka plan görevi
+
+    Merchant kesintisinden sonra oluşturulan replay işindeki ödemeler id
+    sırasıyla sayfa sayfa outbox'a yeniden alınır; gönderimi delivery worker
+    havuzu yapar (host sınırı, circuit breaker ve toplu gönderim aynen geçerli).
+    Her sayfa ilerleme imleciyle aynı transaction'da yazılır ve sayfalar
+    rate_per_second'a göre aralıklandırılır. İş kiralanarak alınır; süreç
+    çökerse kira dolunca başka bir worker kaldığı id'den devam eder.
+    """
+
+    async def run(self):
+        logger.info("Webhook replay worker başlatılıyor...")
+        while True:
+            try:
+                job_id = await asyncio.to_thread(self._claim_job)
+                if job_id is None:
+                    await asyncio.sleep(settings.WEBHOOK_REPLAY_POLL_SECONDS)
+                    continue
+
+                await self._run_job(job_id)
+
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Webhook replay döngüsü hatası: {e}")
+                await asyncio.sleep(settings.WEBHOOK_REPLAY_POLL_SECONDS)
+
+    async def _run_job(self, job_id: int):
+        logger.info(f"Webhook replay işi başladı: {job_id}")
+        try:
+            while True:
+                started = time.monotonic()
+                page = await asyncio.to_thread(self._process_page, job_id)
+                if page is None:
+                    return
+
+                count, rate_per_second = page
+                webhook_outbox_worker.wake()
+
+                # Saniyede en fazla rate_per_second ödeme kuyruğa alınır
+                delay = count / rate_per_second - (time.monotonic() - started)
+                if delay > 0:
+                    await asyncio.sleep(delay)
+
+        except asyncio.CancelledError:
+            # Kapanışta kira bırakılır, iş başka bir worker'da hemen devam eder
+            await asyncio.to_thread(self._release, job_id)
+            raise
+
+    def _claim_job(self) -> Optional[int]:
+        """
+        Bekleyen veya kirası dolmuş işi kirala (senkron, thread pool'da çağrılmalı)
+        """
+        db = SessionLocal()
+        try:
+            now = datetime.utcnow()
+            job = db.query(WebhookReplayJob).filter(
+                WebhookReplayJob.status.in_([WebhookReplayStatus.PENDING, WebhookReplayStatus.RUNNING]),
+                or_(
+                    WebhookReplayJob.locked_until.is_(None),
+                    WebhookReplayJob.locked_until < now
+                )
+            ).order_by(
+                WebhookReplayJob.id
+            ).limit(1).with_for_update(skip_locked=True).first()
+
+            if job is None:
+                db.rollback()
+                return None
+
+            job.status = WebhookReplayStatus.RUNNING
+            job.started_at = job.started_at or now
+            job.locked_until = now + timedelta(seconds=settings.WEBHOOK_LEASE_SECONDS)
+            db.commit()
+            return job.id
+
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def _process_page(self, job_id: int) -> Optional[Tuple[int, int]]:
+        """
+        Sıradaki ödeme sayfasını outbox'a yeniden al ve imleci ilerlet
+
+        Returns:
+            (işlenen ödeme sayısı, rate_per_second); iş bittiyse veya iptal
+            edildiyse None
+        """
+        db = SessionLocal()
+        try:
+            now = datetime.utcnow()
+            job = db.query(WebhookReplayJob).filter(
+                WebhookReplayJob.id == job_id
+            ).with_for_update().first()
+
+            if job is None or job.status != WebhookReplayStatus.RUNNING:
+                db.rollback()
+                logger.info(f"Webhook replay işi durduruldu: {job_id}")
+                return None
+
+            payments = replay_candidates(
+                db, job.merchant_id, job.confirmed_from, job.confirmed_to
+            ).filter(
+                PaymentRequest.id > job.last_payment_id
+            ).order_by(
+                PaymentRequest.id
+            ).limit(min(settings.WEBHOOK_REPLAY_PAGE_SIZE, job.rate_per_second)).all()
+
+            if not payments:
+                job.status = WebhookReplayStatus.COMPLETED
+                job.finished_at = now
+                job.locked_until = None
+                db.commit()
+                logger.info(f"Webhook replay işi tamamlandı: {job_id} ({job.requeued} ödeme kuyruğa alındı)")
+                return None
+
+            requeued, skipped = self._requeue_payments(db, payments, now)
+
+            job.processed += len(payments)
+            job.requeued += requeued
+            job.skipped += skipped
+            job.last_payment_id = payments[-1].id
+            job.locked_until = now + timedelta(seconds=settings.WEBHOOK_LEASE_SECONDS)
+            db.commit()
+
+            return len(payments), job.rate_per_second
+
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    @staticmethod
+    def _requeue_payments(db: Session, payments: list, now: datetime) -> Tuple[int, int]:
+        """
+        Ödemelerin outbox kayıtlarını hemen gönderilecek şekilde sıfırla,
+        kaydı olmayanlar için yeni kayıt ekle
+
+        Returns:
+            (kuyruğa alınan, atlanan) ödeme sayıları
+        """
+        payment_ids = [payment.id for payment in payments]
+        outbox_status: Dict[int, WebhookDeliveryStatus] = dict(
+            db.query(WebhookOutbox.payment_request_id, WebhookOutbox.status).filter(
+                WebhookOutbox.payment_request_id.in_(payment_ids),
+                WebhookOutbox.event == PAYMENT_CONFIRMED_EVENT
+            ).all()
+        )
+
+        # Gönderimi sürmekte olan kayıtlara dokunulmaz
+        skipped = sum(1 for status in outbox_status.values() if status == WebhookDeliveryStatus.DELIVERING)
+        requeued = db.execute(
+            update(WebhookOutbox)
+            .where(
+                WebhookOutbox.payment_request_id.in_(payment_ids),
+                WebhookOutbox.event == PAYMENT_CONFIRMED_EVENT,
+                WebhookOutbox.status != WebhookDeliveryStatus.DELIVERING
+            )
+            .values(
+                status=WebhookDeliveryStatus.PENDING,
+                attempts=0,
+                next_attempt_at=now,
+                locked_until=None
+            )
+            .execution_options(synchronize_session=False)
+        ).rowcount
+
+        # Outbox'tan önce onaylanmış ödemeler için kayıt oluşturulur
+        missing = [payment for payment in payments if payment.id not in outbox_status]
+        if missing:
+            transactions: Dict[int, Transaction] = {}
+            for transaction in db.query(Transaction).filter(
+                Transaction.payment_request_id.in_([payment.id for payment in missing]),
+                Transaction.status == TransactionStatus.CONFIRMED
+            ).order_by(Transaction.id):
+                transactions.setdefault(transaction.payment_request_id, transaction)
+
+            for payment in missing:
+                transaction = transactions.get(payment.id)
+                if transaction is not None and webhook_service.enqueue_payment_confirmation(db, payment, transaction):
+                    requeued += 1
+                else:
+                    skipped += 1
+
+        return requeued, skipped
+
+    def _release(self, job_id: int):
+        """
+        İşin kirasını bırak (imleç korunur)
+        """
+        db = SessionLocal()
+        try:
+            db.execute(
+                update(WebhookReplayJob)
+                .where(
+                    WebhookReplayJob.id == job_id,
+                    WebhookReplayJob.status == WebhookReplayStatus.RUNNING
+                )
+                .values(locked_until=None)
+                .execution_options(synchronize_session=False)
+            )
+            db.commit()
+        except Exception as e:
+            logger.error(f"Webhook replay kirası bırakılamadı {job_id}: {e}")
+            db.rollback()
+        finally:
+            db.close()
+
+# Singleton instance
+webhook_replay_runner = WebhookReplayRunner()
@@ -0,0 +1,244 @@
+import asyncio
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+import logging
+from sqlalchemy import Boolean, DateTime, Integer, Text, bindparam, cast, column, func, insert, update, values
+
+from app.core.config import settings
+from app.db.database import SessionLocal
+from app.db.models import PaymentRequest, WebhookOutbox, WebhookDeliveryStatus, WebhookDeliveryLog
+from app.services.webhook import DeliveryResult
+from app.services.webhook_transport import retry_delay
+
+logger = logging.getLogger(__name__)
+
+class _PendingResult:
+    __slots__ = ("outbox_id", "payment_id", "attempt", "result", "finished_at")
+
+    def __init__(self, outbox_id: int, payment_id: int, attempt: int, result: DeliveryResult):
+        self.outbox_id = outbox_id
+        self.payment_id = payment_id
+        self.attempt = attempt
+        self.result = result
+        self.finished_at = datetime.utcnow()
+
+class WebhookStatusWriter:
+    """
+    Webhook gönderim sonuçlarını toplu yazan arka plan görevi
+
+    Delivery görevleri sonucu bellekteki tampona ekler ve beklemeden devam
+    eder. Tampon her WEBHOOK_STATUS_FLUSH_MS'de bir (veya
+    WEBHOOK_STATUS_BATCH_SIZE'a ulaşınca) thread pool'da tek transaction ile
+    yazılır: outbox durumları tek bir UPDATE ... FROM (VALUES ...), ödeme
+    sayaçları tek bir UPDATE, deneme logları tek bir çok satırlı INSERT.
+
+    Yazılamayan sonuçların outbox kayıtları DELIVERING'de kalır ve kira
+    süresi dolunca tekrar gönderilir (en az bir kez teslim).
+    """
+
+    def __init__(self):
+        self._buffer: List[_PendingResult] = []
+        self._flush_requested: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        self._flush_requested = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """
+        Arka plan görevini durdur ve tampondaki sonuçları yaz
+        """
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    def submit(self, deliveries: List[Tuple[int, int, int]], result: DeliveryResult):
+        """
+        Gönderim sonucunu tampona ekle (bloklamaz)
+
+        Args:
+            deliveries: (outbox_id, payment_id, deneme sayısı) listesi; toplu
+                        gönderimde aynı isteğin tüm kayıtları aynı sonucu alır
+        """
+        for outbox_id, payment_id, attempt in deliveries:
+            self._buffer.append(_PendingResult(outbox_id, payment_id, attempt, result))
+
+        if len(self._buffer) >= settings.WEBHOOK_STATUS_BATCH_SIZE and self._flush_requested is not None:
+            self._flush_requested.set()
+
+    async def _run(self):
+        interval = settings.WEBHOOK_STATUS_FLUSH_MS / 1000
+        while True:
+            try:
+                await asyncio.wait_for(self._flush_requested.wait(), interval)
+            except asyncio.TimeoutError:
+                pass
+            self._flush_requested.clear()
+            await self.flush()
+
+    async def flush(self):
+        if not self._buffer:
+            return
+
+        pending, self._buffer = self._buffer, []
+        try:
+            await asyncio.to_thread(self._write, pending)
+        except Exception as e:
+            logger.error(f"Webhook durumları yazılamadı ({len(pending)} sonuç): {e}")
+
+    def _write(self, pending: List[_PendingResult]):
+        """
+        Tampondaki sonuçları tek transaction'da yaz (senkron, thread pool'da çalışır)
+        """
+        outbox_rows = []
+        payment_rows: Dict[int, Dict] = {}
+        log_rows = []
+
+        for item in pending:
+            result = item.result
+            row = {
+                "id": item.outbox_id,
+                "status": None,
+                "attempts": item.attempt,
+                "next_attempt_at": None,
+                "delivered_at": None,
+                "last_error": result.error
+            }
+            if result.success:
+                row["status"] = WebhookDeliveryStatus.DELIVERED
+                row["delivered_at"] = item.finished_at
+            elif item.attempt >= settings.WEBHOOK_MAX_ATTEMPTS:
+                row["status"] = WebhookDeliveryStatus.FAILED
+                logger.error(f"Webhook tüm denemeler başarısız: outbox {item.outbox_id}")
+            else:
+                row["status"] = WebhookDeliveryStatus.PENDING
+                row["next_attempt_at"] = item.finished_at + timedelta(seconds=retry_delay(item.attempt))
+            outbox_rows.append(row)
+
+            payment = payment_rows.setdefault(item.payment_id, {"id": item.payment_id, "sent": False, "attempts": 0})
+            payment["sent"] = result.success
+            payment["attempts"] += 1
+
+            log_rows.append({
+                "outbox_id": item.outbox_id,
+                "payment_request_id": item.payment_id,
+                "attempt": item.attempt,
+                "success": result.success,
+                "status_code": result.status_code,
+                "latency_ms": result.latency_ms,
+                "error": result.error,
+                "response_snippet": result.response_snippet
+            })
+
+        db = SessionLocal()
+        try:
+            if db.get_bind().dialect.name == "postgresql":
+                self._update_outbox_from_values(db, outbox_rows)
+                self._update_payments_from_values(db, list(payment_rows.values()))
+            else:
+                # UPDATE ... FROM (VALUES) desteklenmeyen veritabanları için executemany
+                self._update_outbox_executemany(db, outbox_rows)
+                self._update_payments_executemany(db, list(payment_rows.values()))
+
+            db.execute(insert(WebhookDeliveryLog), log_rows)
+            db.commit()
+
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    @staticmethod
+    def _update_outbox_from_values(db, rows: List[Dict]):
+        v = values(
+            column("id", Integer),
+            column("status", Text),
+            column("attempts", Integer),
+            column("next_attempt_at", DateTime),
+            column("delivered_at", DateTime),
+            column("last_error", Text),
+            name="v"
+        ).data([
+            (row["id"], row["status"].name, row["attempts"], row["next_attempt_at"], row["delivered_at"], row["last_error"])
+            for row in rows
+        ])
+
+        # Sadece hâlâ bu worker'ın kirasında olan kayıtlar güncellenir
+        db.execute(
+            update(WebhookOutbox)
+            .where(
+                WebhookOutbox.id == v.c.id,
+                WebhookOutbox.status == WebhookDeliveryStatus.DELIVERING
+            )
+            .values(
+                status=cast(v.c.status, WebhookOutbox.status.type),
+                attempts=v.c.attempts,
+                next_attempt_at=func.coalesce(
+                    cast(v.c.next_attempt_at, WebhookOutbox.next_attempt_at.type),
+                    WebhookOutbox.next_attempt_at
+                ),
+                delivered_at=cast(v.c.delivered_at, WebhookOutbox.delivered_at.type),
+                last_error=v.c.last_error,
+                locked_until=None
+            )
+            .execution_options(synchronize_session=False)
+        )
+
+    @staticmethod
+    def _update_payments_from_values(db, rows: List[Dict]):
+        v = values(
+            column("id", Integer),
+            column("sent", Boolean),
+            column("attempts", Integer),
+            name="v"
+        ).data([(row["id"], row["sent"], row["attempts"]) for row in rows])
+
+        db.execute(
+            update(PaymentRequest)
+            .where(PaymentRequest.id == v.c.id)
+            .values(
+                webhook_sent=v.c.sent,
+                webhook_attempts=PaymentRequest.webhook_attempts + v.c.attempts
+            )
+            .execution_options(synchronize_session=False)
+        )
+
+    @staticmethod
+    def _update_outbox_executemany(db, rows: List[Dict]):
+        table = WebhookOutbox.__table__
+        db.execute(
+            table.update()
+            .where(
+                table.c.id == bindparam("b_id"),
+                table.c.status == WebhookDeliveryStatus.DELIVERING
+            )
+            .values(
+                status=bindparam("b_status"),
+                attempts=bindparam("b_attempts"),
+                next_attempt_at=func.coalesce(bindparam("b_next_attempt_at", type_=DateTime), table.c.next_attempt_at),
+                delivered_at=bindparam("b_delivered_at"),
+                last_error=bindparam("b_last_error"),
+                locked_until=None
+            ),
+            [{f"b_{key}": value for key, value in row.items()} for row in rows]
+        )
+
+    @staticmethod
+    def _update_payments_executemany(db, rows: List[Dict]):
+        table = PaymentRequest.__table__
+        db.execute(
+            table.update()
+            .where(table.c.id == bindparam("b_id"))
+            .values(
+                webhook_sent=bindparam("b_sent"),
+                webhook_attempts=table.c.webhook_attempts + bindparam("b_attempts", type_=Integer)
+            ),
+            [{f"b_{key}": value for key, value in row.items()} for row in rows]
+        )
\ No newline at end of file
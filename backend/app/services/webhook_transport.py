@@ -0,0 +1,281 @@
+import httpx
+import asyncio
+import random
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+from urllib.parse import urlsplit
+import logging
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+def webhook_host(url: str) -> str:
+    """
+    Webhook URL'inin host kısmı (havuz, circuit breaker ve istatistik anahtarı)
+    """
+    return urlsplit(url).netloc.lower()
+
+def retry_delay(attempts: int) -> float:
+    """
+    attempts kez başarısız olmuş gönderimin bir sonraki denemesine kadar beklenecek süre
+
+    Üstel artış (WEBHOOK_RETRY_BASE_SECONDS * 2^(n-1), en fazla WEBHOOK_RETRY_MAX_SECONDS)
+    ve jitter: aynı anda düşen merchant'ın kuyruğu aynı saniyede tekrar denenmez.
+    """
+    delay = min(
+        settings.WEBHOOK_RETRY_BASE_SECONDS * (2 ** max(attempts - 1, 0)),
+        settings.WEBHOOK_RETRY_MAX_SECONDS
+    )
+    return delay / 2 + random.uniform(0, delay / 2)
+
+class HostCircuitBreaker:
+    """
+    Merchant host'u başına circuit breaker
+
+    closed: istekler serbest. Art arda WEBHOOK_BREAKER_FAILURE_THRESHOLD hata
+    olursa open: bekleme süresi boyunca istek gönderilmez, teslimatlar ertelenir.
+    Süre dolunca half_open: tek bir deneme isteğine izin verilir; başarılıysa
+    closed, başarısızsa bekleme süresi ikiye katlanarak tekrar open.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self):
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.cooldown = settings.WEBHOOK_BREAKER_COOLDOWN_SECONDS
+        self.open_until = 0.0
+        self._probe_in_flight = False
+
+    def allow(self) -> Optional[float]:
+        """
+        İstek gönderilebilirse None, gönderilemezse beklenecek süre (saniye)
+        """
+        if self.state == self.CLOSED:
+            return None
+
+        now = time.monotonic()
+        if self.state == self.OPEN and now >= self.open_until:
+            self.state = self.HALF_OPEN
+
+        if self.state == self.HALF_OPEN and not self._probe_in_flight:
+            self._probe_in_flight = True
+            return None
+
+        # Açık devre veya deneme isteği sürüyor
+        return max(self.open_until - now, settings.WEBHOOK_BREAKER_PROBE_WAIT_SECONDS)
+
+    def record_success(self):
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.cooldown = settings.WEBHOOK_BREAKER_COOLDOWN_SECONDS
+        self._probe_in_flight = False
+
+    def record_failure(self):
+        self.consecutive_failures += 1
+
+        if self.state == self.HALF_OPEN:
+            self.cooldown = min(self.cooldown * 2, settings.WEBHOOK_BREAKER_MAX_COOLDOWN_SECONDS)
+            self._open()
+        elif self.consecutive_failures >= settings.WEBHOOK_BREAKER_FAILURE_THRESHOLD:
+            self._open()
+
+    def release_probe(self):
+        """
+        Sonuçlanmadan iptal edilen deneme isteğinin hakkını bırak
+        """
+        self._probe_in_flight = False
+
+    def _open(self):
+        self.state = self.OPEN
+        self.open_until = time.monotonic() + self.cooldown
+        self._probe_in_flight = False
+
+class HostStats:
+    """
+    Merchant host'u başına gönderim istatistikleri
+    """
+
+    def __init__(self):
+        self.requests = 0
+        self.failures = 0
+        self.deferred = 0
+        self.total_latency = 0.0
+        self.ewma_latency: Optional[float] = None
+        self.last_status_code: Optional[int] = None
+        self.last_error: Optional[str] = None
+
+    def record(self, latency: float, success: bool, status_code: Optional[int], error: Optional[str]):
+        self.requests += 1
+        self.total_latency += latency
+        # Son isteklerin ağırlıklı ortalaması (yavaşlayan merchant hızlı görünür)
+        self.ewma_latency = latency if self.ewma_latency is None else 0.8 * self.ewma_latency + 0.2 * latency
+        self.last_status_code = status_code
+        if not success:
+            self.failures += 1
+            self.last_error = error
+
+class WebhookTransport:
+    """
+    Merchant host'u başına keep-alive HTTP client havuzu
+
+    Her host için tek bir uzun ömürlü httpx.AsyncClient tutulur (bağlantılar
+    yeniden kullanılır); havuz sınırı aşıldığında isteği sürmeyen en az
+    kullanılan host'un client'ı kapatılır. Circuit breaker ve istatistikler de
+    host bazındadır.
+    Client'lar delivery worker'ın event loop'una bağlıdır.
+    """
+
+    def __init__(self):
+        self._clients: "OrderedDict[str, httpx.AsyncClient]" = OrderedDict()
+        # Host -> süren istek sayısı (bu host'ların client'ı havuzdan çıkarılmaz)
+        self._in_flight: Dict[str, int] = {}
+        self.breakers: Dict[str, HostCircuitBreaker] = {}
+        self.stats: Dict[str, HostStats] = {}
+
+    def _get_client(self, host: str) -> httpx.AsyncClient:
+        client = self._clients.get(host)
+        if client is None or client.is_closed:
+            client = httpx.AsyncClient(
+                timeout=settings.WEBHOOK_TIMEOUT_SECONDS,
+                limits=httpx.Limits(
+                    max_connections=settings.WEBHOOK_MAX_CONCURRENCY_PER_HOST,
+                    max_keepalive_connections=settings.WEBHOOK_MAX_CONCURRENCY_PER_HOST,
+                    keepalive_expiry=settings.WEBHOOK_KEEPALIVE_EXPIRY_SECONDS
+                )
+            )
+            self._clients[host] = client
+
+        self._clients.move_to_end(host)
+        self._trim_pool()
+        return client
+
+    def _trim_pool(self):
+        """
+        Havuz sınırını aşan, isteği sürmeyen en az kullanılan client'ları kapat
+        Tüm host'larda istek sürüyorsa havuz geçici olarak sınırı aşar ve
+        sonraki çağrılarda küçültülür.
+        """
+        excess = len(self._clients) - settings.WEBHOOK_MAX_POOLED_HOSTS
+        if excess <= 0:
+            return
+
+        idle = [host for host in self._clients if not self._in_flight.get(host)]
+        for host in idle[:excess]:
+            evicted = self._clients.pop(host)
+            asyncio.get_running_loop().create_task(evicted.aclose())
+
+    def _get_breaker(self, host: str) -> HostCircuitBreaker:
+        breaker = self.breakers.get(host)
+        if breaker is None:
+            breaker = HostCircuitBreaker()
+            self.breakers[host] = breaker
+        return breaker
+
+    def _get_stats(self, host: str) -> HostStats:
+        stats = self.stats.get(host)
+        if stats is None:
+            stats = HostStats()
+            self.stats[host] = stats
+        return stats
+
+    def check_circuit(self, url: str) -> Optional[float]:
+        """
+        Host'a istek gönderilebilirse None, devre açıksa ertelenecek süre (saniye)
+        """
+        host = webhook_host(url)
+        wait = self._get_breaker(host).allow()
+        if wait is not None:
+            self._get_stats(host).deferred += 1
+        return wait
+
+    def release_probe(self, url: str):
+        """
+        İstek gönderilmeden iptal edilen teslimatın deneme hakkını bırak
+        """
+        self._get_breaker(webhook_host(url)).release_probe()
+
+    def record_failure(self, url: str):
+        """
+        check_circuit'ten sonra, istek gönderilmeden hatayla sonlanan teslimatı
+        hata olarak işle (yarı açık devrenin deneme hakkı böylece serbest kalır)
+        """
+        self._get_breaker(webhook_host(url)).record_failure()
+
+    async def post(self, url: str, content: bytes, headers: Dict[str, str]) -> httpx.Response:
+        """
+        Havuzdaki client ile POST gönder, süre ve sonucu host istatistiklerine yaz
+        2xx dışı yanıt ve ağ hataları circuit breaker'a hata olarak işlenir.
+        """
+        host = webhook_host(url)
+        breaker = self._get_breaker(host)
+        stats = self._get_stats(host)
+
+        started = time.monotonic()
+        # Client'ı alınmadan önce sayılır; istek sürerken havuzdan çıkarılıp kapatılmaz
+        self._in_flight[host] = self._in_flight.get(host, 0) + 1
+        try:
+            response = await self._get_client(host).post(url, content=content, headers=headers)
+        except asyncio.CancelledError:
+            breaker.release_probe()
+            raise
+        except Exception as e:
+            stats.record(time.monotonic() - started, False, None, str(e))
+            breaker.record_failure()
+            raise
+        finally:
+            remaining = self._in_flight[host] - 1
+            if remaining:
+                self._in_flight[host] = remaining
+            else:
+                del self._in_flight[host]
+
+        success = 200 <= response.status_code < 300
+        stats.record(
+            time.monotonic() - started,
+            success,
+            response.status_code,
+            None if success else f"HTTP {response.status_code}"
+        )
+        if success:
+            breaker.record_success()
+        else:
+            breaker.record_failure()
+        return response
+
+    def snapshot(self) -> list:
+        """
+        Host bazında gecikme, hata oranı ve devre durumu (en yavaş host önce)
+        """
+        hosts = []
+        for host, stats in self.stats.items():
+            breaker = self._get_breaker(host)
+            hosts.append({
+                "host": host,
+                "requests": stats.requests,
+                "failures": stats.failures,
+                "failure_rate": round(stats.failures / stats.requests, 4) if stats.requests else 0.0,
+                "deferred": stats.deferred,
+                "avg_latency_ms": round(stats.total_latency / stats.requests * 1000, 1) if stats.requests else None,
+                "ewma_latency_ms": round(stats.ewma_latency * 1000, 1) if stats.ewma_latency is not None else None,
+                "last_status_code": stats.last_status_code,
+                "last_error": stats.last_error,
+                "circuit_state": breaker.state,
+                "consecutive_failures": breaker.consecutive_failures,
+                "pooled": host in self._clients
+            })
+        hosts.sort(key=lambda item: item["ewma_latency_ms"] or 0, reverse=True)
+        return hosts
+
+    async def close(self):
+        """
+        Havuzdaki tüm client'ları kapat
+        """
+        clients = list(self._clients.values())
+        self._clients.clear()
+        for client in clients:
+            await client.aclose()
\ No newline at end of file
@@ -0,0 +1,125 @@
+import bisect
+import hashlib
+import os
+import socket
+import threading
+import uuid
+from datetime import datetime, timedelta
+from typing import List, Tuple
+import logging
+
+from app.core.config import settings
+from app.db.database import SessionLocal
+from app.db.models import MonitorWorker
+
+logger = logging.getLogger(__name__)
+
+def _ring_hash(value: str) -> int:
+    return int.from_bytes(hashlib.sha1(value.encode('utf-8')).digest()[:8], 'big')
+
+class WorkerCoordinator:
+    """
+    Monitor worker koordinasyonu
+
+    Her worker monitor_workers tablosuna periyodik heartbeat yazar. Heartbeat'i
+    güncel olan worker'lar üzerinde consistent hashing halkası kurulur ve her
+    ödeme adresi halkada tek bir worker'a düşer. Heartbeat'i kesilen worker'ın
+    adresleri TTL dolunca otomatik olarak diğer worker'lara geçer.
+    En küçük worker_id'ye sahip canlı worker lider olur (süre dolumu, blok tarama
+    gibi tek bir süreçte çalışması gereken işler lider tarafından yapılır).
+    """
+
+    def __init__(self):
+        self.hostname = socket.gethostname()
+        self.worker_id = f"{self.hostname}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.live_workers: List[str] = [self.worker_id]
+        self._ring: List[Tuple[int, str]] = []
+        self._ring_keys: List[int] = []
+        self._lock = threading.Lock()
+        self._build_ring(self.live_workers)
+
+    @property
+    def is_leader(self) -> bool:
+        return bool(self.live_workers) and self.live_workers[0] == self.worker_id
+
+    def heartbeat(self):
+        """
+        Heartbeat yaz ve canlı worker listesini yenile (senkron, thread pool'da çağrılmalı)
+        """
+        now = datetime.utcnow()
+        db = SessionLocal()
+        try:
+            worker = db.query(MonitorWorker).filter(
+                MonitorWorker.worker_id == self.worker_id
+            ).first()
+            if not worker:
+                worker = MonitorWorker(worker_id=self.worker_id, hostname=self.hostname)
+                db.add(worker)
+                logger.info(f"Monitor worker kaydedildi: {self.worker_id}")
+            worker.last_heartbeat_at = now
+
+            # Uzun süredir heartbeat göndermeyen kayıtları temizle
+            db.query(MonitorWorker).filter(
+                MonitorWorker.last_heartbeat_at < now - timedelta(seconds=settings.MONITOR_WORKER_TTL_SECONDS * 10)
+            ).delete(synchronize_session=False)
+
+            db.commit()
+
+            rows = db.query(MonitorWorker.worker_id).filter(
+                MonitorWorker.last_heartbeat_at > now - timedelta(seconds=settings.MONITOR_WORKER_TTL_SECONDS)
+            ).order_by(MonitorWorker.worker_id.asc()).all()
+            live_workers = [row.worker_id for row in rows]
+
+        except Exception as e:
+            # Veritabanına ulaşılamazsa son bilinen halka ile devam et
+            logger.error(f"Worker heartbeat hatası: {e}")
+            db.rollback()
+            return
+        finally:
+            db.close()
+
+        if self.worker_id not in live_workers:
+            live_workers = sorted(live_workers + [self.worker_id])
+
+        if live_workers != self.live_workers:
+            logger.info(f"Monitor worker'ları güncellendi: {len(live_workers)} canlı worker, lider={live_workers[0]}")
+            self._build_ring(live_workers)
+
+    def _build_ring(self, live_workers: List[str]):
+        ring = sorted(
+            (_ring_hash(f"{worker_id}#{replica}"), worker_id)
+            for worker_id in live_workers
+            for replica in range(settings.MONITOR_RING_REPLICAS)
+        )
+        with self._lock:
+            self.live_workers = live_workers
+            self._ring = ring
+            self._ring_keys = [key for key, _ in ring]
+
+    def owner_of(self, payment_address: str) -> str:
+        """
+        Adresin halkadaki sahibi olan worker_id
+        """
+        with self._lock:
+            position = bisect.bisect(self._ring_keys, _ring_hash(payment_address)) % len(self._ring)
+            return self._ring[position][1]
+
+    def owns(self, payment_address: str) -> bool:
+        return self.owner_of(payment_address) == self.worker_id
+
+    def shutdown(self):
+        """
+        Worker kaydını sil, adresler TTL beklenmeden diğer worker'lara geçsin
+        """
+        db = SessionLocal()
+        try:
+            db.query(MonitorWorker).filter(
+                MonitorWorker.worker_id == self.worker_id
+            ).delete(synchronize_session=False)
+            db.commit()
+            logger.info(f"Monitor worker kaydı silindi: {self.worker_id}")
+        except Exception as e:
+            logger.error(f"Worker kaydı silinemedi: {e}")
+            db.rollback()
+        finally:
+            db.close()
@@ -0,0 +1,85 @@
+import asyncio
+import json
+from datetime import datetime, timedelta
+from typing import Callable, List
+import logging
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.database import SessionLocal
+from app.db.models import WorkerMetrics
+
+logger = logging.getLogger(__name__)
+
+# worker_metrics tablosundaki rol adları
+MONITOR_METRICS_ROLE = "monitor"
+WEBHOOK_METRICS_ROLE = "webhooks"
+
+class WorkerMetricsStore:
+    """
+    Worker metriklerinin worker_metrics tablosu üzerinden paylaşımı
+
+    Monitor ve webhook worker'ları API'den ayrı süreçlerde (worker.py)
+    çalışabildiğinden metrik endpoint'leri süreç içi sayaçları değil bu
+    tabloyu okur. Her worker kendi anlık görüntüsünü
+    WORKER_METRICS_PUBLISH_SECONDS'de bir yazar; WORKER_METRICS_TTL_SECONDS
+    içinde güncellenmeyen (durmuş) worker'lar raporlanmaz.
+    """
+
+    async def run_publisher(self, worker_id: str, role: str, snapshot: Callable[[], dict]):
+        """
+        Anlık görüntüyü periyodik olarak yaz (worker'ın event loop'unda çalışır)
+        """
+        while True:
+            try:
+                # Sayaçlar event loop'ta okunur, yazma thread pool'da yapılır
+                metrics = snapshot()
+                await asyncio.to_thread(self.publish, worker_id, role, metrics)
+            except Exception as e:
+                logger.error(f"Worker metrikleri yazılamadı ({role}): {e}")
+            await asyncio.sleep(settings.WORKER_METRICS_PUBLISH_SECONDS)
+
+    def publish(self, worker_id: str, role: str, metrics: dict):
+        """
+        Worker'ın anlık görüntüsünü kaydet (senkron, thread pool'da çağrılmalı)
+        """
+        now = datetime.utcnow()
+        db = SessionLocal()
+        try:
+            row = db.query(WorkerMetrics).filter(
+                WorkerMetrics.worker_id == worker_id,
+                WorkerMetrics.role == role
+            ).first()
+            if not row:
+                row = WorkerMetrics(worker_id=worker_id, role=role)
+                db.add(row)
+            row.metrics = json.dumps(metrics, default=str)
+            row.updated_at = now
+
+            # Uzun süredir güncellenmeyen worker kayıtlarını temizle
+            db.query(WorkerMetrics).filter(
+                WorkerMetrics.updated_at < now - timedelta(seconds=settings.WORKER_METRICS_TTL_SECONDS * 10)
+            ).delete(synchronize_session=False)
+
+            db.commit()
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    def load(self, db: Session, role: str) -> List[dict]:
+        """
+        Canlı worker'ların son anlık görüntüleri
+        """
+        rows = db.query(WorkerMetrics).filter(
+            WorkerMetrics.role == role,
+            WorkerMetrics.updated_at > datetime.utcnow() - timedelta(seconds=settings.WORKER_METRICS_TTL_SECONDS)
+        ).order_by(WorkerMetrics.worker_id.asc()).all()
+        return [
+            {"worker_id": row.worker_id, "updated_at": row.updated_at, "metrics": json.loads(row.metrics)}
+            for row in rows
+        ]
+
+# Singleton instance
+worker_metrics_store = WorkerMetricsStore()
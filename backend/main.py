@@ -4,6 +4,9 @@ from fastapi.middleware.trustedhost import TrustedHostMiddleware
 import uvicorn
 
 from app.core.config import settings
+from app.core.executors import shutdown_executors
+from app.services.api_key_usage import api_key_usage_recorder
+from app.services.payment_events import payment_status_hub
 from app.api.api_v1.api import api_router
 from app.db.database import engine
 from app.db import models
@@ -36,6 +39,21 @@ app.add_middleware(TrustedHostMiddleware, allowed_hosts=["*"])
 # API Router'ları ekle
 app.include_router(api_router, prefix=settings.API_V1_STR)
 
+@app.on_event("startup")
+async def startup_event():
+    # API anahtarı kullanımları bellekte biriktirilip periyodik olarak yazılır
+    api_key_usage_recorder.start()
+    # Ödeme durum bildirimlerini dinle (SSE / long-poll aboneleri için)
+    payment_status_hub.start()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await api_key_usage_recorder.stop()
+    await payment_status_hub.stop()
+    
+    # CPU havuzlarını (süreç havuzu dahil) kapat
+    shutdown_executors()
+
 @app.get("/")
 async def root():
     return {
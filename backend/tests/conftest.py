@@ -0,0 +1,34 @@
+import os
+import tempfile
+from pathlib import Path
+
+import pytest
+
+# Engine app import edilirken oluşturulur; ortam değişkenleri ondan önce ayarlanmalı.
+# Varsayılan geçici SQLite dosyasıdır, PostgreSQL'e karşı çalıştırmak için TEST_DATABASE_URL verin.
+os.environ["DATABASE_URL"] = os.getenv(
+    "TEST_DATABASE_URL",
+    f"sqlite:///{Path(tempfile.mkdtemp()) / 'paykript_test.db'}"
+)
+os.environ["ENVIRONMENT"] = "test"
+
+@pytest.fixture
+def db_tables():
+    """
+    Her test için tabloları sıfırdan oluştur
+    """
+    from app.db import models
+    from app.db.database import engine
+
+    models.Base.metadata.drop_all(bind=engine)
+    models.Base.metadata.create_all(bind=engine)
+    yield engine
+    models.Base.metadata.drop_all(bind=engine)
+
+def tron_address(number: int) -> str:
+    """
+    Sayıdan türetilen geçerli (checksum'lı) TRON adresi
+    """
+    from app.services.crypto import CryptoService
+
+    return CryptoService.hex_to_tron_address(f"41{number:040x}")
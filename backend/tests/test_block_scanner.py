@@ -0,0 +1,104 @@
+import asyncio
+import json
+from datetime import datetime, timedelta
+from decimal import Decimal
+from pathlib import Path
+
+import pytest
+
+from app.core.config import settings
+from app.services.block_scanner import BlockScanMonitor
+from app.services.payment_index import PendingPayment
+
+from conftest import tron_address
+
+# TronGrid /v1/contracts/{usdt}/events yanıt formatında kaydedilmiş Transfer event sayfası
+EVENTS = json.loads((Path(__file__).parent / "fixtures" / "usdt_transfer_events.json").read_text())["data"]
+
+CURRENT_BLOCK = 56789100
+CURSOR_TS = 1699999990000
+
+class StaticIndex:
+    """
+    match_events'in kullandığı get_by_hex arayüzüne sahip sabit indeks
+    """
+
+    def __init__(self, payments):
+        self._by_hex = {payment.address_hex: payment for payment in payments}
+
+    def get_by_hex(self, address_hex):
+        return self._by_hex.get(address_hex)
+
+@pytest.fixture
+def monitor():
+    return BlockScanMonitor()
+
+@pytest.fixture
+def payments():
+    expires_at = datetime.utcnow() + timedelta(minutes=30)
+    # Fixture'daki alıcı adresler 0x...01 - 0x...04
+    amounts = [Decimal("25"), Decimal("10"), Decimal("10"), Decimal("50")]
+    return [
+        PendingPayment(number, tron_address(number), amount, expires_at)
+        for number, amount in enumerate(amounts, start=1)
+    ]
+
+@pytest.fixture
+def required_confirmations(monkeypatch):
+    monkeypatch.setattr(settings, "REQUIRED_CONFIRMATIONS", 19)
+    return 19
+
+def test_match_events_matches_pending_addresses(monitor, payments, required_confirmations):
+    matches, _ = monitor.match_events(EVENTS, StaticIndex(payments), CURRENT_BLOCK, CURSOR_TS)
+
+    # Bekleyen ödemesi olmayan alıcılara giden event'ler eşleşmez
+    assert set(matches) == {payment.payment_address for payment in payments}
+
+    transfer = matches[payments[0].payment_address][0]
+    assert transfer["transaction_id"] == EVENTS[0]["transaction_id"]
+    assert transfer["to"] == payments[0].payment_address
+    assert transfer["token_info"]["address"] == monitor.usdt_contract
+    assert transfer["value"] == "25000000"
+    assert transfer["confirmations"] == CURRENT_BLOCK - EVENTS[0]["block_number"] + 1
+
+def test_match_events_accepts_hex_and_base58_recipients(monitor, payments):
+    payment = payments[0]
+    event = dict(EVENTS[0])
+
+    for recipient in (f"0x{payment.address_hex[2:]}", payment.address_hex, payment.payment_address):
+        event["result"] = {**EVENTS[0]["result"], "to": recipient, "1": recipient}
+        matches, _ = monitor.match_events([event], StaticIndex(payments), CURRENT_BLOCK, CURSOR_TS)
+        assert list(matches) == [payment.payment_address]
+
+def test_matched_transfers_respect_amount_tolerance(monitor, payments, required_confirmations):
+    matches, _ = monitor.match_events(EVENTS, StaticIndex(payments), CURRENT_BLOCK, CURSOR_TS)
+
+    def is_transfer(payment):
+        transfer = matches[payment.payment_address][0]
+        return asyncio.run(monitor.is_usdt_transfer(transfer, payment.payment_address, payment.amount))
+
+    assert is_transfer(payments[0])
+    # 10.005 USDT, 10 USDT'lik ödeme için 0.01 tolerans içinde
+    assert is_transfer(payments[1])
+    # 9.5 USDT tolerans dışında
+    assert not is_transfer(payments[2])
+
+def test_cursor_held_at_unconfirmed_match(monitor, payments, required_confirmations):
+    matches, next_cursor = monitor.match_events(EVENTS, StaticIndex(payments), CURRENT_BLOCK, CURSOR_TS)
+
+    unconfirmed = matches[payments[3].payment_address][0]
+    assert unconfirmed["confirmations"] < required_confirmations
+    # İmleç son event'e değil, onay bekleyen transferin zamanına ilerler
+    assert next_cursor == unconfirmed["block_timestamp"]
+    assert next_cursor < EVENTS[-1]["block_timestamp"]
+
+def test_cursor_advances_past_confirmed_matches(monitor, payments, required_confirmations):
+    # Onay bekleyen ödeme indekste değilse imleç son event'e ilerler
+    _, next_cursor = monitor.match_events(EVENTS, StaticIndex(payments[:3]), CURRENT_BLOCK, CURSOR_TS)
+
+    assert next_cursor == EVENTS[-1]["block_timestamp"]
+
+def test_cursor_never_moves_backwards(monitor, payments):
+    _, next_cursor = monitor.match_events([], StaticIndex(payments), CURRENT_BLOCK, CURSOR_TS)
+
+    assert next_cursor == CURSOR_TS
@@ -0,0 +1,34 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from bip32 import BIP32
+
+from app.core.config import settings
+from app.services.crypto import CryptoService
+
+# Sabit seed'den türetilen TRON hesap xPub'ı (m/44'/195'/0')
+TEST_XPUB = BIP32.from_seed(bytes(range(32))).get_xpub_from_path("m/44'/195'/0'")
+
+ADDRESS_COUNT = 3000
+
+@pytest.fixture(scope="module")
+def expected_addresses():
+    return [CryptoService.derive_address_from_xpub(TEST_XPUB, index) for index in range(ADDRESS_COUNT)]
+
+def test_derive_addresses_matches_single_derivation(expected_addresses):
+    assert CryptoService.derive_addresses(TEST_XPUB, 0, ADDRESS_COUNT) == expected_addresses
+
+def test_derive_addresses_with_offset(expected_addresses):
+    assert CryptoService.derive_addresses(TEST_XPUB, 1234, 500) == expected_addresses[1234:1734]
+
+def test_derive_addresses_chunked_on_executor(expected_addresses, monkeypatch):
+    # Parça sınırları aralık sonuna denk gelmesin
+    monkeypatch.setattr(settings, "ADDRESS_DERIVE_CHUNK_SIZE", 128)
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        addresses = CryptoService.derive_addresses(TEST_XPUB, 7, ADDRESS_COUNT - 7, executor=executor)
+
+    assert addresses == expected_addresses[7:]
+
+def test_derive_addresses_empty_range():
+    assert CryptoService.derive_addresses(TEST_XPUB, 10, 0) == []
@@ -0,0 +1,112 @@
+import asyncio
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from app.core.config import settings
+from app.db.database import SessionLocal
+from app.db.models import MerchantWallet, PaymentRequest, PaymentStatus, Transaction, TransactionStatus, User
+from app.services.blockchain import BlockchainMonitor
+from app.services.payment_index import PendingPayment
+
+from conftest import tron_address
+
+PAYMENT_COUNT = 200
+
+class FailingWebhookService:
+    """
+    Seçilen ödemeler için outbox yazımında hata veren webhook servisi
+    """
+
+    def __init__(self, failing_ids):
+        self.failing_ids = failing_ids
+        self.enqueued = []
+
+    def enqueue_payment_confirmation(self, db, payment, transaction):
+        if payment.id in self.failing_ids:
+            raise RuntimeError(f"outbox yazılamadı: {payment.id}")
+        self.enqueued.append(payment.id)
+
+def create_payments(count: int):
+    db = SessionLocal()
+    try:
+        user = User(email="merchant@example.com", hashed_password="x")
+        db.add(user)
+        db.flush()
+        wallet = MerchantWallet(user_id=user.id, wallet_name="test", xpub_key="xpub")
+        db.add(wallet)
+        db.flush()
+
+        expires_at = datetime.utcnow() + timedelta(minutes=30)
+        payments = [
+            PaymentRequest(
+                merchant_id=user.id,
+                wallet_id=wallet.id,
+                order_id=f"order-{index}",
+                amount=Decimal("10"),
+                payment_address=tron_address(index + 1),
+                address_index=index,
+                expires_at=expires_at
+            )
+            for index in range(count)
+        ]
+        db.add_all(payments)
+        db.commit()
+        return [PendingPayment(p.id, p.payment_address, p.amount, p.expires_at) for p in payments]
+    finally:
+        db.close()
+
+def confirmed_transfer(monitor: BlockchainMonitor, address: str):
+    return {
+        "transaction_id": f"tx-{address}",
+        "to": address,
+        "from": tron_address(999999),
+        "value": "10000000",
+        "token_info": {"address": monitor.usdt_contract},
+        "block_timestamp": 1700000000000,
+        "confirmations": settings.REQUIRED_CONFIRMATIONS
+    }
+
+def test_failed_payment_does_not_roll_back_concurrent_checks(db_tables):
+    pending = create_payments(PAYMENT_COUNT)
+    failing_ids = {payment.id for payment in pending[::7]}
+
+    monitor = BlockchainMonitor()
+    monitor.webhook_service = FailingWebhookService(failing_ids)
+
+    async def get_address_transactions(address, min_timestamp=None):
+        # Kontroller aynı anda DB'ye yazsın diye araya gir
+        await asyncio.sleep(0)
+        return [confirmed_transfer(monitor, address)]
+
+    monitor.get_address_transactions = get_address_transactions
+
+    async def check_all():
+        return await asyncio.gather(*(monitor.check_payment_address(payment) for payment in pending))
+
+    outcomes = asyncio.run(check_all())
+
+    assert outcomes.count(None) == len(failing_ids)
+    assert monitor.metrics.failed_checks == len(failing_ids)
+    assert sorted(monitor.webhook_service.enqueued) == sorted(
+        payment.id for payment in pending if payment.id not in failing_ids
+    )
+
+    db = SessionLocal()
+    try:
+        statuses = dict(db.query(PaymentRequest.id, PaymentRequest.status).all())
+        recorded = {
+            row.payment_request_id: row.status
+            for row in db.query(Transaction.payment_request_id, Transaction.status)
+        }
+    finally:
+        db.close()
+
+    for payment in pending:
+        if payment.id in failing_ids:
+            # Hata veren ödemenin işlemi ve onayı birlikte geri alınır
+            assert statuses[payment.id] == PaymentStatus.PENDING
+            assert payment.id not in recorded
+        else:
+            # Diğer ödemelerin işlemleri ve onayları commit edilmiş olmalı
+            assert statuses[payment.id] == PaymentStatus.CONFIRMED
+            assert recorded[payment.id] == TransactionStatus.CONFIRMED
@@ -0,0 +1,119 @@
+import asyncio
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+import pytest
+from sqlalchemy import event
+
+from app.core.config import settings
+from app.db import models
+from app.db.database import SessionLocal, engine
+from app.db.models import MerchantWallet, PaymentRequest, PaymentStatus, Transaction, User
+from app.services.blockchain import BlockchainMonitor
+from app.services.payment_index import PendingPayment
+
+from conftest import tron_address
+
+class StatementCounter:
+    """
+    Engine üzerinden çalışan SQL ifadelerini sayar
+    """
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        self.count += 1
+
+@pytest.fixture
+def statements():
+    counter = StatementCounter()
+    event.listen(engine, "before_cursor_execute", counter)
+    yield counter
+    event.remove(engine, "before_cursor_execute", counter)
+
+def create_payment(amount: Decimal) -> PendingPayment:
+    db = SessionLocal()
+    try:
+        user = User(email="merchant@example.com", hashed_password="x")
+        db.add(user)
+        db.flush()
+        wallet = MerchantWallet(user_id=user.id, wallet_name="test", xpub_key="xpub")
+        db.add(wallet)
+        db.flush()
+        payment = PaymentRequest(
+            merchant_id=user.id,
+            wallet_id=wallet.id,
+            order_id="order-1",
+            amount=amount,
+            payment_address=tron_address(1),
+            address_index=0,
+            expires_at=datetime.utcnow() + timedelta(minutes=30)
+        )
+        db.add(payment)
+        db.commit()
+        return PendingPayment(payment.id, payment.payment_address, payment.amount, payment.expires_at)
+    finally:
+        db.close()
+
+def transfers(monitor: BlockchainMonitor, payment: PendingPayment, count: int, confirmations: int):
+    return [
+        {
+            "transaction_id": f"tx-{index}",
+            "to": payment.payment_address,
+            "from_address": tron_address(1000 + index),
+            "value": "10000000",
+            "amount": "10000000",
+            "token_info": {"address": monitor.usdt_contract},
+            "block_number": 1000 + index,
+            "block_timestamp": 1700000000000 + index * 3000,
+            "confirmations": confirmations
+        }
+        for index in range(count)
+    ]
+
+def run_cycle(monitor, payment, batch):
+    return asyncio.run(monitor.process_payment_transfers(payment, batch))
+
+def count_cycle_statements(statements, transfer_count: int):
+    """
+    Aynı ödemeye gelen transfer_count transfer için üç kontrol turunu çalıştır
+
+    Returns:
+        (onay bekleyen tur, değişmeyen transferlerle tur, onaylanma turu) ifade sayıları
+    """
+    models.Base.metadata.drop_all(bind=engine)
+    models.Base.metadata.create_all(bind=engine)
+    payment = create_payment(Decimal("10"))
+    monitor = BlockchainMonitor()
+    counts = []
+
+    for confirmations in (1, 1, settings.REQUIRED_CONFIRMATIONS):
+        statements.count = 0
+        run_cycle(monitor, payment, transfers(monitor, payment, transfer_count, confirmations))
+        counts.append(statements.count)
+
+    assert monitor.metrics.db_writes == 2
+    assert monitor.metrics.known_tx_cache_hits == transfer_count
+
+    db = SessionLocal()
+    try:
+        assert db.get(PaymentRequest, payment.id).status == PaymentStatus.CONFIRMED
+        assert db.query(Transaction).count() == transfer_count
+    finally:
+        db.close()
+
+    return tuple(counts)
+
+def test_statements_per_cycle_do_not_grow_with_transfers(db_tables, statements, monkeypatch):
+    monkeypatch.setattr(settings, "REQUIRED_CONFIRMATIONS", 19)
+
+    pending, cached, confirming = count_cycle_statements(statements, 1)
+
+    # Ödeme getirilir, tüm transferler tek upsert ile yazılır
+    assert pending == 2
+    # Onay sayısı değişmeyen transferler LRU'dan elenir, veritabanına gidilmez
+    assert cached == 0
+
+    for transfer_count in (10, 100):
+        assert count_cycle_statements(statements, transfer_count) == (pending, cached, confirming)
@@ -0,0 +1,169 @@
+import math
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.core.config import settings
+from app.db.models import TransactionStatus
+from app.services import monitor_scheduler
+from app.services.monitor_scheduler import PollSchedule
+from app.services.payment_index import PendingPayment
+
+from conftest import tron_address
+
+# Eski monitor döngüsü tüm ödemeleri 30 saniyede bir kontrol ediyordu
+FIXED_INTERVAL_SECONDS = 30
+
+EPOCH = datetime(2024, 1, 1)
+LIFETIME_SECONDS = settings.PAYMENT_TIMEOUT_MINUTES * 60
+
+class FakeClock:
+    """
+    monitor_scheduler'daki time.monotonic() ve datetime.utcnow() yerine geçen saat
+    """
+
+    def __init__(self):
+        self.now = 0.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+    def utcnow(self) -> datetime:
+        return EPOCH + timedelta(seconds=self.now)
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(monitor_scheduler, "time", clock)
+    monkeypatch.setattr(monitor_scheduler, "datetime", clock)
+    return clock
+
+def make_payment(number: int, created_at: float = 0.0) -> PendingPayment:
+    expires_at = EPOCH + timedelta(seconds=created_at + LIFETIME_SECONDS)
+    return PendingPayment(number, tron_address(number), 10, expires_at)
+
+def simulate(clock, schedule, outcome_for):
+    """
+    Kuyruk boşalana kadar zamanı bir sonraki kontrola ilerlet
+
+    Returns:
+        ödeme id -> kontrol zamanları
+    """
+    checks = {}
+    while True:
+        wait = schedule.seconds_until_next()
+        if wait is None:
+            return checks
+        clock.now += wait
+        for payment in schedule.pop_due():
+            checks.setdefault(payment.id, []).append(clock.now)
+            schedule.reschedule(payment, outcome_for(payment, clock.now))
+
+def fixed_interval_checks(arrival: float = math.inf):
+    """
+    Sabit aralıklı döngünün kontrol zamanları (transfer görülünce durur)
+    """
+    checks = []
+    now = 0.0
+    while now < LIFETIME_SECONDS:
+        checks.append(now)
+        if now >= arrival:
+            break
+        now += FIXED_INTERVAL_SECONDS
+    return checks
+
+def test_idle_payment_backs_off_and_last_check_is_at_expiry(clock):
+    schedule = PollSchedule()
+    schedule.sync([make_payment(1)])
+
+    checks = simulate(clock, schedule, lambda payment, now: None)[1]
+
+    intervals = [later - earlier for earlier, later in zip(checks, checks[1:])]
+    fresh = [interval for start, interval in zip(checks, intervals) if start < settings.MONITOR_FRESH_WINDOW_SECONDS]
+    assert set(fresh) == {settings.MONITOR_FAST_POLL_SECONDS}
+    assert max(intervals) <= settings.MONITOR_MAX_POLL_SECONDS
+    # Taze pencereden sonra aralık azalmaz (son kontrol expires_at'e denk getirilen hariç)
+    backoff = intervals[len(fresh):-1]
+    assert backoff == sorted(backoff)
+
+    assert checks[-1] == pytest.approx(LIFETIME_SECONDS)
+    assert len(schedule) == 0
+
+def test_old_payments_are_checked_less_often_than_fixed_interval(clock):
+    schedule = PollSchedule()
+    schedule.sync([make_payment(1)])
+
+    checks = simulate(clock, schedule, lambda payment, now: None)[1]
+
+    # Aralık üst sınıra ulaştıktan sonra kontrol sayısı sabit aralığın yarısı
+    # (expires_at anındaki son kontrol hariç)
+    saturated_from = next(
+        later for earlier, later in zip(checks, checks[1:])
+        if later - earlier == pytest.approx(settings.MONITOR_MAX_POLL_SECONDS)
+    )
+    scheduled_tail = [now for now in checks[:-1] if now >= saturated_from]
+    fixed_tail = [now for now in fixed_interval_checks() if now >= saturated_from]
+    assert len(scheduled_tail) <= len(fixed_tail) / 2 + 1
+
+@pytest.mark.parametrize("arrival", [7.0, 61.0, 118.0])
+def test_fresh_payment_detected_faster_than_fixed_interval(clock, arrival):
+    schedule = PollSchedule()
+    schedule.sync([make_payment(1)])
+
+    def outcome_for(payment, now):
+        return TransactionStatus.CONFIRMED if now >= arrival else None
+
+    scheduled_detection = simulate(clock, schedule, outcome_for)[1][-1]
+    fixed_detection = fixed_interval_checks(arrival)[-1]
+
+    assert scheduled_detection - arrival < settings.MONITOR_FAST_POLL_SECONDS
+    assert scheduled_detection <= fixed_detection
+
+def test_seen_transfer_is_polled_at_confirming_cadence(clock):
+    schedule = PollSchedule()
+    schedule.sync([make_payment(1)])
+    seen_at = 300.0
+    confirming_checks = []
+
+    # Transfer seen_at'te görülür, beşinci kontrolde yeterli onaya ulaşır
+    def outcome_for(payment, now):
+        if now < seen_at:
+            return None
+        confirming_checks.append(now)
+        if len(confirming_checks) == 5:
+            return TransactionStatus.CONFIRMED
+        return TransactionStatus.PENDING
+
+    checks = simulate(clock, schedule, outcome_for)[1]
+
+    intervals = [later - earlier for earlier, later in zip(confirming_checks, confirming_checks[1:])]
+    assert intervals == [pytest.approx(settings.MONITOR_CONFIRMING_POLL_SECONDS)] * 4
+    assert checks[-1] == confirming_checks[-1]
+    assert len(schedule) == 0
+
+def test_payments_checked_in_due_order(clock):
+    schedule = PollSchedule()
+    # Geç eklenen ödeme daha geç sona erer
+    first, second = make_payment(1), make_payment(2, created_at=40.0)
+    schedule.sync([first])
+    clock.now = 40.0
+    schedule.sync([first, second])
+
+    checks = simulate(clock, schedule, lambda payment, now: None)
+
+    assert checks[1][-1] == pytest.approx(LIFETIME_SECONDS)
+    assert checks[2][-1] == pytest.approx(40.0 + LIFETIME_SECONDS)
+
+def test_removed_payment_is_not_checked_again(clock):
+    schedule = PollSchedule()
+    first, second = make_payment(1), make_payment(2)
+    schedule.sync([first, second])
+    assert {payment.id for payment in schedule.pop_due()} == {1, 2}
+    schedule.reschedule(first, None)
+    schedule.reschedule(second, None)
+
+    # İptal edilen ödeme bir sonraki senkronizasyonda listeden düşer
+    schedule.sync([second])
+    checks = simulate(clock, schedule, lambda payment, now: None)
+
+    assert set(checks) == {2}
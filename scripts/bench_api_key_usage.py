@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+PayKript - API anahtarı kullanım kaydı yazma yükü
+
+APIKeyUsageRecorder'a flush aralığı başına 200, 2.000 ve 8.000 istek
+kaydedilirken veritabanına giden yazma ifadelerinin (UPDATE/INSERT)
+saniyedeki sayısını ölçer ve sonunda api_key_usage sayaçlarının
+kaydedilen istek sayısıyla tam eşleştiğini kontrol eder. Eski davranışta
+her istek bir UPDATE + commit demekti (yazma/sn = istek/sn).
+
+Kullanım: python scripts/bench_api_key_usage.py [--rates 200,2000,8000] [--interval 0.5] [--windows 8] [--keys 20]
+"""
+
+import argparse
+import asyncio
+import time
+
+# Backend path'i ve ortam değişkenleri app import edilmeden önce ayarlanır
+from bench_common import reset_database
+
+from sqlalchemy import event, func
+
+from app.core.config import settings
+from app.db.database import SessionLocal, engine
+from app.db.models import APIKey, APIKeyUsage, User
+from app.services.api_key_usage import APIKeyUsageRecorder
+
+class WriteCounter:
+    """
+    Engine üzerinden çalışan UPDATE/INSERT ifadelerini sayar (executemany tek ifade)
+    """
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith(("UPDATE", "INSERT")):
+            self.count += 1
+
+def create_keys(count: int) -> list:
+    db = SessionLocal()
+    try:
+        user = User(email="merchant@example.com", hashed_password="x")
+        db.add(user)
+        db.flush()
+        keys = [
+            APIKey(user_id=user.id, key_name=f"key-{index}", api_key=f"pk_bench_{index}", secret_key_hash="x")
+            for index in range(count)
+        ]
+        db.add_all(keys)
+        db.commit()
+        return [key.id for key in keys]
+    finally:
+        db.close()
+
+def recorded_total() -> int:
+    db = SessionLocal()
+    try:
+        return db.query(func.coalesce(func.sum(APIKeyUsage.request_count), 0)).scalar()
+    finally:
+        db.close()
+
+async def run_rate(key_ids: list, per_window: int, interval: float, windows: int, writes: WriteCounter) -> tuple:
+    recorder = APIKeyUsageRecorder()
+    before = recorded_total()
+    writes.count = 0
+
+    recorder.start()
+    # İstekler pencere içinde 10 dilime yayılır
+    slices = 10
+    per_slice = per_window // slices
+    started = time.perf_counter()
+    sent = 0
+    for _ in range(windows * slices):
+        for _ in range(per_slice):
+            recorder.record(key_ids[sent % len(key_ids)])
+            sent += 1
+        await asyncio.sleep(interval / slices)
+    duration = time.perf_counter() - started
+    await recorder.stop()
+
+    return sent, writes.count / duration, recorded_total() - before
+
+async def main(rates: list, interval: float, windows: int, keys: int):
+    settings.API_KEY_USAGE_FLUSH_SECONDS = interval
+    reset_database()
+    key_ids = create_keys(keys)
+
+    writes = WriteCounter()
+    event.listen(engine, "before_cursor_execute", writes)
+
+    print(f"{keys} anahtar, flush aralığı {interval} sn, {windows} pencere")
+    print(f"{'istek/pencere':>14} {'istek/sn':>9} {'yazma/sn':>9} {'sayaç':>8} {'eşleşme':>8}")
+    for per_window in rates:
+        sent, write_rate, recorded = await run_rate(key_ids, per_window, interval, windows, writes)
+        print(f"{per_window:>14} {per_window / interval:>9.0f} {write_rate:>9.1f} "
+              f"{recorded:>8} {'evet' if recorded == sent else 'HAYIR':>8}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="API anahtarı kullanım kaydı yazma yükü")
+    parser.add_argument("--rates", default="200,2000,8000", help="Flush aralığı başına istek sayıları")
+    parser.add_argument("--interval", type=float, default=0.5, help="API_KEY_USAGE_FLUSH_SECONDS")
+    parser.add_argument("--windows", type=int, default=8, help="Her hız için ölçülen pencere sayısı")
+    parser.add_argument("--keys", type=int, default=20, help="Kullanılan API anahtarı sayısı")
+    args = parser.parse_args()
+
+    asyncio.run(main(
+        [int(rate) for rate in args.rates.split(",")],
+        args.interval,
+        args.windows,
+        args.keys
+    ))
@@ -0,0 +1,38 @@
+"""
+PayKript - Benchmark scriptleri için ortak kurulum
+
+Backend dizinini Python path'e ekler ve DATABASE_URL verilmemişse geçici bir
+SQLite veritabanı kullanır (PostgreSQL'e karşı ölçmek için DATABASE_URL
+ortam değişkeniyle çalıştırın). Bu modül app import edilmeden önce
+import edilmelidir.
+"""
+
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+# Backend dizinini Python path'e ekle
+backend_path = Path(__file__).resolve().parent.parent / "backend"
+sys.path.insert(0, str(backend_path))
+
+os.environ.setdefault("ENVIRONMENT", "benchmark")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{Path(tempfile.gettempdir()) / 'paykript_bench.db'}")
+
+def reset_database():
+    """
+    Tabloları sıfırdan oluştur
+    """
+    from app.db import models
+    from app.db.database import engine
+
+    models.Base.metadata.drop_all(bind=engine)
+    models.Base.metadata.create_all(bind=engine)
+
+def tron_address(number: int) -> str:
+    """
+    Sayıdan türetilen geçerli (checksum'lı) TRON adresi
+    """
+    from app.services.crypto import CryptoService
+
+    return CryptoService.hex_to_tron_address(f"41{number:040x}")
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+PayKript - CPU executor yük kontrolü
+
+Eşzamanlı QR üretimi ve bcrypt doğrulaması sürerken event loop'un ucuz
+istekleri (ör. /odemeler/durum) ne kadar geciktirdiğini ölçer. Ucuz istek
+5 ms'lik bir sleep döngüsüyle temsil edilir; her turdaki gecikme, beklenen
+uyanma zamanından sapmadır. İşler önce event loop üzerinde (eski davranış),
+sonra cpu_thread_pool / cpu_process_pool üzerinden çalıştırılır.
+
+Kullanım: python scripts/bench_executors.py [--jobs 60] [--tick-ms 5]
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+
+# Backend path'i ve ortam değişkenleri app import edilmeden önce ayarlanır
+from bench_common import tron_address
+
+from app.core.executors import cpu_process_pool, cpu_thread_pool, shutdown_executors
+from app.core.security import get_password_hash, verify_password
+from app.services.crypto import CryptoService
+
+PASSWORD = "benchmark-password"
+
+async def inline_job(index: int, password_hash: str):
+    CryptoService.generate_payment_qr(tron_address(index + 1), 10 + index)
+    verify_password(PASSWORD, password_hash)
+
+async def pooled_job(index: int, password_hash: str):
+    await asyncio.gather(
+        cpu_process_pool.run(CryptoService.generate_payment_qr, tron_address(index + 1), 10 + index),
+        cpu_thread_pool.run(verify_password, PASSWORD, password_hash)
+    )
+
+async def tick_loop(tick: float, done: asyncio.Event, lateness: list):
+    while not done.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(tick)
+        lateness.append(time.perf_counter() - started - tick)
+
+async def run_burst(job, jobs: int, tick: float, password_hash: str):
+    done = asyncio.Event()
+    lateness: list = []
+    ticker = asyncio.create_task(tick_loop(tick, done, lateness))
+    # Ölçüm döngüsü iş başlamadan önce bir kez çalışsın
+    await asyncio.sleep(0)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(job(index, password_hash) for index in range(jobs)))
+    duration = time.perf_counter() - started
+
+    done.set()
+    await ticker
+    return duration, lateness
+
+def describe(name: str, duration: float, lateness: list):
+    if len(lateness) > 1:
+        ordered = sorted(lateness)
+        p50 = statistics.median(ordered) * 1000
+        p99 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))] * 1000
+        latency = f"p50 {p50:.1f} ms, p99 {p99:.1f} ms, en kötü {ordered[-1] * 1000:.0f} ms"
+    else:
+        latency = f"en kötü {max(lateness, default=duration) * 1000:.0f} ms"
+    print(f"{name:<8} süre {duration:6.2f} sn, ucuz istek turu {len(lateness):>6}, {latency}")
+
+async def main(jobs: int, tick_ms: float):
+    tick = tick_ms / 1000
+    password_hash = get_password_hash(PASSWORD)
+
+    # Havuzlar ilk kullanımda oluşur (spawn süreçleri); ısınma ölçüme girmesin
+    await pooled_job(0, password_hash)
+
+    print(f"{jobs} eşzamanlı QR + bcrypt işi, {tick_ms} ms'lik ucuz istek döngüsü")
+    try:
+        describe("inline", *await run_burst(inline_job, jobs, tick, password_hash))
+        describe("havuzlu", *await run_burst(pooled_job, jobs, tick, password_hash))
+    finally:
+        shutdown_executors()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="CPU executor yük kontrolü")
+    parser.add_argument("--jobs", type=int, default=60, help="Eşzamanlı QR + bcrypt işi sayısı")
+    parser.add_argument("--tick-ms", type=float, default=5.0, help="Ucuz istek döngüsünün aralığı")
+    args = parser.parse_args()
+
+    asyncio.run(main(args.jobs, args.tick_ms))
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+PayKript - Monitor kontrol turu benchmark'ı
+
+Yerel bir sahte TronGrid sunucusuna karşı 100, 1.000 ve 10.000 bekleyen
+ödeme için bir kontrol turunun (run_payment_checks) süresini ölçer ve
+paylaşılan, bağlantı havuzlu client ile her istekte yeni client açan eski
+davranışı karşılaştırır. Sahte sunucu her yeni bağlantıda TCP+TLS el
+sıkışmasını taklit eden bir gecikme ekler.
+
+Sahte sunucu HTTP/1.1 konuşur; HTTP/2 kazancını ölçmek için --base-url ile
+TronGrid uyumlu bir HTTP/2 sunucusu verin (TRON_GRID_HTTP2=true).
+
+Her istekte client oluşturmak (SSL context dahil) istek başına onlarca ms
+CPU harcadığından havuzsuz ölçüm varsayılan olarak 1.000 ödemeye kadar
+yapılır (--baseline-max).
+
+Kullanım: python scripts/bench_monitor.py [--sizes 100,1000,10000] [--latency-ms 5] [--handshake-ms 30]
+"""
+
+import argparse
+import asyncio
+import time
+from datetime import datetime, timedelta
+
+# Backend path'i ve ortam değişkenleri app import edilmeden önce ayarlanır
+from bench_common import tron_address
+
+import httpx
+
+from app.core.config import settings
+from app.services.blockchain import BlockchainMonitor
+from app.services.monitor_scheduler import TokenBucket
+from app.services.payment_index import PendingPayment
+
+EMPTY_PAGE = b'{"data":[],"success":true,"meta":{"page_size":0}}'
+
+class StubTronGrid:
+    """
+    Her TRC20 transfer sorgusuna boş sayfa dönen keep-alive destekli HTTP/1.1 sunucusu
+    """
+
+    def __init__(self, latency: float, handshake: float):
+        self.latency = latency
+        self.handshake = handshake
+        self.connections = 0
+        self.requests = 0
+        self._server = None
+
+    async def start(self) -> str:
+        self._server = await asyncio.start_server(self._handle, "127.0.0.1", 0)
+        port = self._server.sockets[0].getsockname()[1]
+        return f"http://127.0.0.1:{port}"
+
+    async def stop(self):
+        self._server.close()
+        await self._server.wait_closed()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.connections += 1
+        # Yeni bağlantı kurulum maliyeti (TCP + TLS el sıkışması)
+        await asyncio.sleep(self.handshake)
+        try:
+            while True:
+                head = await reader.readuntil(b"\r\n\r\n")
+                self.requests += 1
+                await asyncio.sleep(self.latency)
+
+                keep_alive = b"connection: close" not in head.lower()
+                writer.write(
+                    b"HTTP/1.1 200 OK\r\n"
+                    b"Content-Type: application/json\r\n"
+                    b"Content-Length: " + str(len(EMPTY_PAGE)).encode() + b"\r\n"
+                    + (b"" if keep_alive else b"Connection: close\r\n")
+                    + b"\r\n" + EMPTY_PAGE
+                )
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+class UnpooledMonitor(BlockchainMonitor):
+    """
+    Paylaşılan client öncesi davranış: her istek için yeni AsyncClient
+    """
+
+    async def _request(self, method: str, url: str, **kwargs) -> httpx.Response:
+        async with httpx.AsyncClient(base_url=self.trongrid_url, timeout=settings.TRON_GRID_TIMEOUT_SECONDS) as client:
+            self.metrics.trongrid_requests += 1
+            response = await client.request(method, url, **kwargs)
+        response.raise_for_status()
+        return response
+
+def build_payments(count: int):
+    expires_at = datetime.utcnow() + timedelta(minutes=settings.PAYMENT_TIMEOUT_MINUTES)
+    return [
+        PendingPayment(index + 1, tron_address(index + 1), 10, expires_at)
+        for index in range(count)
+    ]
+
+async def run_cycle(monitor_class, base_url: str, payments) -> float:
+    monitor = monitor_class()
+    monitor.trongrid_url = base_url
+    # Ölçülen şey ağ maliyeti olsun: hız sınırı kapalı, imleçler bellekte
+    monitor.rate_limiter = TokenBucket(1e9)
+    monitor._address_cursors = {payment.payment_address: 0 for payment in payments}
+    try:
+        started = time.perf_counter()
+        await monitor.run_payment_checks(payments)
+        return time.perf_counter() - started
+    finally:
+        await monitor.close()
+
+async def main(sizes, latency_ms: float, handshake_ms: float, base_url: str, baseline_max: int):
+    stub = None
+    if not base_url:
+        stub = StubTronGrid(latency_ms / 1000, handshake_ms / 1000)
+        base_url = await stub.start()
+
+    print(f"Sunucu: {base_url}, worker: {settings.MONITOR_WORKER_COUNT}, "
+          f"gecikme: {latency_ms} ms, el sıkışması: {handshake_ms} ms")
+    print(f"{'ödeme':>8} {'havuzsuz (sn)':>14} {'havuzlu (sn)':>13} {'hızlanma':>9} {'bağlantı (havuzsuz/havuzlu)':>28}")
+
+    try:
+        for size in sizes:
+            payments = build_payments(size)
+
+            connections_before = stub.connections if stub else 0
+            pooled = await run_cycle(BlockchainMonitor, base_url, payments)
+            pooled_connections = (stub.connections - connections_before) if stub else 0
+
+            if size > baseline_max:
+                print(f"{size:>8} {'-':>14} {pooled:>13.2f} {'-':>9} {'-':>14}/{pooled_connections}")
+                continue
+
+            connections_before = stub.connections if stub else 0
+            unpooled = await run_cycle(UnpooledMonitor, base_url, payments)
+            unpooled_connections = (stub.connections - connections_before) if stub else 0
+
+            print(f"{size:>8} {unpooled:>14.2f} {pooled:>13.2f} {unpooled / pooled:>8.1f}x "
+                  f"{unpooled_connections:>14}/{pooled_connections}")
+    finally:
+        if stub:
+            await stub.stop()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Monitor kontrol turu benchmark'ı")
+    parser.add_argument("--sizes", default="100,1000,10000", help="Bekleyen ödeme sayıları")
+    parser.add_argument("--latency-ms", type=float, default=5.0, help="Sahte sunucu yanıt gecikmesi")
+    parser.add_argument("--handshake-ms", type=float, default=30.0, help="Yeni bağlantı kurulum gecikmesi")
+    parser.add_argument("--baseline-max", type=int, default=1000, help="Havuzsuz ölçümün yapılacağı en büyük ödeme sayısı")
+    parser.add_argument("--base-url", default="", help="Sahte sunucu yerine kullanılacak TronGrid uyumlu adres")
+    args = parser.parse_args()
+
+    asyncio.run(main(
+        [int(size) for size in args.sizes.split(",")],
+        args.latency_ms,
+        args.handshake_ms,
+        args.base_url,
+        args.baseline_max
+    ))
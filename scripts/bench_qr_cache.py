@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+PayKript - QR üretim ve önbellek hızı
+
+Tek çekirdekte saniyede kaç PNG ve SVG QR kodu üretilebildiğini ve
+PaymentQRService önbelleğinden dönen isteklerin hızını ölçer. Üretim
+ölçümü her seferinde farklı (adres, tutar) kullanır, böylece önbellek
+devreye girmez.
+
+Kullanım: python scripts/bench_qr_cache.py [--seconds 3]
+"""
+
+import argparse
+import asyncio
+import time
+
+# Backend path'i ve ortam değişkenleri app import edilmeden önce ayarlanır
+from bench_common import tron_address
+
+from app.core.executors import shutdown_executors
+from app.services.crypto import CryptoService
+from app.services.payment_qr import payment_qr_service
+
+def render_rate(render, seconds: float) -> float:
+    count = 0
+    started = time.perf_counter()
+    while time.perf_counter() - started < seconds:
+        render(tron_address(count + 1), 10 + count / 100)
+        count += 1
+    return count / (time.perf_counter() - started)
+
+async def cache_hit_rate(seconds: float) -> float:
+    address = tron_address(1)
+    # İlk çağrı üretir ve önbelleğe yazar
+    await payment_qr_service.render(address, 10.0, "png")
+
+    count = 0
+    started = time.perf_counter()
+    while time.perf_counter() - started < seconds:
+        for _ in range(1000):
+            await payment_qr_service.render(address, 10.0, "png")
+        count += 1000
+    return count / (time.perf_counter() - started)
+
+def main(seconds: float):
+    print(f"PNG üretimi:     {render_rate(CryptoService.generate_payment_qr, seconds):>10.0f} /sn")
+    print(f"SVG üretimi:     {render_rate(CryptoService.generate_payment_qr_svg, seconds):>10.0f} /sn")
+    try:
+        print(f"Önbellek isabeti: {asyncio.run(cache_hit_rate(seconds)):>9.0f} /sn")
+    finally:
+        shutdown_executors()
+    print(f"Önbellek: {payment_qr_service.stats()}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="QR üretim ve önbellek hızı")
+    parser.add_argument("--seconds", type=float, default=3.0, help="Her ölçümün süresi")
+    args = parser.parse_args()
+
+    main(args.seconds)
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+PayKript - JWT kullanıcı önbelleği ölçümü
+
+Dashboard endpoint'lerinin auth bağımlılığını (get_current_user +
+get_current_active_user) önbellekli ve önbelleksiz çalıştırır; istek
+başına süreyi ve veritabanı sorgu sayısını yazdırır. Her tur gerçek bir
+istek gibi kendi session'ını açıp kapatır.
+
+Kullanım: python scripts/bench_user_cache.py [--iterations 3000]
+"""
+
+import argparse
+import asyncio
+import time
+
+# Backend path'i ve ortam değişkenleri app import edilmeden önce ayarlanır
+from bench_common import reset_database
+
+from fastapi.security import HTTPAuthorizationCredentials
+from sqlalchemy import event
+
+from app.api.deps import get_current_active_user, get_current_user
+from app.core.security import create_access_token
+from app.db.database import SessionLocal, engine
+from app.db.models import User
+from app.services.user_cache import user_principal_cache
+
+EMAIL = "merchant@example.com"
+
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        self.count += 1
+
+def create_user():
+    db = SessionLocal()
+    try:
+        db.add(User(email=EMAIL, hashed_password="x", full_name="Benchmark"))
+        db.commit()
+    finally:
+        db.close()
+
+async def resolve(credentials: HTTPAuthorizationCredentials) -> int:
+    db = SessionLocal()
+    try:
+        user = await get_current_active_user(await get_current_user(credentials, db))
+        return user.id
+    finally:
+        db.close()
+
+async def measure(credentials, iterations: int, cached: bool, queries: QueryCounter) -> tuple:
+    # Isınma: önbellekli ölçümde kayıt burada oluşur
+    user_principal_cache.invalidate(EMAIL)
+    await resolve(credentials)
+
+    queries.count = 0
+    started = time.perf_counter()
+    for _ in range(iterations):
+        if not cached:
+            user_principal_cache.invalidate(EMAIL)
+        await resolve(credentials)
+    duration = time.perf_counter() - started
+    return duration / iterations * 1000, queries.count / iterations
+
+async def main(iterations: int):
+    reset_database()
+    create_user()
+    credentials = HTTPAuthorizationCredentials(
+        scheme="Bearer",
+        credentials=create_access_token({"sub": EMAIL})
+    )
+
+    queries = QueryCounter()
+    event.listen(engine, "before_cursor_execute", queries)
+
+    print(f"{iterations} tur, auth bağımlılığı (get_current_user + get_current_active_user)")
+    for name, cached in (("önbelleksiz", False), ("önbellekli", True)):
+        per_request_ms, per_request_queries = await measure(credentials, iterations, cached, queries)
+        print(f"{name:<12} {per_request_ms:6.3f} ms/istek, {per_request_queries:.1f} sorgu/istek")
+    print(f"Önbellek: {user_principal_cache.stats()}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="JWT kullanıcı önbelleği ölçümü")
+    parser.add_argument("--iterations", type=int, default=3000, help="Tur sayısı")
+    args = parser.parse_args()
+
+    asyncio.run(main(args.iterations))
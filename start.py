@@ -24,22 +24,38 @@ logging.basicConfig(
 )
 logger = logging.getLogger("PayKript")
 
-def start_blockchain_monitor():
+def start_background_services(run_monitor: bool, run_webhooks: bool):
     """
-    Blockchain monitoring servisini başlat
+    Blockchain monitoring ve webhook delivery servislerini başlat
     """
     try:
-        from app.services.blockchain import blockchain_monitor
+        services = []
+        
+        if run_monitor:
+            from app.services.blockchain import blockchain_monitor
+            from app.services.address_pool import address_pool
+            logger.info("🔍 Blockchain monitoring servisi başlatılıyor...")
+            services.append(blockchain_monitor.monitor_pending_payments())
+            services.append(address_pool.run())
+        
+        if run_webhooks:
+            from app.services.webhook_outbox import webhook_outbox_worker
+            from app.services.webhook_replay import webhook_replay_runner
+            logger.info("📨 Webhook delivery servisi başlatılıyor...")
+            services.append(webhook_outbox_worker.run())
+            services.append(webhook_replay_runner.run())
         
         # Yeni event loop oluştur
         loop = asyncio.new_event_loop()
         asyncio.set_event_loop(loop)
         
-        logger.info("🔍 Blockchain monitoring servisi başlatılıyor...")
-        loop.run_until_complete(blockchain_monitor.monitor_pending_payments())
+        async def run_all():
+            await asyncio.gather(*services)
+        
+        loop.run_until_complete(run_all())
         
     except Exception as e:
-        logger.error(f"❌ Blockchain monitoring hatası: {e}")
+        logger.error(f"❌ Arka plan servis hatası: {e}")
 
 def check_requirements():
     """
@@ -91,14 +107,27 @@ def main():
     if not check_requirements():
         sys.exit(1)
     
-    # Blockchain monitoring'i background thread'de başlat
-    monitor_thread = threading.Thread(
-        target=start_blockchain_monitor,
-        daemon=True,
-        name="BlockchainMonitor"
-    )
-    monitor_thread.start()
-    logger.info("🔍 Blockchain monitoring arka planda başlatıldı")
+    # Blockchain monitoring ve webhook delivery'yi background thread'de başlat
+    # (ayrı worker.py süreçleri kullanılıyorsa RUN_EMBEDDED_MONITOR / RUN_EMBEDDED_WEBHOOK_WORKER=false)
+    from app.core.config import settings
+    if settings.RUN_EMBEDDED_MONITOR or settings.RUN_EMBEDDED_WEBHOOK_WORKER:
+        background_thread = threading.Thread(
+            target=start_background_services,
+            args=(settings.RUN_EMBEDDED_MONITOR, settings.RUN_EMBEDDED_WEBHOOK_WORKER),
+            daemon=True,
+            name="BackgroundServices"
+        )
+        background_thread.start()
+    
+    if settings.RUN_EMBEDDED_MONITOR:
+        logger.info("🔍 Blockchain monitoring arka planda başlatıldı")
+    else:
+        logger.info("🔍 Gömülü monitoring kapalı, ayrı worker süreçleri kullanılıyor (worker.py)")
+    
+    if settings.RUN_EMBEDDED_WEBHOOK_WORKER:
+        logger.info("📨 Webhook delivery arka planda başlatıldı")
+    else:
+        logger.info("📨 Gömülü webhook delivery kapalı, ayrı worker süreçleri kullanılıyor (worker.py)")
     
     # FastAPI uygulamasını başlat
     import os
@@ -8,8 +8,96 @@ jQuery(document).ready(function($) {
     var timeRemaining = paykript_payment_data.time_remaining;
     var checkInterval;
     var countdownInterval;
+    var eventSource = null;
+    var longPollFailures = 0;
+    var finished = false;
     
-    // Otomatik ödeme kontrolü başlat
+    // Durum değişikliklerini API'den anlık al: önce SSE, olmazsa long-poll,
+    // o da olmazsa periyodik kontrol
+    function startStatusUpdates() {
+        if (window.EventSource && paykript_payment_data.stream_url) {
+            eventSource = new EventSource(paykript_payment_data.stream_url);
+            
+            eventSource.addEventListener('status', function(event) {
+                handleStatus(JSON.parse(event.data).status);
+            });
+            
+            eventSource.onerror = function() {
+                // Bağlantı kalıcı olarak kapandıysa (ör. proxy SSE desteklemiyor) long-poll'a geç
+                if (eventSource && eventSource.readyState === EventSource.CLOSED) {
+                    eventSource = null;
+                    waitForStatus();
+                }
+            };
+            return;
+        }
+        
+        waitForStatus();
+    }
+    
+    // Long-poll: durum değişene veya sunucu zaman aşımına kadar bekleyen istek
+    function waitForStatus() {
+        if (finished) {
+            return;
+        }
+        
+        if (!paykript_payment_data.wait_url) {
+            startPaymentCheck();
+            return;
+        }
+        
+        $.ajax({
+            url: paykript_payment_data.wait_url + '&durum=' + encodeURIComponent(paymentStatus),
+            type: 'GET',
+            dataType: 'json',
+            timeout: 70000,
+            success: function(data) {
+                longPollFailures = 0;
+                handleStatus(data.status);
+                waitForStatus();
+            },
+            error: function() {
+                longPollFailures++;
+                if (longPollFailures >= 3) {
+                    startPaymentCheck();
+                } else {
+                    setTimeout(waitForStatus, 5000);
+                }
+            }
+        });
+    }
+    
+    function handleStatus(status) {
+        if (finished || status === paymentStatus) {
+            return;
+        }
+        paymentStatus = status;
+        
+        if (status === 'pending') {
+            return;
+        }
+        
+        finished = true;
+        clearInterval(checkInterval);
+        if (eventSource) {
+            eventSource.close();
+            eventSource = null;
+        }
+        
+        if (status === 'confirmed') {
+            clearInterval(countdownInterval);
+            $('#status-text').text(paykript_payment_data.payment_confirmed_text);
+            
+            setTimeout(function() {
+                location.reload();
+            }, 2000);
+        } else {
+            // Süresi doldu veya iptal edildi
+            location.reload();
+        }
+    }
+    
+    // Otomatik ödeme kontrolü başlat (anlık bildirim kullanılamazsa)
     function startPaymentCheck() {
         checkInterval = setInterval(function() {
             checkPaymentStatus();
@@ -54,14 +142,7 @@ jQuery(document).ready(function($) {
                 if (response.success && response.data) {
                     var data = response.data;
                     if (data.payment_status === 'confirmed') {
-                        clearInterval(checkInterval);
-                        clearInterval(countdownInterval);
-                        
-                        $('#status-text').text(paykript_payment_data.payment_confirmed_text);
-                        
-                        setTimeout(function() {
-                            location.reload();
-                        }, 2000);
+                        handleStatus(data.payment_status);
                     }
                 }
             },
@@ -84,7 +165,7 @@ jQuery(document).ready(function($) {
     
     // Fonksiyonları başlat
     if (paymentStatus === 'pending' && timeRemaining > 0) {
-        startPaymentCheck();
+        startStatusUpdates();
         startCountdown();
     }
 });
@@ -258,7 +258,9 @@ class WC_Gateway_PayKript extends WC_Payment_Gateway {
             'status' => 'success',
             'payment_status' => $payment_data['status'],
             'expires_at' => $payment_data['expires_at'],
-            'confirmed_at' => $payment_data['confirmed_at']
+            'confirmed_at' => $payment_data['confirmed_at'],
+            'status_stream_path' => $payment_data['status_stream_path'] ?? '',
+            'status_wait_path' => $payment_data['status_wait_path'] ?? ''
         );
     }
     
@@ -348,7 +350,7 @@ class WC_Gateway_PayKript extends WC_Payment_Gateway {
         
         // Ödeme durum kontrolü için ayrı script (thank you sayfasında)
         if (isset($_GET['paykript_payment'])) {
-            wp_enqueue_script('paykript-payment-status', plugin_dir_url(dirname(__FILE__)) . 'assets/payment-status.js', array('jquery'), '1.0.0', true);
+            wp_enqueue_script('paykript-payment-status', plugin_dir_url(dirname(__FILE__)) . 'assets/payment-status.js', array('jquery'), '1.1.0', true);
             
             // Ödeme bilgilerini JavaScript'e geç
             global $wp_query;
@@ -363,11 +365,18 @@ class WC_Gateway_PayKript extends WC_Payment_Gateway {
                     $expires_timestamp = $expires_at ? strtotime($expires_at) : 0;
                     $time_remaining = max(0, $expires_timestamp - $current_time);
                     
+                    // Tarayıcı durum değişikliğini doğrudan API'den (imzalı SSE/long-poll adresleri) alır
+                    $api_base = rtrim($this->api_url, '/');
+                    $stream_path = $payment_status_data['status_stream_path'] ?? '';
+                    $wait_path = $payment_status_data['status_wait_path'] ?? '';
+                    
                     wp_localize_script('paykript-payment-status', 'paykript_payment_data', array(
                         'payment_id' => intval($payment_id),
                         'order_id' => intval($order_id),
                         'payment_status' => $payment_status_data['payment_status'] ?? 'unknown',
                         'time_remaining' => $time_remaining,
+                        'stream_url' => $stream_path ? $api_base . $stream_path : '',
+                        'wait_url' => $wait_path ? $api_base . $wait_path : '',
                         'ajax_url' => admin_url('admin-ajax.php'),
                         'nonce' => wp_create_nonce('paykript_check_payment'),
                         'check_payment_text' => __('Kontrol ediliyor...', 'paykript'),
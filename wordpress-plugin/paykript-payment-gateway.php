@@ -83,33 +83,64 @@ function paykript_handle_webhook($request) {
     
     // Ödeme onaylandı
     if ($data['event'] === 'payment.confirmed') {
-        $order_id = sanitize_text_field($data['data']['order_id']);
-        $order = wc_get_order($order_id);
+        $result = paykript_confirm_order($data);
         
-        if (!$order) {
-            return new WP_Error('order_not_found', 'Sipariş bulunamadı', ['status' => 404]);
+        if (is_wp_error($result)) {
+            return $result;
+        }
+    }
+    
+    // Toplu gönderim: her biri payment.confirmed olan event'ler tek istekte gelir
+    if ($data['event'] === 'payment.batch') {
+        if (!isset($data['events']) || !is_array($data['events'])) {
+            return new WP_Error('invalid_data', 'Geçersiz webhook verisi', ['status' => 400]);
         }
         
-        // Ödemeyi tamamla
-        $tx_hash = sanitize_text_field($data['data']['transaction']['tx_hash']);
-        $amount = sanitize_text_field($data['data']['amount']);
-        
-        $order->payment_complete($tx_hash);
-        $order->add_order_note(
-            sprintf(
-                __('USDT ödemesi onaylandı. İşlem Hash: %s, Miktar: %s USDT', 'paykript'),
-                $tx_hash,
-                $amount
-            )
-        );
-        
-        // Log kaydı
-        error_log("PayKript: Ödeme onaylandı - Sipariş: {$order_id}, TX: {$tx_hash}");
+        foreach ($data['events'] as $event) {
+            if (!isset($event['event']) || $event['event'] !== 'payment.confirmed') {
+                continue;
+            }
+            
+            // Bulunamayan sipariş tüm toplu gönderimin tekrar denenmesine yol açmasın
+            $result = paykript_confirm_order($event);
+            
+            if (is_wp_error($result)) {
+                $order_id = sanitize_text_field($event['data']['order_id']);
+                error_log("PayKript: Toplu webhook event'i işlenemedi - Sipariş: {$order_id}, " . $result->get_error_message());
+            }
+        }
     }
     
     return ['status' => 'success'];
 }
 
+function paykript_confirm_order($data) {
+    $order_id = sanitize_text_field($data['data']['order_id']);
+    $order = wc_get_order($order_id);
+    
+    if (!$order) {
+        return new WP_Error('order_not_found', 'Sipariş bulunamadı', ['status' => 404]);
+    }
+    
+    // Ödemeyi tamamla
+    $tx_hash = sanitize_text_field($data['data']['transaction']['tx_hash']);
+    $amount = sanitize_text_field($data['data']['amount']);
+    
+    $order->payment_complete($tx_hash);
+    $order->add_order_note(
+        sprintf(
+            __('USDT ödemesi onaylandı. İşlem Hash: %s, Miktar: %s USDT', 'paykript'),
+            $tx_hash,
+            $amount
+        )
+    );
+    
+    // Log kaydı
+    error_log("PayKript: Ödeme onaylandı - Sipariş: {$order_id}, TX: {$tx_hash}");
+    
+    return true;
+}
+
 // Plugin aktivasyonu
 register_activation_hook(__FILE__, 'paykript_activate');
 
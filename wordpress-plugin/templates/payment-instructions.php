@@ -7,26 +7,37 @@ if (!defined('ABSPATH')) {
     exit;
 }
 
-// PayKript API'den QR kodu al
-$gateway = new WC_Gateway_PayKript();
-$qr_response = wp_remote_get(
-    rtrim($gateway->api_url, '/') . '/odemeler/qr/' . $payment_id,
-    array(
-        'headers' => array(
-            'Authorization' => 'Bearer ' . $gateway->api_key . ':' . $gateway->secret_key
-        )
-    )
-);
-
-$qr_data = '';
-if (!is_wp_error($qr_response) && wp_remote_retrieve_response_code($qr_response) === 200) {
-    $qr_body = json_decode(wp_remote_retrieve_body($qr_response), true);
-    $qr_data = $qr_body['qr_code'] ?? '';
-}
-
 $current_time = current_time('timestamp');
 $expires_timestamp = strtotime($expires_at);
 $time_remaining = $expires_timestamp - $current_time;
+
+// PayKript API'den QR görsel adresini al (ödeme süresi boyunca transient'ta saklanır,
+// görselin kendisi tarayıcı tarafından ETag/Cache-Control ile önbelleklenir)
+$gateway = new WC_Gateway_PayKript();
+$qr_transient = 'paykript_qr_' . $payment_id;
+$qr_data = get_transient($qr_transient);
+
+if ($qr_data === false) {
+    $qr_data = '';
+    $qr_response = wp_remote_get(
+        rtrim($gateway->api_url, '/') . '/odemeler/qr/' . $payment_id,
+        array(
+            'headers' => array(
+                'Authorization' => 'Bearer ' . $gateway->api_key . ':' . $gateway->secret_key
+            )
+        )
+    );
+    
+    if (!is_wp_error($qr_response) && wp_remote_retrieve_response_code($qr_response) === 200) {
+        $qr_body = json_decode(wp_remote_retrieve_body($qr_response), true);
+        if (!empty($qr_body['image_path'])) {
+            $qr_data = rtrim($gateway->api_url, '/') . $qr_body['image_path'];
+        } else {
+            $qr_data = $qr_body['qr_code'] ?? '';
+        }
+        set_transient($qr_transient, $qr_data, max($time_remaining, 60));
+    }
+}
 ?>
 
 <div class="paykript-payment-container">
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+PayKript - Arka plan worker'ı
+API sürecinden bağımsız çalışan, yatay ölçeklenebilir izleme ve webhook gönderim süreci
+
+Birden fazla worker aynı veritabanına bağlanabilir; bekleyen ödemeler
+heartbeat tabanlı consistent hashing ile worker'lar arasında paylaştırılır,
+webhook outbox kayıtları ise SKIP LOCKED ile kiralanır.
+
+Kullanım: python worker.py [--role all|monitor|webhooks]
+"""
+
+import sys
+import argparse
+import asyncio
+import signal
+import logging
+from pathlib import Path
+
+# Backend dizinini Python path'e ekle
+backend_path = Path(__file__).parent / "backend"
+sys.path.insert(0, str(backend_path))
+
+# Logları ayarla
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+)
+logger = logging.getLogger("PayKript.Worker")
+
+async def run_worker(role: str):
+    """
+    Seçilen servisleri çalıştır, SIGTERM/SIGINT gelince temiz şekilde kapat
+    """
+    services = []
+    
+    if role in ("all", "monitor"):
+        from app.services.blockchain import blockchain_monitor
+        from app.services.address_pool import address_pool
+        services.append(blockchain_monitor.monitor_pending_payments())
+        services.append(address_pool.run())
+        logger.info(f"🔍 Monitor worker başlatıldı: {blockchain_monitor.coordinator.worker_id}")
+    
+    if role in ("all", "webhooks"):
+        from app.services.webhook_outbox import webhook_outbox_worker
+        from app.services.webhook_replay import webhook_replay_runner
+        services.append(webhook_outbox_worker.run())
+        services.append(webhook_replay_runner.run())
+        logger.info("📨 Webhook delivery worker başlatıldı")
+    
+    task = asyncio.ensure_future(asyncio.gather(*services))
+    
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        try:
+            loop.add_signal_handler(sig, task.cancel)
+        except NotImplementedError:
+            # Windows'ta signal handler desteklenmez
+            pass
+    
+    try:
+        await task
+    except asyncio.CancelledError:
+        logger.info("👋 Worker kapatılıyor...")
+
+def main():
+    parser = argparse.ArgumentParser(description="PayKript arka plan worker'ı")
+    parser.add_argument(
+        "--role",
+        choices=["all", "monitor", "webhooks"],
+        default="all",
+        help="Çalıştırılacak servisler (varsayılan: hepsi)"
+    )
+    args = parser.parse_args()
+    
+    try:
+        from app.db.database import engine
+        from app.db import models
+        
+        # Tabloları oluştur
+        models.Base.metadata.create_all(bind=engine)
+    except Exception as e:
+        logger.error(f"❌ Veritabanı hatası: {e}")
+        sys.exit(1)
+    
+    asyncio.run(run_worker(args.role))
+
+if __name__ == "__main__":
+    main()